@@ -0,0 +1,214 @@
+"""
+Measures the throughput and ratio of every compression type over a synthetic corpus shaped like the game's assets.
+
+Usage: ``python -m benchmarks.compression_corpus [--json results.json] [--compare previous.json]``
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+from typing import *
+
+import numpy as np
+
+from formats.binary import BinaryWriter
+from formats.compression import compress, decompress, decompression_cache, LZ10, RLE, HUFF4BIT, HUFF8BIT
+from formats.gds import GDS, GDSCommand
+
+COMPRESSION_TYPES = {"lz10": LZ10, "rle": RLE, "huff4": HUFF4BIT, "huff8": HUFF8BIT}
+
+
+def tile_data(rng: random.Random, tile_count: int = 1024) -> bytes:
+    """4bpp tiles of 8x8 pixels, with blank and repeated tiles and few colours per tile like backgrounds."""
+    tiles = []
+    for _ in range(tile_count):
+        roll = rng.random()
+        if roll < 0.15:
+            tiles.append(bytes(32))
+        elif roll < 0.35 and tiles:
+            tiles.append(rng.choice(tiles))
+        else:
+            colors = [rng.randrange(16) for _ in range(rng.randint(2, 6))]
+            pixels = []
+            color = rng.choice(colors)
+            for _ in range(64):
+                if rng.random() < 0.3:
+                    color = rng.choice(colors)
+                pixels.append(color)
+            tiles.append(bytes(pixels[i] | pixels[i + 1] << 4 for i in range(0, 64, 2)))
+    return b"".join(tiles)
+
+
+def palettes(rng: random.Random, palette_count: int = 16) -> bytes:
+    """BGR555 palettes of 256 colours made of gradients between random colours."""
+    colors = []
+    for _ in range(palette_count * 16):
+        start = [rng.randrange(32) for _ in range(3)]
+        end = [rng.randrange(32) for _ in range(3)]
+        for step in range(16):
+            r, g, b = (round(s + (e - s) * step / 15) for s, e in zip(start, end))
+            colors.append(r | g << 5 | b << 10)
+    return np.array(colors, dtype="<u2").tobytes()
+
+
+def gds_scripts(rng: random.Random, command_count: int = 2000) -> bytes:
+    """An event script using a small set of commands with small ints, floats and short strings as parameters."""
+    words = ["Layton", "Luke", "Professor", "puzzle", "hint", "the", "village", "Flora", "tea", "clock"]
+    commands = []
+    for _ in range(command_count):
+        command = rng.choice([0x2, 0x4, 0x5, 0x6, 0x21, 0x2a, 0x2b, 0x2c, 0x31, 0x32, 0x33, 0x5c, 0x6a, 0x72])
+        params = []
+        for _ in range(rng.randint(0, 4)):
+            kind = rng.random()
+            if kind < 0.6:
+                params.append(rng.choice([0, 1, 2, 4, 16, 30, 255, rng.randrange(1000)]))
+            elif kind < 0.8:
+                params.append(rng.choice([0.0, 0.5, 1.0, round(rng.uniform(0, 10), 1)]))
+            else:
+                params.append(" ".join(rng.choice(words) for _ in range(rng.randint(1, 4))))
+        commands.append(GDSCommand(command, params))
+    gds = GDS()
+    gds.commands = commands
+    gds.params = []
+    wtr = BinaryWriter()
+    gds.write_stream(wtr)
+    return wtr.getvalue()
+
+
+def pcm(rng: random.Random, sample_count: int = 32768) -> bytes:
+    """16 bit mono PCM of a few decaying tones with noise, like sound effects."""
+    t = np.arange(sample_count) / 32768
+    signal = np.zeros(sample_count)
+    for _ in range(3):
+        frequency = rng.uniform(100, 2000)
+        signal += np.sin(2 * math.pi * frequency * t + rng.uniform(0, math.pi)) * np.exp(-t * rng.uniform(1, 8))
+    signal += np.random.default_rng(rng.randrange(1 << 32)).normal(0, 0.02, sample_count)
+    return (signal / np.abs(signal).max() * 0x7000).astype("<i2").tobytes()
+
+
+def corpus(seed: int = 0) -> Dict[str, bytes]:
+    """Returns the synthetic corpus, the same for a given seed."""
+    rng = random.Random(seed)
+    return {
+        "tiles": tile_data(rng),
+        "palettes": palettes(rng),
+        "gds": gds_scripts(rng),
+        "pcm": pcm(rng),
+    }
+
+
+def _best_time(function: Callable[[], Any], repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark(samples: Dict[str, bytes], repeat: int = 3, max_compression: bool = False) -> List[Dict[str, Any]]:
+    """
+    Compresses and decompresses every sample with every compression type.
+
+    Parameters
+    ----------
+    samples : Dict[str, bytes]
+        The data to compress by name.
+    repeat : int
+        Number of runs of each measurement, the fastest is kept.
+    max_compression : bool
+        Whether to use the slower compression giving the smallest files.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        The size, compressed size, ratio and throughputs (in MB/s of uncompressed data) of every sample and type.
+    """
+    results = []
+    for sample, data in samples.items():
+        for codec, compression_type in COMPRESSION_TYPES.items():
+            compressed = compress(data, compression_type, False, max_compression=max_compression)
+            if decompress(compressed, False)[0] != data:
+                raise ValueError(f"{codec} round trip failed on {sample}")
+            compress_time = _best_time(lambda: compress(data, compression_type, False,
+                                                        max_compression=max_compression), repeat)
+            # Measure the codec itself, not the decompression cache
+            previous_size = decompression_cache.max_size
+            decompression_cache.resize(0)
+            try:
+                decompress_time = _best_time(lambda: decompress(compressed, False), repeat)
+            finally:
+                decompression_cache.resize(previous_size)
+            results.append({
+                "sample": sample,
+                "codec": codec,
+                "size": len(data),
+                "compressed_size": len(compressed),
+                "ratio": len(compressed) / len(data),
+                "compress_mbps": len(data) / compress_time / 1e6,
+                "decompress_mbps": len(data) / decompress_time / 1e6,
+            })
+    return results
+
+
+def compare(previous: List[Dict[str, Any]], results: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Returns a line for every result whose ratio got worse, or whose throughput dropped more than tolerance."""
+    previous = {(result["sample"], result["codec"]): result for result in previous}
+    regressions = []
+    for result in results:
+        old = previous.get((result["sample"], result["codec"]))
+        if old is None:
+            continue
+        name = f"{result['sample']}/{result['codec']}"
+        if result["compressed_size"] > old["compressed_size"]:
+            regressions.append(f"{name}: compressed size {old['compressed_size']} -> {result['compressed_size']}")
+        for key in ("compress_mbps", "decompress_mbps"):
+            if result[key] < old[key] * (1 - tolerance):
+                regressions.append(f"{name}: {key} {old[key]:.2f} -> {result[key]:.2f}")
+    return regressions
+
+
+def _revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Results of a previous run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Throughput drop reported as a regression (default: 0.2, 20%%)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each measurement (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpus (default: 0)")
+    parser.add_argument("--max-compression", action="store_true", help="Use the slower, smallest compression")
+    args = parser.parse_args()
+
+    results = benchmark(corpus(args.seed), args.repeat, args.max_compression)
+
+    print(f"{'sample':<10}{'codec':<7}{'size':>9}{'compressed':>12}{'ratio':>8}{'comp MB/s':>11}{'decomp MB/s':>13}")
+    for result in results:
+        print(f"{result['sample']:<10}{result['codec']:<7}{result['size']:>9}{result['compressed_size']:>12}"
+              f"{result['ratio']:>8.3f}{result['compress_mbps']:>11.2f}{result['decompress_mbps']:>13.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"revision": _revision(), "python": platform.python_version(), "seed": args.seed,
+                       "max_compression": args.max_compression, "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f)["results"], results, args.tolerance)
+        print("\n".join(regressions) if regressions else "No regressions")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
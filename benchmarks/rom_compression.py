@@ -0,0 +1,69 @@
+"""
+Compares the default and maximum LZ10 compression over every LZ10 compressed file of a ROM.
+
+Usage: ``python -m benchmarks.rom_compression rom.nds [--json report.json]``
+"""
+import argparse
+import json
+import time
+from typing import *
+
+from formats.compression import compress, decompress, LZ10
+from formats.filesystem import NintendoDSRom
+
+
+def lz10_files(rom: NintendoDSRom) -> Iterator[Tuple[str, bytes, bool]]:
+    """Yields the path, decompressed data and double typed flag of every LZ10 compressed file in the ROM."""
+    for file_id, data in enumerate(rom.files):
+        if len(data) < 8:
+            continue
+        try:
+            decompressed, double_typed = decompress(data)
+        except Exception:
+            continue
+        if data[4 if double_typed else 0] != LZ10 or not decompressed:
+            continue
+        yield rom.filenames.filenameOf(file_id), decompressed, double_typed
+
+
+def benchmark_rom(rom: NintendoDSRom) -> List[Dict[str, Any]]:
+    results = []
+    for path, data, double_typed in lz10_files(rom):
+        result = {"path": path, "size": len(data)}
+        for mode, max_compression in (("default", False), ("max", True)):
+            start = time.perf_counter()
+            compressed = compress(data, LZ10, double_typed, max_compression=max_compression)
+            result[mode] = {"size": len(compressed), "time": time.perf_counter() - start}
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("rom", help="Path of the .nds file")
+    parser.add_argument("--json", help="Write the results of every file to this file")
+    args = parser.parse_args()
+
+    results = benchmark_rom(NintendoDSRom.fromFile(args.rom))
+
+    print(f"{'file':<48}{'default':>10}{'max':>10}{'saved':>8}{'time x':>8}")
+    for result in results:
+        default, max_ = result["default"], result["max"]
+        print(f"{result['path']:<48}{default['size']:>10}{max_['size']:>10}"
+              f"{default['size'] - max_['size']:>8}{max_['time'] / max(default['time'], 1e-9):>8.1f}")
+
+    default_size = sum(result["default"]["size"] for result in results)
+    max_size = sum(result["max"]["size"] for result in results)
+    default_time = sum(result["default"]["time"] for result in results)
+    max_time = sum(result["max"]["time"] for result in results)
+    print(f"{len(results)} files: {default_size} -> {max_size} bytes "
+          f"({(default_size - max_size) / max(default_size, 1):.2%} smaller), "
+          f"{default_time:.2f}s -> {max_time:.2f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
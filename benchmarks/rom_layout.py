@@ -0,0 +1,29 @@
+"""
+Reports the average seek distance between the files loaded together by the events and places of a ROM, before and
+after ordering them with formats.layout.
+
+Usage: ``python -m benchmarks.rom_layout rom.nds [--output ordered.nds]``
+"""
+import argparse
+
+from formats.filesystem import NintendoDSRom
+from formats.layout import get_file_groups, optimize_file_order
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("rom", help="Path of the .nds file")
+    parser.add_argument("--output", help="Save the ROM with the ordered files to this file")
+    args = parser.parse_args()
+
+    rom = NintendoDSRom.fromFile(args.rom)
+    groups = get_file_groups(rom)
+    before, after = optimize_file_order(rom, groups)
+    print(f"{len(groups)} groups, {sum(len(group) for group in groups)} files")
+    print(f"average seek distance: {before:.0f} bytes before, {after:.0f} bytes after")
+    if args.output:
+        rom.saveToFile(args.output)
+
+
+if __name__ == '__main__':
+    main()
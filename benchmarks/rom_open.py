@@ -0,0 +1,82 @@
+"""
+Compares the memory allocated by opening and reading every file of a ROM folder, with read only handles reading the
+data in place and with handles copying it.
+
+Usage: ``python -m benchmarks.rom_open rom.nds [--folder /data_lt2] [--lazy]``
+"""
+import argparse
+import time
+import tracemalloc
+from typing import *
+
+from ndspy.fnt import Folder
+
+from formats.binary import BinaryReader
+from formats.filesystem import NintendoDSRom, RomFile
+
+
+def folder_files(folder: Folder, path: str) -> Iterator[str]:
+    """Yields the path of every file in the folder and its subfolders."""
+    for filename in folder.files:
+        yield f"{path}/{filename}"
+    for folder_name, subfolder in folder.folders:
+        yield from folder_files(subfolder, f"{path}/{folder_name}")
+
+
+def open_copy(rom: NintendoDSRom, path: str):
+    # Read mode as it was before RomFileReader, the data is copied in the handle
+    return RomFile(rom, rom.get_file_id(path), "r", name=path)
+
+
+def open_in_place(rom: NintendoDSRom, path: str):
+    return rom.open(path, "rb")
+
+
+def benchmark(rom: NintendoDSRom, paths: List[str], opener: Callable[[NintendoDSRom, str], Any]) -> Dict[str, float]:
+    """
+    Opens every file and reads it through a BinaryReader.
+
+    Returns
+    -------
+    Dict[str, float]
+        The time, the sum of the memory allocated while reading each file and the biggest of those in bytes.
+    """
+    allocated = 0
+    peak = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    for path in paths:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        with opener(rom, path) as f:
+            rdr = BinaryReader(f)
+            rdr.read_uint32()
+            rdr.seek(0)
+            rdr.read_array("u1", len(rdr))
+        file_peak = tracemalloc.get_traced_memory()[1] - base
+        allocated += file_peak
+        peak = max(peak, file_peak)
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return {"time": elapsed, "allocated": allocated, "peak": peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("rom", help="Path of the .nds file")
+    parser.add_argument("--folder", default="/data_lt2", help="Folder of the ROM to open (default: /data_lt2)")
+    parser.add_argument("--lazy", action="store_true", help="Map the ROM file instead of reading it")
+    args = parser.parse_args()
+
+    rom = NintendoDSRom.fromFile(args.rom, lazy=args.lazy)
+    paths = list(folder_files(rom.filenames[args.folder.strip("/")], args.folder.rstrip("/")))
+    size = sum(len(rom.files[rom.get_file_id(path)]) for path in paths)
+    print(f"{len(paths)} files, {size} bytes")
+    print(f"{'handles':<10}{'time (s)':>10}{'allocated':>14}{'peak':>12}")
+    for name, opener in (("copy", open_copy), ("in place", open_in_place)):
+        result = benchmark(rom, paths, opener)
+        print(f"{name:<10}{result['time']:>10.3f}{result['allocated']:>14}{result['peak']:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,170 @@
 import struct
 import typing
-from io import BytesIO, SEEK_SET, SEEK_CUR, SEEK_END
+from io import BytesIO, SEEK_SET, SEEK_CUR, SEEK_END, UnsupportedOperation
 from typing import *
 
-__all__ = ["BinaryWriter", "BinaryReader", "BinaryEditor",
+import numpy as np
+
+__all__ = ["BinaryWriter", "BinaryReader", "BinaryEditor", "Placeholder",
            "SEEK_SET", "SEEK_END", "SEEK_CUR"]
 
 
+_structs: Dict[str, struct.Struct] = {}
+
+
+def _get_struct(fmt: str) -> struct.Struct:
+    # Compiled little endian structs, cached by format
+    compiled = _structs.get(fmt)
+    if compiled is None:
+        if len(_structs) >= 1024:  # array formats include their length, don't let them pile up
+            _structs.clear()
+        compiled = _structs[fmt] = struct.Struct("<" + fmt)
+    return compiled
+
+
+class _MemoryStream:
+    """
+    Read only stream over a memoryview, with the position as a plain integer.
+
+    Used by BinaryReader when reading from bytes, so values can be unpacked in place without copying.
+    """
+    __slots__ = ("view", "data", "pos")
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview]):
+        self.view = memoryview(data).cast("B")
+        # Kept to search the data with bytes.find, other buffers are only copied once a search needs it
+        self.data = data if isinstance(data, bytes) else None
+        self.pos = 0
+
+    def get_data(self) -> bytes:
+        if self.data is None:
+            self.data = self.view.tobytes()
+        return self.data
+
+    @property
+    def closed(self) -> bool:
+        return self.view is None
+
+    def close(self) -> None:
+        if self.view is not None:
+            try:
+                self.view.release()
+            except BufferError:
+                pass  # arrays returned by read_array still use the data
+            self.view = None
+            self.data = None
+
+    def flush(self) -> None:
+        pass
+
+    def read(self, n: Optional[int] = -1) -> bytes:
+        pos = self.pos
+        end = len(self.view) if n is None or n < 0 else min(pos + n, len(self.view))
+        if end <= pos:
+            return b""
+        self.pos = end
+        return self.view[pos:end].tobytes()
+
+    read1 = read
+
+    def readinto(self, buffer) -> int:
+        buffer = memoryview(buffer).cast("B")
+        pos = self.pos
+        end = min(pos + len(buffer), len(self.view))
+        if end <= pos:
+            return 0
+        buffer[:end - pos] = self.view[pos:end]
+        self.pos = end
+        return end - pos
+
+    def readable(self) -> bool:
+        return True
+
+    def readline(self, limit: Optional[int] = -1) -> bytes:
+        data = self.get_data()
+        end = data.find(b"\n", self.pos) + 1 or len(data)
+        if limit is not None and limit >= 0:
+            end = min(end, self.pos + limit)
+        start = self.pos
+        self.pos = max(end, start)
+        return data[start:end]
+
+    def readlines(self, hint: Optional[int] = -1) -> List[bytes]:
+        lines = []
+        size = 0
+        while line := self.readline():
+            lines.append(line)
+            size += len(line)
+            if hint is not None and 0 < hint <= size:
+                break
+        return lines
+
+    def write(self, s) -> int:
+        raise UnsupportedOperation("not writable")
+
+    def writable(self) -> bool:
+        return False
+
+    def writelines(self, lines) -> None:
+        raise UnsupportedOperation("not writable")
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        if whence == SEEK_CUR:
+            offset += self.pos
+        elif whence == SEEK_END:
+            offset += len(self.view)
+        elif whence != SEEK_SET:
+            raise ValueError(f"invalid whence ({whence}, should be 0, 1 or 2)")
+        if offset < 0:
+            raise ValueError(f"negative seek value {offset}")
+        self.pos = offset
+        return offset
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def fileno(self) -> int:
+        raise UnsupportedOperation("fileno")
+
+    def getvalue(self) -> bytes:
+        return self.get_data()
+
+    def getbuffer(self) -> memoryview:
+        return self.view
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class Placeholder:
+    """
+    A value reserved by BinaryWriter.reserve, to be written once it is known (sizes, offsets...).
+    """
+    __slots__ = ("writer", "position", "struct")
+
+    def __init__(self, writer: "BinaryWriter", position: int, fmt: str):
+        self.writer = writer
+        self.position = position
+        """Position of the value in the data."""
+        self.struct = _structs.get(fmt) or _get_struct(fmt)
+
+    def set(self, *values):
+        """
+        Writes the value, without moving the position of the writer.
+        """
+        stream = self.writer.stream
+        pos = stream.tell()
+        stream.seek(self.position)
+        stream.write(self.struct.pack(*values))
+        stream.seek(pos)
+
+
 class _BaseBinaryWrapper:
     def __init__(self, stream: Union[typing.BinaryIO, bytes] = b""):
         if isinstance(stream, bytes) or isinstance(stream, bytearray):
@@ -68,7 +226,7 @@ class _BaseBinaryWrapper:
         return self.stream.read()
 
     def getvalue(self):
-        if isinstance(self.stream, BytesIO):
+        if isinstance(self.stream, (BytesIO, _MemoryStream)):
             return self.stream.getvalue()
         pos = self.stream.tell()
         ret = self.readall()
@@ -93,77 +251,122 @@ class _BaseBinaryWrapper:
         self.seek(value)
 
     def __len__(self):
-        return len(self.getvalue())
+        # Size of the data, without copying it
+        stream = self.stream
+        if isinstance(stream, _MemoryStream):
+            return len(stream.view)
+        if stream.__class__ is BytesIO:
+            with stream.getbuffer() as view:
+                return view.nbytes
+        pos = stream.tell()
+        size = stream.seek(0, SEEK_END)
+        stream.seek(pos)
+        return size
 
 
 class BinaryReader(_BaseBinaryWrapper):
     """
     Class used to read binary data.
+
+    When created from bytes, the data is read through a memoryview instead of a BytesIO,
+    which avoids a copy for every value read. Read only streams over memory (such as the files of archives opened
+    in read mode) are read in place the same way, sharing their position.
     """
+    def __init__(self, stream: Union[typing.BinaryIO, bytes] = b""):
+        if isinstance(stream, (bytes, bytearray, memoryview)):
+            self.stream = _MemoryStream(stream)
+        else:
+            super().__init__(stream)
+
+    @classmethod
+    def from_stream(cls, stream: typing.BinaryIO) -> "BinaryReader":
+        """
+        Gets a reader to parse a file from a stream.
+
+        Readers are returned as is and streams over memory are read in place, other streams are read from their
+        current position into memory.
+        """
+        if isinstance(stream, BinaryReader):
+            return stream
+        if isinstance(stream, _MemoryStream):
+            return cls(stream)
+        return cls(stream.read())
 
     # Read types
     def read_struct(self, fmt) -> Optional[Tuple[Any]]:
-        chunksize = struct.calcsize("<" + fmt)
-        chunk = self.read(chunksize)
-        if len(chunk) != chunksize:
+        compiled = _structs.get(fmt) or _get_struct(fmt)
+        stream = self.stream
+        if isinstance(stream, _MemoryStream):
+            pos = stream.pos
+            end = pos + compiled.size
+            if end > len(stream.view):
+                stream.pos = max(pos, len(stream.view))
+                return None
+            stream.pos = end
+            return compiled.unpack_from(stream.view, pos)
+        chunk = self.read(compiled.size)
+        if len(chunk) != compiled.size:
+            return None
+        return compiled.unpack(chunk)
+
+    def _read_value(self, fmt) -> Any:
+        # Same as read_struct for formats of a single value, returns the value itself
+        compiled = _structs.get(fmt) or _get_struct(fmt)
+        stream = self.stream
+        if isinstance(stream, _MemoryStream):
+            pos = stream.pos
+            end = pos + compiled.size
+            if end > len(stream.view):
+                stream.pos = max(pos, len(stream.view))
+                return None
+            stream.pos = end
+            return compiled.unpack_from(stream.view, pos)[0]
+        chunk = self.read(compiled.size)
+        if len(chunk) != compiled.size:
             return None
-        return struct.unpack("<" + fmt, chunk)
+        return compiled.unpack(chunk)[0]
 
     def read_char(self) -> Optional[AnyStr]:
-        val = self.read_struct("c")
-        return val[0] if val else None
+        return self._read_value("c")
 
     def read_bool(self) -> Optional[bool]:
-        val = self.read_struct("?")
-        return val[0] if val else None
+        return self._read_value("?")
 
     def read_byte(self) -> Optional[int]:
-        val = self.read_struct("b")
-        return val[0] if val else None
+        return self._read_value("b")
 
     def read_ubyte(self) -> Optional[int]:
-        val = self.read_struct("B")
-        return val[0] if val else None
+        return self._read_value("B")
 
     def read_short(self) -> Optional[int]:
-        val = self.read_struct("h")
-        return val[0] if val else None
+        return self._read_value("h")
 
     def read_ushort(self) -> Optional[int]:
-        val = self.read_struct("H")
-        return val[0] if val else None
+        return self._read_value("H")
 
     def read_int(self) -> Optional[int]:
-        val = self.read_struct("i")
-        return val[0] if val else None
+        return self._read_value("i")
 
     def read_uint(self) -> Optional[int]:
-        val = self.read_struct("I")
-        return val[0] if val else None
+        return self._read_value("I")
 
     def read_long(self) -> Optional[int]:
-        val = self.read_struct("l")
-        return val[0] if val else None
+        return self._read_value("l")
 
     def read_ulong(self) -> Optional[int]:
-        val = self.read_struct("L")
-        return val[0] if val else None
+        return self._read_value("L")
 
     def read_longlong(self) -> Optional[int]:
-        val = self.read_struct("q")
-        return val[0] if val else None
+        return self._read_value("q")
 
     def read_ulonglong(self) -> Optional[int]:
-        val = self.read_struct("Q")
-        return val[0] if val else None
+        return self._read_value("Q")
 
     def read_float(self) -> Optional[float]:
-        val = self.read_struct("f")
-        return val[0] if val else None
+        return self._read_value("f")
 
     def read_double(self) -> Optional[float]:
-        val = self.read_struct("d")
-        return val[0] if val else None
+        return self._read_value("d")
 
     def read_string(self, size: Optional[int] = None, encoding: Optional[str] = "shift_jis", pad=b"\0"):
         if size:
@@ -172,17 +375,108 @@ class BinaryReader(_BaseBinaryWrapper):
             else:
                 return self.read(size).split(pad)[0].split(b"\0")[0]
         else:
-            ret = b""
-            while True:
-                c = self.read(1)
-                if c is None or c == pad:
-                    break
-                ret += c
+            ret = self._read_until(pad)
             if encoding:
                 return ret.decode(encoding)
             else:
                 return ret
 
+    def _read_until(self, pad: bytes) -> bytes:
+        # Reads up to the next pad (or the end of the data), the pad is read but not returned
+        stream = self.stream
+        if isinstance(stream, _MemoryStream):
+            pos = stream.pos
+            data = stream.data if stream.data is not None else stream.get_data()
+            end = data.find(pad, pos)
+            if end == -1:
+                stream.pos = max(pos, len(data))
+                return data[pos:]
+            stream.pos = end + len(pad)
+            return data[pos:end]
+
+        # Read in chunks and go back to the end of the string
+        start = self.tell()
+        buffer = b""
+        while True:
+            chunk = self.read(64)
+            search_start = max(len(buffer) - len(pad) + 1, 0)
+            buffer += chunk
+            end = buffer.find(pad, search_start)
+            if end != -1:
+                self.seek(start + end + len(pad))
+                return buffer[:end]
+            if not chunk:
+                return buffer
+
+    def read_cstrings(self, count: int, encoding: Optional[str] = "shift_jis", pad=b"\0") -> List[AnyStr]:
+        """
+        Reads a table of consecutive null terminated strings.
+
+        Parameters
+        ----------
+        count : int
+            Number of strings to read.
+        encoding : Optional[str]
+            Encoding of the strings, None to return bytes.
+        pad : bytes
+            The terminator of the strings.
+
+        Returns
+        -------
+        List[AnyStr]
+            The strings read, without their terminator.
+        """
+        stream = self.stream
+        if isinstance(stream, _MemoryStream) and count > 0:
+            # Find the end of the last string, then split the whole table at once
+            data = stream.data if stream.data is not None else stream.get_data()
+            pos = stream.pos
+            end = pos - len(pad)
+            for _ in range(count):
+                end = data.find(pad, end + len(pad))
+                if end == -1:
+                    break
+            if end != -1:
+                stream.pos = end + len(pad)
+                strings = data[pos:end].split(pad)
+                return [string.decode(encoding) for string in strings] if encoding else strings
+        return [self.read_string(encoding=encoding, pad=pad) for _ in range(count)]
+
+    def read_array(self, dtype: Union[np.dtype, type, str], n: int) -> Optional[np.ndarray]:
+        """
+        Reads an array of n values as a numpy array.
+
+        When the reader was created from bytes, the array is a read only view of the data (no copy).
+
+        Parameters
+        ----------
+        dtype : Union[np.dtype, type, str]
+            The type of the values, read as little endian unless the byte order is specified.
+        n : int
+            Number of values to read.
+
+        Returns
+        -------
+        Optional[np.ndarray]
+            The values read, None if there isn't enough data left.
+        """
+        dtype = np.dtype(dtype)
+        if dtype.byteorder == "=":
+            dtype = dtype.newbyteorder("<")
+        size = dtype.itemsize * n
+        stream = self.stream
+        if isinstance(stream, _MemoryStream):
+            pos = stream.pos
+            if pos + size > len(stream.view):
+                stream.pos = max(pos, len(stream.view))
+                return None
+            stream.pos = pos + size
+            return np.frombuffer(stream.view, dtype, n, pos)
+        chunk = self.read(size)
+        if len(chunk) != size:
+            return None
+        return np.frombuffer(chunk, dtype, n)
+
     def read_int24(self) -> Optional[int]:  # Little endian only
         chunk = self.read(3)
         if len(chunk) != 3:
@@ -242,7 +536,11 @@ class BinaryReader(_BaseBinaryWrapper):
         return list(self.read_struct(f"{n}d"))
 
     def read_string_array(self, n: int, size: Optional[int] = None, encoding: Optional[str] = "shift_jis", pad=b"\0"):
-        return [self.read_string(size, encoding, pad) for _ in range(n)]
+        if not size:
+            return self.read_cstrings(n, encoding, pad)
+        table = self.read(n * size)
+        strings = [table[i:i + size].split(pad)[0].split(b"\0")[0] for i in range(0, n * size, size)]
+        return [string.decode(encoding) for string in strings] if encoding else strings
 
     def read_int24_array(self, n: int) -> Optional[List[float]]:
         return [self.read_int24() for _ in range(n)]
@@ -252,28 +550,28 @@ class BinaryReader(_BaseBinaryWrapper):
 
     # Aliasses
     def read_int8(self) -> Optional[int]:
-        return self.read_byte()
+        return self._read_value("b")
 
     def read_int16(self) -> Optional[int]:
-        return self.read_short()
+        return self._read_value("h")
 
     def read_int32(self) -> Optional[int]:
-        return self.read_int()
+        return self._read_value("i")
 
     def read_int64(self) -> Optional[int]:
-        return self.read_longlong()
+        return self._read_value("q")
 
     def read_uint8(self) -> Optional[int]:
-        return self.read_ubyte()
+        return self._read_value("B")
 
     def read_uint16(self) -> Optional[int]:
-        return self.read_ushort()
+        return self._read_value("H")
 
     def read_uint32(self) -> Optional[int]:
-        return self.read_uint()
+        return self._read_value("I")
 
     def read_uint64(self) -> Optional[int]:
-        return self.read_ulonglong()
+        return self._read_value("Q")
 
     def read_int8_array(self, n: int) -> Optional[List[int]]:
         return self.read_byte_array(n)
@@ -306,8 +604,69 @@ class BinaryWriter(_BaseBinaryWrapper):
     """
     # Write types
 
+    def write(self, s: Union[bytes, bytearray]) -> int:
+        return self.stream.write(s)
+
     def write_struct(self, fmt: AnyStr, *values):
-        self.write(struct.pack("<" + fmt, *values))
+        self.stream.write((_structs.get(fmt) or _get_struct(fmt)).pack(*values))
+
+    def getbuffer(self) -> memoryview:
+        """
+        Returns a view of the data written, without copying it.
+
+        Only available when the stream of the writer is a BytesIO (the default).
+        """
+        return self.stream.getbuffer()
+
+    def write_struct_at(self, position: int, fmt: AnyStr, *values):
+        """
+        Writes values at a position, without moving the position of the writer.
+
+        Parameters
+        ----------
+        position : int
+            Where the values are written.
+        fmt : AnyStr
+            The struct format of the values.
+        values
+            The values to write.
+        """
+        stream = self.stream
+        pos = stream.tell()
+        stream.seek(position)
+        stream.write((_structs.get(fmt) or _get_struct(fmt)).pack(*values))
+        stream.seek(pos)
+
+    def reserve(self, fmt: AnyStr) -> Placeholder:
+        """
+        Writes zeros in place of values which aren't known yet.
+
+        Parameters
+        ----------
+        fmt : AnyStr
+            The struct format of the values.
+
+        Returns
+        -------
+        Placeholder
+            Handle used to write the values once they are known.
+
+        Examples
+        --------
+        >>> wtr = BinaryWriter()
+        >>> size = wtr.reserve_uint32()
+        >>> wtr.write(b"data")
+        >>> size.set(len(wtr))
+        """
+        placeholder = Placeholder(self, self.stream.tell(), fmt)
+        self.stream.write(bytes(placeholder.struct.size))
+        return placeholder
+
+    def reserve_uint16(self) -> Placeholder:
+        return self.reserve("H")
+
+    def reserve_uint32(self) -> Placeholder:
+        return self.reserve("I")
 
     def write_char(self, x: AnyStr):
         self.write_struct("c", x)
@@ -374,9 +733,32 @@ class BinaryWriter(_BaseBinaryWrapper):
         self.write(struct.pack("I", x)[:3])
 
     def write_zeros(self, n: int):
-        self.write(b"\0" * n)
+        self.write(bytes(n))
+
+    def write_padding(self, alignment: int = 4, pad: bytes = b"\0"):
+        """
+        Writes pad bytes until the position is a multiple of alignment.
+
+        Unlike align, the padding is written even when nothing is written after it.
+        """
+        if offset := (self.tell() % alignment):
+            self.write(pad * (alignment - offset))
 
     # Arrays
+    def write_array(self, array: np.ndarray):
+        """
+        Writes the values of a numpy array, as little endian unless the byte order of its type is specified.
+
+        Parameters
+        ----------
+        array : np.ndarray
+            The array to write.
+        """
+        array = np.asarray(array)
+        if array.dtype.byteorder == "=":
+            array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+        self.write(array.tobytes())
+
     def write_char_array(self, array: List[AnyStr]):
         self.write_struct(f"{len(array)}c", *array)
 
@@ -434,28 +816,28 @@ class BinaryWriter(_BaseBinaryWrapper):
 
     # Aliasses
     def write_int8(self, x: int):
-        self.write_byte(x)
+        self.write_struct("b", x)
 
     def write_int16(self, x: int):
-        self.write_short(x)
+        self.write_struct("h", x)
 
     def write_int32(self, x: int):
-        self.write_int(x)
+        self.write_struct("i", x)
 
     def write_int64(self, x: int):
-        self.write_longlong(x)
+        self.write_struct("q", x)
 
     def write_uint8(self, x: int):
-        self.write_ubyte(x)
+        self.write_struct("B", x)
 
     def write_uint16(self, x: int):
-        self.write_ushort(x)
+        self.write_struct("H", x)
 
     def write_uint32(self, x: int):
-        self.write_uint(x)
+        self.write_struct("I", x)
 
     def write_uint64(self, x: int):
-        self.write_ulonglong(x)
+        self.write_struct("Q", x)
 
     def write_int8_array(self, array: List[int]):
         self.write_byte_array(array)
@@ -486,4 +868,6 @@ class BinaryEditor(BinaryReader, BinaryWriter):
     """
     Class used for both reading and writing binary data.
     """
-    pass
+    def __init__(self, stream: Union[typing.BinaryIO, bytes] = b""):
+        # Bytes need to be writable, so they always go in a BytesIO
+        _BaseBinaryWrapper.__init__(self, stream)
@@ -1,9 +1,18 @@
+import functools
 import logging
 from typing import *
-import ndspy.lz10 as lz10
+import ndspy.lz10
+from formats import conf
 from formats.compression import rle, huffman
+from formats.compression.cache import DecompressionCache
 import struct
 
+try:
+    # Compiled LZ10 codec, built with the other cython sources by setup.py
+    from formats.compression import lz10
+except ImportError:
+    lz10 = ndspy.lz10
+
 # Compression containers
 LZ10 = 0x10
 RLE = 0x30
@@ -17,41 +26,115 @@ SECOND_TYPES = {
     HUFF8BIT: 4
 }
 
+decompression_cache = DecompressionCache(conf.DECOMPRESSION_CACHE_SIZE)
+"""Process wide cache of the decompressed data, see DecompressionCache.stats for its statistics."""
+
+_codecs: Dict[int, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes], Callable[[bytes], bytes],
+                         Callable[[bytes], Iterator[bytes]]]] = {}
+
+
+def register_codec(compression_type: int, compress_function: Callable[[bytes], bytes],
+                   decompress_function: Callable[[bytes], bytes],
+                   compress_max_function: Optional[Callable[[bytes], bytes]] = None,
+                   decompress_iter_function: Optional[Callable[[bytes], Iterator[bytes]]] = None):
+    """
+    Registers the functions used to compress and decompress a compression type.
+
+    Registering an already registered type replaces its codec.
+
+    Parameters
+    ----------
+    compression_type : int
+        The compression type (LZ10, RLE, HUFF8BIT, HUFF4BIT).
+    compress_function : Callable[[bytes], bytes]
+        Function compressing the data, including the compression header.
+    decompress_function : Callable[[bytes], bytes]
+        Function decompressing the data, starting at the compression header.
+    compress_max_function : Optional[Callable[[bytes], bytes]]
+        Slower function compressing the data as small as possible. Defaults to compress_function.
+    decompress_iter_function : Optional[Callable[[bytes], Iterator[bytes]]]
+        Function decompressing the data incrementally, yielding the decompressed data in chunks.
+        Defaults to yielding the result of decompress_function at once.
+    """
+    if decompress_iter_function is None:
+        def decompress_iter_function(data: bytes) -> Iterator[bytes]:
+            yield decompress_function(data)
+    _codecs[compression_type] = (compress_function, decompress_function, compress_max_function or compress_function,
+                                 decompress_iter_function)
+    decompression_cache.clear()
+
 
-def compress(data: bytes, compression_type=LZ10, double_typed: bool = None) -> bytes:
+register_codec(LZ10, lz10.compress, lz10.decompress, getattr(lz10, "compress_optimal", None),
+               getattr(lz10, "decompress_iter", None))
+register_codec(RLE, rle.compress, rle.decompress, decompress_iter_function=rle.decompress_iter)
+register_codec(HUFF8BIT, functools.partial(huffman.compress, datablock_size=8), huffman.decompress,
+               decompress_iter_function=huffman.decompress_iter)
+register_codec(HUFF4BIT, functools.partial(huffman.compress, datablock_size=4), huffman.decompress,
+               decompress_iter_function=huffman.decompress_iter)
+
+
+def compress(data: bytes, compression_type=LZ10, double_typed: bool = None, max_compression: bool = False) -> bytes:
     if not data:
         return b""
     if double_typed is None:
         logging.warning("Compressing file without knowing if it's double typed, defaulting to not.")
         double_typed = False
-    other_type = struct.pack("<I", SECOND_TYPES[compression_type]) if double_typed else b""
-    if compression_type == LZ10:
-        return other_type + lz10.compress(data)
-    elif compression_type == RLE:
-        return other_type + rle.compress(data)
-    elif compression_type == HUFF8BIT:
-        return other_type + huffman.compress(data, 8)
-    elif compression_type == HUFF4BIT:
-        return other_type + huffman.compress(data, 4)
-    else:
+    if compression_type not in _codecs:
         raise NotImplementedError(f"compression type: {hex(compression_type)}")
+    other_type = struct.pack("<I", SECOND_TYPES[compression_type]) if double_typed else b""
+    compress_function = _codecs[compression_type][2 if max_compression else 0]
+    return other_type + compress_function(data)
 
 
-def decompress(data: bytes, double_typed: bool = None) -> Tuple[bytes, bool]:
-    if not data:
-        return b"", double_typed
+def _split_header(data: bytes, double_typed: Optional[bool]) -> Tuple[bytes, bool]:
+    # Removes the second type of double typed data, detecting it if double_typed is None
     if double_typed is None:
-        first_word = struct.unpack("<I", data[:4])
+        first_word = struct.unpack("<I", data[:4])[0]
         double_typed = first_word in SECOND_TYPES.values()
     if double_typed:
         data = data[4:]
+    if data[0] not in _codecs:
+        raise NotImplementedError(f"compression type: {hex(data[0])}")
+    return data, double_typed
+
+
+def decompress(data: bytes, double_typed: bool = None) -> Tuple[bytes, bool]:
+    if not data:
+        return b"", double_typed
+    data, double_typed = _split_header(data, double_typed)
     compression_type = data[0]
-    if compression_type == LZ10:
-        ret = lz10.decompress(data), double_typed
-        return ret
-    elif compression_type == RLE:
-        return rle.decompress(data), double_typed
-    elif compression_type in [HUFF8BIT, HUFF4BIT]:
-        return huffman.decompress(data), double_typed
-    else:
-        raise NotImplementedError(f"compression type: {hex(compression_type)}")
+    if not decompression_cache.max_size:
+        return _codecs[compression_type][1](data), double_typed
+
+    key = decompression_cache.key(data)
+    decompressed = decompression_cache.get(key)
+    if decompressed is None:
+        decompressed = bytes(_codecs[compression_type][1](data))
+        decompression_cache.put(key, decompressed)
+    return decompressed, double_typed
+
+
+def decompress_iter(data: bytes, double_typed: bool = None) -> Tuple[Iterator[bytes], bool]:
+    """
+    Decompresses data incrementally, so only the needed part of the data gets decompressed.
+
+    Parameters
+    ----------
+    data : bytes
+        The compressed data.
+    double_typed : bool
+        Whether the data has its compression type specified twice, None to detect it.
+
+    Returns
+    -------
+    Tuple[Iterator[bytes], bool]
+        An iterator of the consecutive chunks of the decompressed data and whether the data is double typed.
+    """
+    if not data:
+        return iter(()), double_typed
+    data, double_typed = _split_header(data, double_typed)
+    if decompression_cache.max_size:
+        decompressed = decompression_cache.get(decompression_cache.key(data))
+        if decompressed is not None:
+            return iter((decompressed,)), double_typed
+    return _codecs[data[0]][3](data), double_typed
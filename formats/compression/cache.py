@@ -0,0 +1,91 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import *
+
+
+class DecompressionCache:
+    """
+    Least recently used cache of decompressed data, keyed by a hash of the compressed data.
+
+    The cached data is immutable bytes, so it's shared between every user of the same compressed data.
+    """
+
+    def __init__(self, max_size: int):
+        """
+        Parameters
+        ----------
+        max_size : int
+            Maximum total size in bytes of the decompressed data kept, 0 disables the cache.
+        """
+        self.max_size = max_size
+        self.size = 0
+        """Total size in bytes of the decompressed data kept."""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[bytes, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(data: bytes) -> bytes:
+        """
+        Returns the key of some compressed data.
+        """
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """
+        Returns the decompressed data for the key, or None if it isn't cached.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: bytes, value: bytes):
+        """
+        Caches the decompressed data for the key, evicting the least recently used data over the size budget.
+        """
+        if len(value) > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = value
+            self.size += len(value)
+            self._evict(self.max_size)
+
+    def resize(self, max_size: int):
+        """
+        Changes the size budget of the cache, evicting data if needed.
+        """
+        with self._lock:
+            self.max_size = max_size
+            self._evict(max_size)
+
+    def clear(self):
+        """
+        Removes all the cached data. The statistics are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the statistics of the cache, used to tune its size budget.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "size": self.size, "max_size": self.max_size}
+
+    def _evict(self, max_size: int):
+        while self.size > max_size:
+            _, value = self._entries.popitem(last=False)
+            self.size -= len(value)
+            self.evictions += 1
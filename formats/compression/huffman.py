@@ -1,245 +1,274 @@
-from formats.binary import BinaryReader, BinaryWriter
+import heapq
+import itertools
+import struct
+
+import numpy as np
+
 from typing import *
 
 
-class HuffTreeNode:
-    def __init__(self, is_data: bool, data: Optional[int] = None, parent=None, child0=None, child1=None):
-        self.is_data: bool = is_data
-        self.data: Optional[int] = data
-        self.parent: Optional[HuffTreeNode] = parent
-        self.child0: Optional[HuffTreeNode] = child0
-        self.child1: Optional[HuffTreeNode] = child1
-        if self.child0:
-            self.child0.parent = self
-        if self.child1:
-            self.child1.parent = self
-
-    @classmethod
-    def from_rdr(cls, rdr: BinaryReader, is_data: bool, relative_offset, max_stream_pos, parent=None):
-        self = cls(is_data, parent=parent)
-        if rdr.c >= max_stream_pos:
-            return
-        self.data = rdr.read_uint8()
-        if not is_data:
-            offset = self.data & 0x3F
-            zero_is_data = (self.data & 0x80) > 0
-            one_is_data = (self.data & 0x40) > 0
-
-            # off AND NOT == off XOR (off AND 1)
-            zero_rel_offset = (relative_offset ^ (relative_offset & 1)) + offset * 2 + 2
-
-            curr_stream_pos = rdr.c
-
-            rdr.c += (zero_rel_offset - relative_offset) - 1
-
-            # Node after 0
-            self.child0 = HuffTreeNode.from_rdr(
-                rdr, zero_is_data, zero_rel_offset, max_stream_pos, parent=self)
-            # Node after 1 directly located after the node after 0
-            self.child1 = HuffTreeNode.from_rdr(
-                rdr, one_is_data, zero_rel_offset + 1, max_stream_pos, parent=self)
-
-            # reset stream
-            rdr.c = curr_stream_pos
-        return self
-
-    def to_wtr(self, wtr: BinaryWriter):
-        queue: List[HuffTreeNode] = [self]
-        while len(queue):
-            node: HuffTreeNode = queue[0]
-            queue = queue[1:]
-            if node.is_data:
-                wtr.write_ubyte(node.data)
-            else:
-                data = (len(queue) // 2) & 0x3f
-                if node.child0.is_data:
-                    data |= 0x80
-                if node.child1.is_data:
-                    data |= 0x40
-                wtr.write_ubyte(data)
-                queue.append(node.child0)
-                queue.append(node.child1)
-
-    @property
-    def depth(self):
-        if self.parent:
-            return self.parent.depth + 1
-        return 0
-
-    @property
-    def is_child1(self) -> bool:
-        return self.parent.child1 == self
-
-    @property
-    def is_filled(self):
-        return self.data is None
+# A huffman tree is a symbol (leaf) or a pair of trees (internal node), child0 first.
+HuffTree = Union[int, Tuple["HuffTree", "HuffTree"]]
 
 
-def compress(input_data: bytes, datablock_size=None) -> bytes:
-    if datablock_size is None:
-        # Return the smallest we can
-        return min(compress(input_data, 4), compress(input_data, 8), key=lambda x: len(x))
+def _frequencies(input_data: bytes, datablock_size: int) -> np.ndarray:
+    data = np.frombuffer(input_data, dtype=np.uint8)
+    if datablock_size == 8:
+        return np.bincount(data, minlength=0x100)
+    return np.bincount(data & 0xF, minlength=0x10) + np.bincount(data >> 4, minlength=0x10)
 
-    assert datablock_size in [4, 8]
 
-    wtr = BinaryWriter()
+def _build_tree(frequencies: np.ndarray) -> HuffTree:
+    order = itertools.count()  # tie breaker, keeps the tree deterministic
+    heap = [(int(frequency), next(order), symbol) for symbol, frequency in enumerate(frequencies) if frequency]
+    for symbol in (0, 1):
+        if len(heap) >= 2:
+            break
+        if all(node[2] != symbol for node in heap):  # Add an unused leaf to make a tree possible
+            heap.append((0, next(order), symbol))
+    heapq.heapify(heap)
 
-    wtr.write_uint8(0x20 | datablock_size)  # huffman identifier
+    while len(heap) > 1:
+        freq0, _, child0 = heapq.heappop(heap)
+        freq1, _, child1 = heapq.heappop(heap)
+        heapq.heappush(heap, (freq0 + freq1, next(order), (child0, child1)))
+    return heap[0][2]
 
-    wtr.write_uint24(len(input_data) if len(input_data) < 0xffffff else 0)
-    if len(input_data) > 0xffffff:
-        wtr.write_uint32(len(input_data))
 
-    # build frequency table
-    frequencies = [0 for _ in range(0x100 if datablock_size == 8 else 0x10)]
-    for b in input_data:
-        if datablock_size == 8:
-            frequencies[b] += 1
-        else:
-            b0, b1 = b & 0xf, b >> 4
-            frequencies[b0] += 1
-            frequencies[b1] += 1
+def _code_lengths(tree: HuffTree, depth=0, lengths=None) -> Dict[int, int]:
+    if lengths is None:
+        lengths = {}
+    if isinstance(tree, tuple):
+        _code_lengths(tree[0], depth + 1, lengths)
+        _code_lengths(tree[1], depth + 1, lengths)
+    else:
+        lengths[tree] = depth
+    return lengths
+
+
+def _tree_size(tree: HuffTree, header_size: int) -> int:
+    # One byte per node plus the tree size byte, padded so the bitstream stays word aligned.
+    node_count = 2 * len(_code_lengths(tree)) - 1
+    size = node_count + 1
+    return size + (-(header_size + size) % 4)
+
+
+def _header_size(input_size: int) -> int:
+    # A size of 0 in the short header means the size is in the next word, so empty data needs the long header
+    return 4 if 0 < input_size <= 0xFFFFFF else 8
+
+
+def _encoded_size(input_data: bytes, datablock_size: int) -> int:
+    """Exact size huffman compression would produce, computed from the frequency table alone."""
+    frequencies = _frequencies(input_data, datablock_size)
+    tree = _build_tree(frequencies)
+    bit_count = sum(int(frequencies[symbol]) * length for symbol, length in _code_lengths(tree).items())
+    header_size = _header_size(len(input_data))
+    return header_size + _tree_size(tree, header_size) + (bit_count + 31) // 32 * 4
+
+
+def _serialize_tree(tree: HuffTree) -> Tuple[bytearray, Dict[int, str]]:
+    """
+    Lay out the tree as the node table expected by the decoder.
+
+    The root is stored alone, every other node is stored in a pair with its sibling. A node only has
+    6 bits to point to the pair of its children, which must come at most 64 pairs after its own pair,
+    so pairs are placed depth first (keeping them close to their parents) unless that would make
+    some pending pair miss its deadline, in which case the most urgent pair is placed instead.
+
+    Returns the node table (starting with the root) and the code of each symbol as a string of bits.
+    """
+    # The root is at pair 0, its children are at pair 1.
+    nodes = bytearray(1)
+    codes: Dict[int, str] = {}
+    if not isinstance(tree, tuple):
+        raise ValueError("The root of a huffman tree must be an internal node")
+
+    # (deadline, pair, index in nodes, code, node) of the internal nodes whose children aren't placed yet
+    pending = [(64, 0, 0, "", tree)]
+    pair = 0
+    while pending:
+        pair += 1
+        candidate = pending.pop()
+        children = [(pair + 64, pair, 0, "", child) for child in candidate[4] if isinstance(child, tuple)]
+        deadlines = sorted(item[0] for item in itertools.chain(pending, children))
+        if any(deadline < pair + 1 + i for i, deadline in enumerate(deadlines)):
+            pending.append(candidate)
+            candidate = pending.pop(min(range(len(pending)), key=lambda i: pending[i][0]))
+        deadline, parent_pair, parent_index, code, node = candidate
+        if pair > deadline:
+            raise ValueError("Could not fit the huffman tree offsets")
+
+        flags = pair - parent_pair - 1
+        for bit, child in enumerate(node):
+            child_code = code + str(bit)
+            if isinstance(child, tuple):
+                pending.append((pair + 64, pair, len(nodes), child_code, child))
+                nodes.append(0)  # filled in when the children of this node are placed
+            else:
+                flags |= 0x80 >> bit
+                codes[child] = child_code
+                nodes.append(child)
+        nodes[parent_index] = flags
+    return nodes, codes
 
-    # build the huffman tree
-    node_count = 0
-    leaf_queue = []
-    node_queue = []
-    leaves: List[Optional[HuffTreeNode]] = [None for _ in range(0x100 if datablock_size == 8 else 0x10)]
-    for i in range(0x10 if datablock_size == 4 else 0x100):
-        if frequencies[i] == 0:
-            continue
-        node = HuffTreeNode(True, data=i)
-        leaves[i] = node
-        leaf_queue.append((frequencies[i], node))
-        node_count += 1
-
-    if len(leaf_queue) < 2:  # Add an unused node to make it possible
-        node = HuffTreeNode(True, data=0)
-        leaves[0] = node
-        leaf_queue.append((1, node))
-        node_count += 1
-
-    def take_lowest(queue0: List[Tuple[int, HuffTreeNode]],
-                    queue1: List[Tuple[int, HuffTreeNode]]) -> Tuple[int, HuffTreeNode]:
-        if queue0:
-            lowest_queue0 = min(queue0, key=lambda x: x[0])
-        elif queue1:
-            lowest_queue1 = min(queue1, key=lambda x: x[0])
-            queue1.remove(lowest_queue1)
-            return lowest_queue1
-        else:
-            raise ValueError("take_lowest() arg are empty sequences")
-        if queue1:
-            lowest_queue1 = min(queue1, key=lambda x: x[0])
-        else:
-            queue0.remove(lowest_queue0)
-            return lowest_queue0
-        if lowest_queue0[0] < lowest_queue1[0]:
-            queue0.remove(lowest_queue0)
-            return lowest_queue0
-        else:
-            queue1.remove(lowest_queue1)
-            return lowest_queue1
 
-    while len(leaf_queue) + len(node_queue) > 1:
-        one_prio, one = take_lowest(leaf_queue, node_queue)
-        two_prio, two = take_lowest(leaf_queue, node_queue)
+def compress(input_data: bytes, datablock_size=None) -> bytes:
+    if datablock_size is None:
+        # Return the smallest we can, the sizes are known before encoding anything
+        datablock_size = min((4, 8), key=lambda size: _encoded_size(input_data, size))
 
-        newnode = HuffTreeNode(False, child0=one, child1=two)
-        node_queue.append((one_prio + two_prio, newnode))
-        node_count += 1
+    assert datablock_size in [4, 8]
 
-    root: HuffTreeNode = node_queue[0][1]
+    header_size = _header_size(len(input_data))
+    header = bytearray(struct.pack("<I", 0x20 | datablock_size | len(input_data) << 8))  # huffman identifier
+    if header_size == 8:
+        header = bytearray(struct.pack("<II", 0x20 | datablock_size, len(input_data)))
+
+    # build the huffman tree
+    tree = _build_tree(_frequencies(input_data, datablock_size))
+    nodes, codes = _serialize_tree(tree)
 
     # write the huffman tree
-    wtr.write_uint8((node_count - 1) // 2)
-    root.to_wtr(wtr)
-
-    datablock = 0
-    bits_left = 32
-    cached_byte = 0
-    for i in range(len(input_data) * (2 if datablock_size == 4 else 1)):
-        if datablock_size == 4:
-            if i & 1 == 0:
-                cached_byte = input_data[i // 2]
-                data = cached_byte & 0xf
-            else:
-                data = cached_byte >> 4
+    tree_size = _tree_size(tree, header_size)
+    header.append(tree_size // 2 - 1)
+    header += nodes
+    header += bytes(header_size + tree_size - len(header))
+
+    # precomputed codes of every byte value (both nibbles, low first, for 4 bit blocks)
+    if datablock_size == 8:
+        byte_codes = [codes.get(b, "") for b in range(0x100)]
+    else:
+        byte_codes = [codes.get(b & 0xF, "") + codes.get(b >> 4, "") for b in range(0x100)]
+
+    bits = "".join(map(byte_codes.__getitem__, input_data))
+    word_count = (len(bits) + 31) // 32
+    if not word_count:
+        return bytes(header)
+    bits = bits.ljust(word_count * 32, "0")
+    # The bits are read starting from the most significant bit of little endian words
+    stream = np.frombuffer(int(bits, 2).to_bytes(word_count * 4, "big"), dtype=">u4").astype("<u4")
+    return bytes(header) + stream.tobytes()
+
+
+def _walk_probe(tree: bytes, node: int, probe: int) -> Tuple[bytes, int]:
+    # Follow the 8 bits of probe (MSB first) starting at the internal node at tree[node].
+    # Returns the symbols reached on the way and the internal node we end up at.
+    # Node positions are relative to the tree size byte, so the root is always at 1.
+    symbols = bytearray()
+    for bit in range(7, -1, -1):
+        value = tree[node]
+        child = (node & ~1) + (value & 0x3F) * 2 + 2
+        if (probe >> bit) & 1:
+            child += 1
+            is_data = value & 0x40
         else:
-            data = input_data[i]
-
-        node = leaves[data]
-        depth = node.depth
-        path: List[bool] = [False for _ in range(depth)]
-        for d in range(depth):
-            path[depth - d - 1] = node.is_child1
-            node = node.parent
-        for p in path:
-            if bits_left == 0:
-                wtr.write_uint32(datablock)
-                datablock = 0
-                bits_left = 32
-            bits_left -= 1
-            if p:
-                datablock |= 1 << bits_left
-    if bits_left != 32:
-        wtr.write_uint32(datablock)
-    return wtr.getvalue()
+            is_data = value & 0x80
+        if child >= len(tree):
+            raise Exception("Huffman tree node points outside of the tree")
+        if is_data:
+            symbols.append(tree[child])
+            node = 1
+        else:
+            node = child
+    return bytes(symbols), node
 
 
-def decompress(data: bytes) -> bytes:
-    rdr = BinaryReader(data)
-    wtr = BinaryWriter()
-    compression_type = rdr.read_uint8()
+def _read_header(data: memoryview) -> Tuple[int, int, bytes, int]:
+    """Returns the block size, the decompressed size, the tree and the position of the bitstream."""
+    compression_type = data[0]
     if compression_type == 0x24:
         blocksize = 4
     elif compression_type == 0x28:
         blocksize = 8
     else:
         raise Exception("Tried to decompress something as huffman that isn't huffman")
-    ds = rdr.read_uint24()
+    ds = data[1] | data[2] << 8 | data[3] << 16
+    pos = 4
     if ds == 0:
-        rdr.read_uint32()
+        ds = struct.unpack_from("<I", data, pos)[0]
+        pos += 4
 
     # Read the tree
-    treesize = (rdr.read_uint8() + 1) * 2
-    tree_end = (rdr.c - 1) + treesize
-    root_node = HuffTreeNode.from_rdr(rdr, False, 5, tree_end)
-    rdr.c = tree_end
-
-    # Decompress with the tree
-    bitsleft = 0  # amount of bits left to read from {commands}
-    current_size = 0
-    current_node = root_node
-
-    cashedbyte = -1
-
-    while current_size < ds:
-        # Find next reference to commands node
-        while not current_node.is_data:
-            if bitsleft == 0:
-                data = rdr.read_uint32()
-                bitsleft = 32
-
-            bitsleft -= 1
-            next_is_one = (data & (1 << bitsleft)) != 0
-            if next_is_one:
-                current_node = current_node.child1
-            else:
-                current_node = current_node.child0
+    treesize = (data[pos] + 1) * 2
+    tree = bytes(data[pos:pos + treesize])
+    return blocksize, ds, tree, pos + treesize
+
+
+def _decoder(data: bytes) -> Tuple[int, int, Callable[[int], bytearray]]:
+    """
+    Returns the block size, the decompressed size and a function decoding the next symbols of the data.
+
+    The stream is decoded one byte per probe, with the symbols and the node reached by each (node, probe) pair
+    cached. The little endian words of the stream are swapped to MSB first bytes one block at a time, as the
+    symbols are needed.
+    """
+    data = memoryview(data)
+    blocksize, ds, tree, pos = _read_header(data)
+    end = pos + (len(data) - pos) // 4 * 4
+    # (node, probe) -> (symbols, next node), filled lazily as probes are seen.
+    probes: Dict[int, Tuple[bytes, int]] = {}
+    node = 1
+    leftover = bytearray()  # Symbols decoded past the previous count
+    start = pos
+    decoded_count = 0
+
+    def decode(count: int) -> bytearray:
+        nonlocal pos, node, leftover, decoded_count
+        symbols, leftover = leftover, bytearray()
+        while len(symbols) < count and pos < end:
+            # Size of the stream holding the symbols left, estimated from the bytes per symbol so far
+            size = (count - len(symbols)) * (pos - start) // decoded_count if decoded_count else count - len(symbols)
+            block_end = min(pos + min(max(size + 4 & ~3, 0x40), 0x10000), end)
+            block_start = len(symbols)
+            stream = np.frombuffer(data[pos:block_end], dtype="<u4").byteswap().tobytes()
+            pos = block_end
+            node_ = node
+            for probe in stream:
+                key = node_ << 8 | probe
+                entry = probes.get(key)
+                if entry is None:
+                    entry = probes[key] = _walk_probe(tree, node_, probe)
+                decoded, node_ = entry
+                symbols += decoded
+            node = node_
+            decoded_count += len(symbols) - block_start
+        leftover = symbols[count:]
+        del symbols[count:]
+        return symbols
+
+    return blocksize, ds, decode
+
+
+def _symbols_to_bytes(symbols: bytearray, blocksize: int) -> bytes:
+    if blocksize == 4:
+        del symbols[len(symbols) & ~1:]  # A truncated stream can end with a lone low nibble
+        nibbles = np.frombuffer(symbols, dtype=np.uint8)
+        return (nibbles[0::2] | (nibbles[1::2] << 4)).tobytes()
+    return bytes(symbols)
 
-        if blocksize == 8:
-            current_size += 1
-            wtr.write_uint8(current_node.data)
 
-        elif blocksize == 4:
-            if cashedbyte < 0:
-                cashedbyte = current_node.data
-            else:
-                cashedbyte |= current_node.data << 4
-                wtr.write_uint8(cashedbyte)
-                current_size += 1
-                cashedbyte = -1
-        current_node = root_node
-
-    return wtr.data
+def decompress(data: bytes) -> bytes:
+    blocksize, ds, decode = _decoder(data)
+    return _symbols_to_bytes(decode(ds * 2 if blocksize == 4 else ds), blocksize)
+
+
+def decompress_iter(data: bytes, chunk_size: int = 0x40) -> Iterator[bytes]:
+    """
+    Decompress huffman data incrementally.
+
+    Yields the decompressed data in chunks, starting with about chunk_size bytes and doubling
+    the size of each chunk (up to 64 KiB), so reading only the start of a file is cheap.
+    """
+    blocksize, ds, decode = _decoder(data)
+    symbols_per_byte = 2 if blocksize == 4 else 1
+    remaining = ds
+    while remaining:
+        # Chunks of whole bytes, the decoder never returns symbols past the end of the data
+        symbols = decode(min(chunk_size, remaining) * symbols_per_byte)
+        chunk = _symbols_to_bytes(symbols, blocksize)
+        if not chunk:
+            return  # Truncated stream
+        yield chunk
+        remaining -= len(chunk)
+        chunk_size = min(chunk_size * 2, 0x10000)
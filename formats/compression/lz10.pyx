@@ -0,0 +1,343 @@
+import cython
+from libc.stdlib cimport malloc, free
+
+
+cdef enum:
+    WINDOW_SIZE = 0x1000
+    MAX_MATCH = 18
+    HASH_SIZE = 1 << 15
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.exceptval(False)
+cdef inline int hash3(const unsigned char[:] data, Py_ssize_t pos) nogil:
+    return ((data[pos] << 7) ^ (data[pos + 1] << 4) ^ data[pos + 2]) & (HASH_SIZE - 1)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def compress(const unsigned char[:] data):
+    """
+    Compress data in LZ10 format.
+
+    Produces the same output as ndspy.lz10.compress: the longest match (which can't overlap the
+    current position) is taken, using the oldest position of the window on ties.
+    Matches are found through hash chains of the 3 first bytes, walked from the oldest position.
+    """
+    cdef Py_ssize_t n = data.shape[0]
+    if n > 0xFFFFFF:
+        raise ValueError("Data too big for LZ10 compression")
+
+    # A group is a flag byte and at most 8 blocks of 2 bytes, as the last group is padded with zeros when the data
+    # ends in it, which can take more than the size of the data
+    out = bytearray(4 + 17 * ((n + 7) // 8))
+    cdef unsigned char[:] result = out
+    result[0] = 0x10
+    result[1] = n & 0xFF
+    result[2] = (n >> 8) & 0xFF
+    result[3] = (n >> 16) & 0xFF
+
+    # first: oldest position in the window for each hash, next_same: following position with the same hash
+    cdef int* first = <int*> malloc(HASH_SIZE * sizeof(int))
+    cdef int* last = <int*> malloc(HASH_SIZE * sizeof(int))
+    cdef int* next_same = <int*> malloc((n + 1) * sizeof(int))
+    if first == NULL or last == NULL or next_same == NULL:
+        free(first)
+        free(last)
+        free(next_same)
+        raise MemoryError()
+
+    cdef Py_ssize_t out_pos = 4, flags_pos, current = 0, inserted = 0
+    cdef Py_ssize_t start, max_len, limit, length, best_len, best_pos, disp
+    cdef int candidate, h, i
+    cdef unsigned char flags
+
+    try:
+        for i in range(HASH_SIZE):
+            first[i] = -1
+            last[i] = -1
+
+        while current < n:
+            flags_pos = out_pos
+            out_pos += 1
+            flags = 0
+            for i in range(8):
+                if current >= n:
+                    result[out_pos] = 0
+                    out_pos += 1
+                    continue
+
+                # Matches can't overlap the current position, so only positions 3 bytes behind are candidates
+                while inserted + 3 <= current:
+                    h = hash3(data, inserted)
+                    if first[h] == -1:
+                        first[h] = inserted
+                    else:
+                        next_same[last[h]] = inserted
+                    next_same[inserted] = -1
+                    last[h] = inserted
+                    inserted += 1
+
+                best_len = 0
+                best_pos = 0
+                max_len = min(<Py_ssize_t> MAX_MATCH, n - current)
+                if max_len >= 3:
+                    start = max(<Py_ssize_t> 0, current - WINDOW_SIZE)
+                    h = hash3(data, current)
+                    candidate = first[h]
+                    while candidate != -1 and candidate < start:
+                        candidate = next_same[candidate]
+                    first[h] = candidate
+
+                    while candidate != -1:
+                        limit = min(max_len, current - candidate)
+                        length = 0
+                        while length < limit and data[candidate + length] == data[current + length]:
+                            length += 1
+                        if length > best_len:
+                            best_len = length
+                            best_pos = candidate
+                            if best_len == max_len:
+                                break
+                        candidate = next_same[candidate]
+
+                if best_len > 2:
+                    flags |= 0x80 >> i
+                    disp = current - best_pos - 1
+                    result[out_pos] = ((best_len - 3) << 4) | (disp >> 8)
+                    result[out_pos + 1] = disp & 0xFF
+                    out_pos += 2
+                    current += best_len
+                else:
+                    result[out_pos] = data[current]
+                    out_pos += 1
+                    current += 1
+            result[flags_pos] = flags
+    finally:
+        free(first)
+        free(last)
+        free(next_same)
+
+    return bytes(out[:out_pos])
+
+
+cdef class _Decompressor:
+    """
+    LZ10 decompression which can be stopped and resumed at the end of any flag block.
+    """
+    cdef const unsigned char[:] data
+    cdef unsigned char[:] result
+    cdef readonly bytearray out
+    cdef readonly Py_ssize_t size, out_pos
+    cdef Py_ssize_t in_pos
+
+    def __init__(self, const unsigned char[:] data):
+        if data.shape[0] < 4 or data[0] != 0x10:
+            raise TypeError("This isn't a LZ10-compressed file.")
+        self.data = data
+        self.size = data[1] | data[2] << 8 | data[3] << 16
+        self.out = bytearray(self.size)
+        self.result = self.out
+        self.in_pos = 4
+        self.out_pos = 0
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef int run(self, Py_ssize_t target) except -1:
+        # Decompress flag blocks until at least target bytes (or the whole file) are decompressed
+        cdef const unsigned char[:] data = self.data
+        cdef unsigned char[:] result = self.result
+        cdef Py_ssize_t n = data.shape[0], size = self.size
+        cdef Py_ssize_t in_pos = self.in_pos, out_pos = self.out_pos, length, disp, end
+        cdef unsigned char flags
+        cdef int i
+
+        target = min(target, size)
+        try:
+            while out_pos < target:
+                if in_pos >= n:
+                    raise ValueError("LZ10 data ended before the end of the file")
+                flags = data[in_pos]
+                in_pos += 1
+                for i in range(8):
+                    if out_pos >= size:
+                        break
+                    if flags & 0x80:
+                        if in_pos + 1 >= n:
+                            raise ValueError("LZ10 data ended before the end of the file")
+                        length = (data[in_pos] >> 4) + 3
+                        disp = (((data[in_pos] & 0xF) << 8) | data[in_pos + 1]) + 1
+                        in_pos += 2
+                        if disp > out_pos:
+                            raise ValueError("LZ10 reference before the start of the file")
+                        end = min(out_pos + length, size)
+                        while out_pos < end:
+                            result[out_pos] = result[out_pos - disp]
+                            out_pos += 1
+                    else:
+                        if in_pos >= n:
+                            raise ValueError("LZ10 data ended before the end of the file")
+                        result[out_pos] = data[in_pos]
+                        in_pos += 1
+                        out_pos += 1
+                    flags <<= 1
+        finally:
+            self.in_pos = in_pos
+            self.out_pos = out_pos
+        return 0
+
+
+def decompress(const unsigned char[:] data):
+    """
+    Decompress LZ10-compressed data.
+    """
+    decompressor = _Decompressor(data)
+    decompressor.run(decompressor.size)
+    return bytes(decompressor.out)
+
+
+def decompress_iter(data, Py_ssize_t chunk_size=0x40):
+    """
+    Decompress LZ10-compressed data incrementally.
+
+    Yields the decompressed data in chunks, starting with about chunk_size bytes and doubling
+    the size of each chunk (up to 64 KiB), so reading only the start of a file is cheap.
+    """
+    cdef _Decompressor decompressor = _Decompressor(data)
+    cdef Py_ssize_t start
+    while decompressor.out_pos < decompressor.size:
+        start = decompressor.out_pos
+        decompressor.run(start + chunk_size)
+        chunk_size = min(chunk_size * 2, 0x10000)
+        yield bytes(decompressor.out[start:decompressor.out_pos])
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def compress_optimal(const unsigned char[:] data):
+    """
+    Compress data in LZ10 format, choosing the matches with an optimal parse.
+
+    The longest match at every position is found first. Matches may overlap the current position,
+    but never refer to the byte just before it so the output is also safe for VRAM decompression.
+    The cheapest sequence of literals (9 bits) and matches (17 bits) is then chosen as the shortest
+    path from the end of the data. The last flag block isn't padded with zeros, decoders stop
+    at the decompressed size.
+
+    Much slower than compress, gives smaller output.
+    """
+    cdef Py_ssize_t n = data.shape[0]
+    if n > 0xFFFFFF:
+        raise ValueError("Data too big for LZ10 compression")
+
+    out = bytearray(4 + 17 * ((n + 7) // 8))
+    cdef unsigned char[:] result = out
+    result[0] = 0x10
+    result[1] = n & 0xFF
+    result[2] = (n >> 8) & 0xFF
+    result[3] = (n >> 16) & 0xFF
+
+    cdef int* first = <int*> malloc(HASH_SIZE * sizeof(int))
+    cdef int* last = <int*> malloc(HASH_SIZE * sizeof(int))
+    cdef int* next_same = <int*> malloc((n + 1) * sizeof(int))
+    cdef unsigned char* match_len = <unsigned char*> malloc((n + 1) * sizeof(unsigned char))
+    cdef unsigned short* match_disp = <unsigned short*> malloc((n + 1) * sizeof(unsigned short))
+    cdef int* cost = <int*> malloc((n + 1) * sizeof(int))
+    cdef unsigned char* choice = <unsigned char*> malloc((n + 1) * sizeof(unsigned char))
+    if first == NULL or last == NULL or next_same == NULL or match_len == NULL or match_disp == NULL or \
+            cost == NULL or choice == NULL:
+        free(first)
+        free(last)
+        free(next_same)
+        free(match_len)
+        free(match_disp)
+        free(cost)
+        free(choice)
+        raise MemoryError()
+
+    cdef Py_ssize_t out_pos = 4, flags_pos, current, inserted = 0
+    cdef Py_ssize_t start, max_len, length, best_len, best_pos, disp
+    cdef int candidate, h, i, token_cost
+
+    try:
+        for i in range(HASH_SIZE):
+            first[i] = -1
+            last[i] = -1
+
+        # Longest match at every position
+        for current in range(n):
+            while inserted + 2 <= current and inserted + 3 <= n:
+                h = hash3(data, inserted)
+                if first[h] == -1:
+                    first[h] = inserted
+                else:
+                    next_same[last[h]] = inserted
+                next_same[inserted] = -1
+                last[h] = inserted
+                inserted += 1
+
+            best_len = 0
+            best_pos = 0
+            max_len = min(<Py_ssize_t> MAX_MATCH, n - current)
+            if max_len >= 3:
+                start = max(<Py_ssize_t> 0, current - WINDOW_SIZE)
+                h = hash3(data, current)
+                candidate = first[h]
+                while candidate != -1 and candidate < start:
+                    candidate = next_same[candidate]
+                first[h] = candidate
+
+                while candidate != -1:
+                    length = 0
+                    while length < max_len and data[candidate + length] == data[current + length]:
+                        length += 1
+                    if length >= best_len:
+                        best_len = length
+                        best_pos = candidate
+                        if best_len == max_len:
+                            break
+                    candidate = next_same[candidate]
+            match_len[current] = best_len if best_len >= 3 else 0
+            match_disp[current] = current - best_pos - 1
+
+        # Cheapest encoding of every suffix of the data
+        cost[n] = 0
+        for current in range(n - 1, -1, -1):
+            cost[current] = cost[current + 1] + 9
+            choice[current] = 1
+            for length in range(3, match_len[current] + 1):
+                token_cost = cost[current + length] + 17
+                if token_cost < cost[current]:
+                    cost[current] = token_cost
+                    choice[current] = length
+
+        current = 0
+        while current < n:
+            flags_pos = out_pos
+            out_pos += 1
+            result[flags_pos] = 0
+            for i in range(8):
+                if current >= n:
+                    break
+                length = choice[current]
+                if length > 1:
+                    result[flags_pos] |= 0x80 >> i
+                    disp = match_disp[current]
+                    result[out_pos] = ((length - 3) << 4) | (disp >> 8)
+                    result[out_pos + 1] = disp & 0xFF
+                    out_pos += 2
+                else:
+                    result[out_pos] = data[current]
+                    out_pos += 1
+                current += length
+    finally:
+        free(first)
+        free(last)
+        free(next_same)
+        free(match_len)
+        free(match_disp)
+        free(cost)
+        free(choice)
+
+    return bytes(out[:out_pos])
@@ -1,93 +1,116 @@
-from formats.binary import BinaryReader, BinaryWriter
+import struct
+
+import numpy as np
+
+from typing import *
+
+
+def _write_literals(out: bytearray, data: bytes, start: int, end: int):
+    for block_start in range(start, end, 128):
+        block = data[block_start:min(block_start + 128, end)]
+        out.append(len(block) - 1)
+        out += block
 
 
 def compress(data: bytes):
-    rdr = BinaryReader(data)
-    wtr = BinaryWriter()
-
-    wtr.write_uint8(0x30)  # rle identifier
-
-    wtr.write_uint24(len(data) if len(data) < 0xffffff else 0)
-    if len(data) > 0xffffff:
-        wtr.write_uint32(len(data))
-
-    rep_count = 1
-    current_block_length = 0
-    data_block = [0 for _ in range(130)]
-    while rdr.c < len(rdr.data):
-        found_repetition = False
-        while current_block_length < 130 and rdr.c < len(rdr.data):
-            next_byte = rdr.read_uint8()
-            data_block[current_block_length] = next_byte
-            current_block_length += 1
-            if current_block_length > 1:
-                if next_byte == data_block[current_block_length - 2]:
-                    rep_count += 1
-                else:
-                    rep_count = 1
-            found_repetition = rep_count > 2
-            if found_repetition:
-                break
-        if found_repetition:
-            num_uncomp_to_copy = current_block_length - 3
-        else:
-            num_uncomp_to_copy = min(current_block_length, 130 - 2)
-
-        if num_uncomp_to_copy > 0:
-            flag = num_uncomp_to_copy - 1
-            wtr.write_uint8(flag)
-            for i in range(num_uncomp_to_copy):
-                wtr.write_uint8(data_block[i])
-            for i in range(num_uncomp_to_copy, current_block_length):
-                data_block[i - num_uncomp_to_copy] = data_block[i]
-            current_block_length -= num_uncomp_to_copy
-        if found_repetition:
-            while current_block_length < 130 and rdr.c < len(rdr.data):
-                next_byte = rdr.read_uint8()
-                data_block[current_block_length] = next_byte
-                current_block_length += 1
-                if next_byte != data_block[0]:
-                    break
-                else:
-                    rep_count += 1
-            flag = 0x80 | (rep_count - 3)
-            wtr.write_uint8(flag)
-            wtr.write_uint8(data_block[0])
-            if rep_count != current_block_length:
-                data_block[0] = data_block[current_block_length - 1]
-            current_block_length -= rep_count
-
-    if current_block_length > 0:
-        flag = current_block_length - 1
-        wtr.write_uint8(flag)
-        for i in range(current_block_length):
-            wtr.write_uint8(data_block[i])
-
-    return wtr.data
+    out = bytearray(b"\x30")  # rle identifier
 
+    if len(data) <= 0xffffff:
+        out += struct.pack("<I", len(data))[:3]
+    else:
+        out += bytes(3) + struct.pack("<I", len(data))
 
-def decompress(data: bytes):
-    rdr = BinaryReader(data)
-    wtr = BinaryWriter()
-    type_ = rdr.read_uint8()
-    if type_ != 0x30:
+    # Find every run of equal bytes, runs of 3 or more are worth compressing.
+    src = np.frombuffer(data, dtype=np.uint8)
+    run_starts = np.concatenate(([0], np.flatnonzero(src[1:] != src[:-1]) + 1))
+    run_lengths = np.diff(np.append(run_starts, len(src)))
+    repeated = run_lengths >= 3
+
+    literal_start = 0
+    for start, length in zip(run_starts[repeated].tolist(), run_lengths[repeated].tolist()):
+        _write_literals(out, data, literal_start, start)
+        end = start + length
+        # Runs are at most 130 bytes, a leftover of 1 or 2 bytes goes with the next literals
+        while length >= 3:
+            block_length = min(length, 130)
+            out.append(0x80 | (block_length - 3))
+            out.append(data[start])
+            length -= block_length
+        literal_start = end - length
+    _write_literals(out, data, literal_start, len(data))
+
+    return bytes(out)
+
+
+def _read_header(data: bytes) -> Tuple[int, int]:
+    # Returns the decompressed size and the position of the first block
+    if data[0] != 0x30:
         raise Exception("Tried to decompress commands that isn't RLE")
-    ds = rdr.read_uint24()
-    if ds == 0:
-        rdr.read_uint32()
-
-    while True:
-        flag = rdr.read_uint8()
-        if flag is None:
-            break  # we've hit the end
-        compressed = (flag & 0x80) > 0
-        length = flag & 0x7f
-        length += 3 if compressed else 1
-        if compressed:
-            next_ = rdr.read_uint8()
-            for i in range(length):
-                wtr.write_uint8(next_)
+    ds = data[1] | data[2] << 8 | data[3] << 16
+    pos = 4
+    if ds == 0 and len(data) >= 8:
+        ds = struct.unpack_from("<I", data, pos)[0]
+        pos += 4
+    return ds, pos
+
+
+def decompress(data: bytes):
+    ds, pos = _read_header(data)
+
+    # Parse the flags only, each block becomes (source position, length, is run)
+    sources = []
+    lengths = []
+    runs = []
+    size = 0
+    while size < ds and pos < len(data):
+        flag = data[pos]
+        pos += 1
+        if flag & 0x80:
+            length = (flag & 0x7f) + 3
+            sources.append(pos)
+            pos += 1
+            runs.append(True)
         else:
-            wtr.write(rdr.read(length))
+            length = min((flag & 0x7f) + 1, len(data) - pos)
+            sources.append(pos)
+            pos += length
+            runs.append(False)
+        lengths.append(length)
+        size += length
 
-    return wtr.data
+    # Expand every block at once: runs repeat their source byte, literals copy consecutive bytes.
+    lengths = np.array(lengths, dtype=np.int64)
+    block_starts = np.cumsum(lengths) - lengths
+    steps = np.where(np.array(runs, dtype=bool), 0, 1)
+    offsets = np.arange(size, dtype=np.int64) - np.repeat(block_starts, lengths)
+    indices = np.repeat(np.array(sources, dtype=np.int64), lengths) + offsets * np.repeat(steps, lengths)
+    return np.frombuffer(data, dtype=np.uint8)[indices[:ds]].tobytes()
+
+
+def decompress_iter(data: bytes, chunk_size: int = 0x40) -> Iterator[bytes]:
+    """
+    Decompress RLE data incrementally.
+
+    Yields the decompressed data in chunks, starting with about chunk_size bytes and doubling
+    the size of each chunk (up to 64 KiB), so reading only the start of a file is cheap.
+    """
+    ds, pos = _read_header(data)
+    chunk = bytearray()
+    size = 0
+    while size < ds and pos < len(data):
+        flag = data[pos]
+        pos += 1
+        if flag & 0x80:
+            block = data[pos:pos + 1] * ((flag & 0x7f) + 3)
+            pos += 1
+        else:
+            block = data[pos:pos + (flag & 0x7f) + 1]
+            pos += len(block)
+        chunk += block[:ds - size]
+        size += len(block)
+        if len(chunk) >= chunk_size or size >= ds:
+            yield bytes(chunk)
+            chunk.clear()
+            chunk_size = min(chunk_size * 2, 0x10000)
+    if chunk:
+        yield bytes(chunk)
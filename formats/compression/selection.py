@@ -0,0 +1,133 @@
+import concurrent.futures
+import time
+from dataclasses import dataclass
+from typing import *
+
+from formats.compression import compress, LZ10, RLE, HUFF4BIT, HUFF8BIT
+
+
+@dataclass
+class CompressionChoice:
+    """
+    The compression chosen for a file by a SmallestCompressionPolicy.
+    """
+    name: Optional[str]
+    """Name of the file, if known."""
+    original_type: int
+    """Compression type the file had."""
+    original_size: int
+    """Size of the file compressed with its original type."""
+    chosen_type: int
+    """Compression type which was kept."""
+    chosen_size: int
+    """Size of the file compressed with the chosen type."""
+
+    @property
+    def saved(self) -> int:
+        return self.original_size - self.chosen_size
+
+
+class SmallestCompressionPolicy:
+    """
+    Save-time policy which compresses files with every candidate compression type and keeps the smallest result.
+
+    Only double typed files can change their compression, as their second type tells the game which decompression
+    to use (see SECOND_TYPES). Other files keep their compression type.
+
+    Trial compressions run in a process pool. Set an instance as ``formats.conf.COMPRESSION_POLICY`` to use it for
+    every compressed file saved.
+    """
+
+    def __init__(self, compression_types: Iterable[int] = (LZ10, RLE, HUFF4BIT, HUFF8BIT),
+                 time_budget: Optional[float] = None, max_workers: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        compression_types : Iterable[int]
+            The compression types to try.
+        time_budget : Optional[float]
+            Seconds to wait for the trial compressions of a file, None to wait for all of them.
+            The file is always compressed with its original type, which is kept if the others don't finish in time.
+            Trial compressions already running when the time runs out keep their process until they finish.
+        max_workers : Optional[int]
+            Number of processes used for the trial compressions, defaults to the number of processors.
+        """
+        self.compression_types = list(compression_types)
+        self.time_budget = time_budget
+        self.max_workers = max_workers
+        self.report: List[CompressionChoice] = []
+        """The choices made for every file compressed so far."""
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+    def compress(self, data: bytes, compression_type: int, double_typed: bool, max_compression: bool = False,
+                 name: Optional[str] = None) -> bytes:
+        """
+        Compresses the data with the compression type giving the smallest result.
+
+        Parameters
+        ----------
+        data : bytes
+            The data to compress.
+        compression_type : int
+            The compression type the file currently has.
+        double_typed : bool
+            Whether the file has its compression type specified twice.
+        max_compression : bool
+            Whether to use the slower compression giving the smallest files.
+        name : Optional[str]
+            Name of the file, used in the report.
+
+        Returns
+        -------
+        bytes
+            The compressed data.
+        """
+        candidates = [compression_type]
+        if double_typed:
+            candidates += [other for other in self.compression_types if other != compression_type]
+        if len(candidates) == 1:
+            return compress(data, compression_type, double_typed, max_compression=max_compression)
+
+        start = time.perf_counter()
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(self.max_workers)
+        futures = {candidate: self._executor.submit(compress, data, candidate, double_typed, max_compression)
+                   for candidate in candidates[1:]}
+        # The original type is compressed here while the processes try the others, it's kept if they run late
+        results = {compression_type: compress(data, compression_type, double_typed,
+                                              max_compression=max_compression)}
+        for candidate, future in futures.items():
+            timeout = None
+            if self.time_budget is not None:
+                timeout = max(0.0, start + self.time_budget - time.perf_counter())
+            try:
+                results[candidate] = future.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+            except Exception:
+                # A failed trial compression isn't chosen
+                pass
+
+        # Keep the original type unless something is strictly smaller
+        chosen_type = min(results, key=lambda candidate: (len(results[candidate]), candidate != compression_type))
+        self.report.append(CompressionChoice(name, compression_type, len(results[compression_type]),
+                                             chosen_type, len(results[chosen_type])))
+        return results[chosen_type]
+
+    def summary(self) -> str:
+        """
+        Returns a text report of the bytes saved on every file which changed compression.
+        """
+        lines = [f"{choice.name or '<unknown>'}: {hex(choice.original_type)} -> {hex(choice.chosen_type)}, "
+                 f"{choice.saved} bytes saved" for choice in self.report if choice.saved > 0]
+        total = sum(choice.saved for choice in self.report)
+        lines.append(f"{len(self.report)} files compressed, {total} bytes saved")
+        return "\n".join(lines)
+
+    def shutdown(self):
+        """
+        Stops the processes used for the trial compressions.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -5,3 +5,21 @@ Global configuration for the formats module.
 # Global language (from rom)
 DEBUG_PUZZLE = False
 DEBUG_AUDIO = False
+
+# Policy choosing the compression of files when saving them
+# (a formats.compression.selection.SmallestCompressionPolicy), None keeps the compression of the file.
+COMPRESSION_POLICY = None
+
+# Size budget in bytes of the cache of decompressed files (formats.compression.decompression_cache), 0 disables it
+DECOMPRESSION_CACHE_SIZE = 64 * 1024 * 1024
+
+# Whether NintendoDSRom.fromFile maps the ROM file in memory and reads its files only when they're used,
+# instead of reading the whole ROM when it's loaded
+LAZY_ROM_LOADING = False
+
+# Whether NintendoDSRom.save stores the data of identical files once, with their entries of the FAT pointing to it
+DEDUPLICATE_ROM_FILES = False
+
+# Whether NintendoDSRom.save orders the files so the files loaded together by events and places are next to each
+# other (formats.layout.optimize_file_order)
+OPTIMIZE_FILE_ORDER = False
@@ -1,14 +1,31 @@
 # Ported from shortbrim
+import dataclasses
 import io
 import re
 
 import formats.binary as binary
 import formats.gds
 import formats.filesystem as fs
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 from formats import conf
 from formats.dlz import EventLchDlz, EventInf2Dlz
+from formats.record import Record, uint8, uint16, boolean
+
+
+@dataclasses.dataclass
+class EventHeader(Record):
+    """
+    The data stored in the event file itself, see Event for the meaning of the fields.
+    """
+    map_bottom_id: int = uint16()
+    map_top_id: int = uint16()
+    unk0: int = uint16()
+    characters: List[int] = uint8(count=8)
+    characters_pos: List[int] = uint8(count=8)
+    characters_shown: List[bool] = boolean(count=8)
+    characters_anim_index: List[int] = uint8(count=8)
+    sound_profile: int = uint16()
 
 
 class Event:
@@ -143,24 +160,9 @@ class Event:
         """
         if not isinstance(reader, binary.BinaryReader):
             reader = binary.BinaryReader(reader)
-        self.map_bottom_id = reader.read_uint16()
-        self.map_top_id = reader.read_uint16()
-        self.unk0 = reader.read_uint16()
-
-        self.characters = []
-        for _indexChar in range(8):
-            self.characters.append(reader.read_uint8())
-        self.characters_pos = []
-        for _indexChar in range(8):
-            self.characters_pos.append(reader.read_uint8())
-        self.characters_shown = []
-        for _indexChar in range(8):
-            self.characters_shown.append(reader.read_bool())
-        self.characters_anim_index = []
-        for _indexChar in range(8):
-            self.characters_anim_index.append(reader.read_uint8())
-
-        self.sound_profile = reader.read_uint16()
+        header = EventHeader()
+        header.read(reader)
+        self.__dict__.update(dataclasses.asdict(header))
 
     def write_stream(self, wtr: Union[binary.BinaryWriter, io.BytesIO]):
         """
@@ -172,20 +174,8 @@ class Event:
         """
         if not isinstance(wtr, binary.BinaryWriter):
             wtr = binary.BinaryWriter(wtr)
-        wtr.write_uint16(self.map_bottom_id)
-        wtr.write_uint16(self.map_top_id)
-        wtr.write_uint16(self.unk0)
-
-        for char in self.characters:
-            wtr.write_uint8(char)
-        for char_pos in self.characters_pos:
-            wtr.write_uint8(char_pos)
-        for char_show in self.characters_shown:
-            wtr.write_bool(char_show)
-        for char_anim in self.characters_anim_index:
-            wtr.write_uint8(char_anim)
-
-        wtr.write_uint16(self.sound_profile)
+        header = EventHeader(**{field.name: getattr(self, field.name) for field in dataclasses.fields(EventHeader)})
+        header.write(wtr)
 
         return wtr.data
 
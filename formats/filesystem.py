@@ -1,11 +1,22 @@
+import bisect
+import concurrent.futures
+import contextlib
+import hashlib
 import io
+import mmap
 import os
 import re
+import shutil
+import struct
+import tempfile
+import time
 
 import ndspy.rom
 from ndspy.fnt import *
 
+from formats import conf
 from formats.binary import *
+from formats.binary import _MemoryStream
 from .compression import *
 
 
@@ -17,10 +28,65 @@ class Archive:
     """List of the data contained in the files."""
     opened_files: list = []
     """List of the currently opened files."""
+    _file_ids: Optional[Dict[str, int]] = None
+    """Index of the file ids by path, built on first use."""
+    modified: bool = False
+    """Whether files were written, added, removed or renamed since the archive was loaded or saved."""
+    modified_files: FrozenSet[int] = frozenset()
+    """Ids of the files written since the archive was loaded or saved."""
 
     def open(self, file: Union[AnyStr, int], mode: str = "rb") -> Union[io.BytesIO, io.TextIOWrapper]:
         pass
 
+    def get_file_id(self, file: str) -> Optional[int]:
+        """
+        Gets the id of the file at the specified path.
+
+        Parameters
+        ----------
+        file : str
+            The path of the file.
+
+        Returns
+        -------
+        Optional[int]
+            The id of the file, None if it doesn't exist.
+        """
+        pass
+
+    def __contains__(self, file: str) -> bool:
+        return self.get_file_id(file) is not None
+
+    def set_modified(self, file_id: Optional[int] = None):
+        """
+        Marks the archive as modified, so it's written when saving.
+
+        Parameters
+        ----------
+        file_id : Optional[int]
+            Id of the written file, None if the files were added, removed or renamed.
+        """
+        self.modified = True
+        if file_id is not None:
+            self.modified_files = self.modified_files | {file_id}
+
+    def clear_modified(self):
+        """
+        Marks the archive and its files as unmodified, once saved.
+        """
+        self.modified = False
+        self.modified_files = frozenset()
+
+    def _shift_file_ids(self, start: int, delta: int, paths: Iterable[str]):
+        # Moves the ids from start on after a file was inserted or removed, paths are those of the files from start on
+        if self._file_ids is not None:
+            for path in set(paths):
+                file_id = self._file_ids.get(path)
+                if file_id is not None and file_id >= start:
+                    self._file_ids[path] = file_id + delta
+        self.modified_files = frozenset(file_id + delta if file_id >= start else file_id
+                                        for file_id in self.modified_files)
+
     def add_file(self, file: str) -> Optional[int]:
         """
         Adds a file at the specified path.
@@ -66,12 +132,13 @@ class RomFile(io.BytesIO):
     """
     Wrapper as io.BytesIO for a file in a ROM.
     """
-    def __init__(self, archive, index: int, operation: str = "w"):
+    def __init__(self, archive, index: int, operation: str = "w", name: Optional[str] = None):
         if operation not in ["r", "w", "a"]:
             raise NotImplementedError(f"operation: {operation}")
         self.archive = archive
         self.id = index
         self.opp = operation
+        self.name = name
         if self not in self.archive.opened_files:
             self.archive.opened_files.append(self)
         super().__init__(self.archive.files[index] if operation in ["r", "a"] else b"")
@@ -93,7 +160,10 @@ class RomFile(io.BytesIO):
     def flush(self):
         if not self.closed:
             if self.opp != "r":
-                self.archive.files[self.id] = self.getvalue()
+                data = self.getvalue()
+                if data != self.archive.files[self.id]:
+                    self.archive.files[self.id] = data
+                    self.archive.set_modified(self.id)
             super().flush()
 
     def __enter__(self):
@@ -108,11 +178,38 @@ class RomFile(io.BytesIO):
         self.close()
 
 
+class RomFileReader(_MemoryStream):
+    """
+    Read only file of an archive, reading the data of the file in place instead of copying it like RomFile.
+
+    BinaryReader reads it without copying either.
+    """
+    __slots__ = ("archive", "id", "name")
+
+    def __init__(self, archive, index: int, name: Optional[str] = None):
+        super().__init__(archive.files[index])
+        self.archive = archive
+        self.id = index
+        self.name = name
+
+    def fileno(self) -> int:
+        return self.id
+
+
 class CompressedIOWrapper(io.BytesIO):
     """
     Wrapper for a compressed file.
+
+    The data is decompressed as it's read, so reading only the start of a file doesn't decompress all of it.
+    It is only compressed again on flush if it was modified since it was last compressed.
     """
-    def __init__(self, stream, double_typed: Optional[bool] = None):
+    recompression_count = 0
+    """Number of times the data of a wrapper was compressed on flush."""
+    skipped_recompression_count = 0
+    """Number of flushes which didn't compress the data because it wasn't modified."""
+
+    def __init__(self, stream, double_typed: Optional[bool] = None, max_compression: bool = False,
+                 compression_type: Optional[int] = None):
         """
         Parameters
         ----------
@@ -120,12 +217,111 @@ class CompressedIOWrapper(io.BytesIO):
             Stream to use for internal data.
         double_typed : bool
             Whether the file has its compression type specified twice.
+        max_compression : bool
+            Whether to use the slower compression giving the smallest files when writing.
+        compression_type : Optional[int]
+            Compression type used when writing, defaults to the one of the stream (or LZ10 if it's empty).
         """
         self._stream = stream
-
-        current, self.double_typed = decompress(stream.read(), double_typed)
-
-        super().__init__(current)
+        self.max_compression = max_compression
+
+        data = stream.read()
+        self._compressed = data
+        self._chunks, self.double_typed = decompress_iter(data, double_typed)
+        self._loaded = 0
+        """Size of the data decompressed so far."""
+        if compression_type is None:
+            compression_type = data[4 if self.double_typed else 0] if data else LZ10
+        self.compression_type = compression_type
+        """The compression type of the file, kept when writing it back."""
+
+        super().__init__()
+
+        # An empty (e.g. truncated) stream or a different compression type must be written even without changes
+        self._modified = not data or compression_type != data[4 if self.double_typed else 0]
+        """Whether the data was modified since it was last compressed."""
+
+    def _load(self, end: int):
+        # Decompresses the data up to end (at least)
+        while self._chunks is not None and self._loaded < end:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._chunks = None
+                break
+            pos = super().tell()
+            super().seek(self._loaded)
+            super().write(chunk)
+            super().seek(pos)
+            self._loaded += len(chunk)
+
+    def _load_all(self):
+        if self._chunks is None:
+            return
+        # The full decompression is faster than going through the remaining chunks
+        pos = super().tell()
+        data = decompress(self._compressed, self.double_typed)[0]
+        super().seek(0)
+        super().write(data)
+        super().truncate(len(data))
+        super().seek(pos)
+        self._loaded = len(data)
+        self._chunks = None
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            self._load_all()
+        else:
+            self._load(self.tell() + size)
+        return super().read(size)
+
+    def read1(self, size: Optional[int] = -1) -> bytes:
+        return self.read(size)
+
+    def readinto(self, buffer) -> int:
+        self._load(self.tell() + memoryview(buffer).nbytes)
+        return super().readinto(buffer)
+
+    def readline(self, size: Optional[int] = -1) -> bytes:
+        self._load_all()
+        return super().readline(size)
+
+    def readlines(self, hint: Optional[int] = -1) -> List[bytes]:
+        self._load_all()
+        return super().readlines(hint)
+
+    def __next__(self) -> bytes:
+        self._load_all()
+        return super().__next__()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_END:
+            self._load_all()
+        return super().seek(offset, whence)
+
+    def getvalue(self) -> bytes:
+        self._load_all()
+        return super().getvalue()
+
+    def write(self, b) -> int:
+        self._load_all()
+        self._modified = True
+        return super().write(b)
+
+    def writelines(self, lines):
+        self._load_all()
+        self._modified = True
+        super().writelines(lines)
+
+    def truncate(self, size: Optional[int] = None) -> int:
+        self._load_all()
+        self._modified = True
+        return super().truncate(size)
+
+    def getbuffer(self) -> memoryview:
+        self._load_all()
+        # The buffer can be written to, so we can't know if it will be modified
+        self._modified = True
+        return super().getbuffer()
 
     def close(self):
         self.flush()
@@ -133,10 +329,20 @@ class CompressedIOWrapper(io.BytesIO):
         self._stream.close()
 
     def flush(self):
-        if self._stream.writable():
+        if self._stream.writable() and not self._modified:
+            CompressedIOWrapper.skipped_recompression_count += 1
+        elif self._stream.writable():
+            if conf.COMPRESSION_POLICY is not None:
+                data = conf.COMPRESSION_POLICY.compress(self.getvalue(), self.compression_type, self.double_typed,
+                                                        self.max_compression, name=getattr(self._stream, "name", None))
+            else:
+                data = compress(self.getvalue(), self.compression_type, double_typed=self.double_typed,
+                                max_compression=self.max_compression)
             self._stream.truncate(0)
             self._stream.seek(0)
-            self._stream.write(compress(self.getvalue(), double_typed=self.double_typed))
+            self._stream.write(data)
+            self._modified = False
+            CompressedIOWrapper.recompression_count += 1
         super().flush()
         self._stream.flush()
 
@@ -145,6 +351,82 @@ class CompressedIOWrapper(io.BytesIO):
         return self
 
 
+class RomBatch(Archive):
+    """
+    Additions, removals and moves of files of a NintendoDSRom queued by NintendoDSRom.batch, to apply them at once.
+
+    Until then, the added files are files of the batch, so they can be opened and written.
+    """
+    def __init__(self, rom: "NintendoDSRom"):
+        self.rom = rom
+        self.files: List[bytes] = []
+        """Data of the added files."""
+        self.opened_files: List[RomFile] = []
+        """Files of the batch currently opened."""
+        self.added: Dict[str, Tuple[Folder, str, int]] = {}
+        """Folder, name and index in files of the added files, by path."""
+        self.removed: Dict[str, Tuple[Folder, str, int]] = {}
+        """Folder, name and id of the removed files of the ROM, by path."""
+
+    def get_file_id(self, file: str) -> Optional[int]:
+        added = self.added.get(NintendoDSRom.normalize_path(file))
+        return None if added is None else added[2]
+
+    def add_file(self, file: str, data: bytes = b"") -> int:
+        path = NintendoDSRom.normalize_path(file)
+        if path in self.added:
+            return self.added[path][2]
+        folder_name, filename = os.path.split(path)
+        folder = self.rom.filenames.subfolder(folder_name) if folder_name else self.rom.filenames
+        if folder is None:
+            raise FileNotFoundError(f"folder '{folder_name}' doesn't exist")
+        self.files.append(data)
+        self.added[path] = (folder, filename, len(self.files) - 1)
+        return len(self.files) - 1
+
+    def remove_file(self, file: str):
+        path = NintendoDSRom.normalize_path(file)
+        if path in self.added:
+            del self.added[path]
+            return
+        file_id = self.rom.get_file_id(path)
+        if file_id is None:
+            raise FileNotFoundError(f"file '{file}' doesn't exist")
+        folder_name, filename = os.path.split(path)
+        folder = self.rom.filenames.subfolder(folder_name) if folder_name else self.rom.filenames
+        self.removed[path] = (folder, filename, file_id)
+
+    def rename_file(self, path: str, new_filename: str):
+        folder, _, index = self.added.pop(NintendoDSRom.normalize_path(path))
+        self.added[NintendoDSRom.normalize_path(os.path.join(os.path.dirname(path), new_filename))] = \
+            (folder, new_filename, index)
+
+
+def _rom_skeleton(data: memoryview) -> bytearray:
+    # Copies the parts of a ROM other than its files (header, code, file name table, ...), with the header pointing
+    # to their offsets in the copy and an empty file allocation table, so ndspy doesn't read the files
+    arm9_offset, arm9_length = struct.unpack_from("<I8xI", data, 0x20)
+    end = arm9_offset + arm9_length
+    while data[end:end + 4] == b"\x21\x06\xC0\xDE":  # data following arm9
+        end += 12
+    skeleton = bytearray(data[:end])
+    # Offset and length fields of the header, the offset of the icon banner and debug ROM is 0 if there is none
+    for offset_field, length_field in [(0x30, 0x3C), (0x40, 0x44), (0x50, 0x54), (0x58, 0x5C), (0x68, None),
+                                       (0x160, 0x164)]:
+        offset, = struct.unpack_from("<I", data, offset_field)
+        if not offset and offset_field in [0x68, 0x160]:
+            continue
+        # The size of the icon banner depends on its version, 0x23C0 is the biggest one
+        length = 0x23C0 if length_field is None else struct.unpack_from("<I", data, length_field)[0]
+        struct.pack_into("<I", skeleton, offset_field, len(skeleton))
+        skeleton += data[offset:offset + length]
+    struct.pack_into("<I", skeleton, 0x4C, 0)  # file allocation table
+    # Used ROM size, ndspy reads the RSA signature at this offset past the skeleton. The signature is read from the
+    # ROM afterwards.
+    struct.pack_into("<I", skeleton, 0x80, 0)
+    return skeleton
+
+
 class NintendoDSRom(ndspy.rom.NintendoDSRom, Archive):
     """
     Archive wrapping around ndspy.rom.NintendoDSRom
@@ -174,13 +456,123 @@ class NintendoDSRom(ndspy.rom.NintendoDSRom, Archive):
                     self.is_eu = False
                     self.lang = "en"
 
-        self._opened_files = []
+        self.opened_files = []
         """List of currently opened files."""
         self._loaded_archives: Dict[str, PlzArchive] = {}
         """List of currently loaded archives."""
 
         self._get_archive_call = False
 
+        self._file_positions: Optional[Dict[str, Tuple[Folder, int]]] = None
+        """
+        Index of the folder of the files and their index in it by path, built on first use. The id of a file is the
+        first id of its folder plus its index, so renumbering the folders keeps the index up to date.
+        """
+        self._indexed_filenames: Optional[Folder] = None
+        """The folder tree the file ids were indexed from."""
+
+        self.max_compression = False
+        """Whether the archives are compressed with the slower compression giving the smallest files on save."""
+
+        self.save_workers: Optional[int] = 1
+        """
+        Number of processes rebuilding the modified archives on save, None for the number of processors.
+        With 1, they're rebuilt in this process.
+        """
+
+        self._mapped_file: Optional[mmap.mmap] = None
+        """The ROM file mapped in memory, if it was loaded lazily."""
+
+        self._batch: Optional[RomBatch] = None
+        """Additions and removals of files queued by batch."""
+
+    @classmethod
+    def fromFile(cls, filePath, lazy: Optional[bool] = None) -> "NintendoDSRom":
+        """
+        Loads a ROM from a file.
+
+        Parameters
+        ----------
+        filePath : str | os.PathLike
+            Path of the ROM file.
+        lazy : Optional[bool]
+            Whether to map the file in memory instead of reading it, defaults to conf.LAZY_ROM_LOADING.
+            The files of the ROM are then views of the mapped file, only read when they're used, and replaced by
+            their data once modified. The ROM file shouldn't be modified by other programs while it's loaded.
+
+        Returns
+        -------
+        NintendoDSRom
+            The loaded ROM.
+        """
+        if lazy is None:
+            lazy = conf.LAZY_ROM_LOADING
+        if not lazy or os.path.getsize(filePath) < 0x200:
+            return super().fromFile(filePath)
+
+        with open(filePath, "rb") as f:
+            mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = memoryview(mapped_file)
+        rom = cls(_rom_skeleton(data))
+
+        # Read like ndspy does
+        signature_offset = struct.unpack_from("<I", data, 0x1000)[0] if len(data) >= 0x1004 else 0
+        rom_size, = struct.unpack_from("<I", data, 0x80)
+        if not signature_offset and len(data) > rom_size:
+            signature_offset = rom_size
+        rom.rsaSignature = bytearray(data[signature_offset:signature_offset + 0x88]) if signature_offset else b""
+
+        rom._map_files(data)
+        rom._mapped_file = mapped_file
+        return rom
+
+    def _map_files(self, data: memoryview):
+        # The files become views of the ROM data, following its file allocation table
+        fat_offset, fat_length = struct.unpack_from("<II", data, 0x48)
+        files = []
+        file_ids = {}
+        for file_id, (start, end) in enumerate(struct.iter_unpack("<II", data[fat_offset:fat_offset + fat_length
+                                                                            - fat_length % 8])):
+            files.append(data[start:end])
+            file_ids[start] = file_id
+        self.files = files
+        self.sortedFileIds = [file_ids[start] for start in sorted(file_ids)]
+
+    def saveToFile(self, filePath, **kwargs):
+        data = self.save(**kwargs)
+        if self._mapped_file is None:
+            with open(filePath, "wb") as f:
+                f.write(data)
+            self.clear_modified()
+            return
+
+        # The files which weren't modified, and the data read in place from them by RomFileReader, are views of the
+        # mapped file, which may be the one overwritten. The ROM is written to a new file replacing it, so the
+        # replaced file stays valid while it's mapped, then the files are mapped again from the new file.
+        file_path = os.path.abspath(filePath)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(file_path), delete=False) as f:
+            f.write(data)
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, f.name)
+        try:
+            try:
+                os.replace(f.name, file_path)
+            except PermissionError:
+                # Mapped files can't be replaced on Windows: the files become views of the saved data to unmap it
+                self._map_files(memoryview(data))
+                try:
+                    self._mapped_file.close()
+                except BufferError:
+                    raise PermissionError(f"can't save the ROM over {filePath}, data of its files is still used")
+                os.replace(f.name, file_path)
+        except BaseException:
+            os.remove(f.name)
+            raise
+        with open(file_path, "rb") as f:
+            self._mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._map_files(memoryview(self._mapped_file))
+        self.clear_modified()
+
     def get_archive(self, path):
         """
         Gets the plz archive from the specified path. An archive should not be opened in any other way.
@@ -199,17 +591,109 @@ class NintendoDSRom(ndspy.rom.NintendoDSRom, Archive):
             raise ValueError("Path should start with slash.")
         if path not in self._loaded_archives:
             self._get_archive_call = True
-            self._loaded_archives[path] = PlzArchive(path, rom=self)
+            self._loaded_archives[path] = PlzArchive(path, rom=self, lazy=True)
             self._get_archive_call = False
         return self._loaded_archives[path]
 
-    def save(self, *args, **kwargs):
-        # Save all archives before saving the ROM.
+    def save(self, *args, deduplicate: Optional[bool] = None, optimize_order: Optional[bool] = None, **kwargs):
+        """
+        Generates the data of the ROM, after saving the modified archives.
+
+        Parameters
+        ----------
+        deduplicate : bool
+            Whether to store the data of identical files once, defaults to conf.DEDUPLICATE_ROM_FILES.
+        optimize_order : bool
+            Whether to place the files loaded together next to each other (formats.layout.optimize_file_order),
+            defaults to conf.OPTIMIZE_FILE_ORDER.
+
+        Returns
+        -------
+        bytes
+            The data of the ROM.
+        """
+        # Save the modified archives before saving the ROM, the others are unchanged in the ROM
+        modified = [(path, archive) for path, archive in self._loaded_archives.items() if archive.modified]
+        workers = self.save_workers or os.cpu_count() or 1
         self._get_archive_call = True
-        for arch in self._loaded_archives:
-            self._loaded_archives[arch].save()
-        self._get_archive_call = False
-        return super(NintendoDSRom, self).save(*args, **kwargs)
+        try:
+            # The compression policy may have its own processes, it's left to choose the compression here
+            if workers > 1 and len(modified) > 1 and conf.COMPRESSION_POLICY is None:
+                self._save_archives_parallel(modified, workers)
+            else:
+                for path, archive in modified:
+                    modified_files = len(archive.modified_files)
+                    start = time.perf_counter()
+                    archive.save(max_compression=self.max_compression or None)
+                    logging.info(f"Archive {path} rebuilt ({modified_files} modified files) "
+                                 f"in {time.perf_counter() - start:.3f}s")
+        finally:
+            self._get_archive_call = False
+        logging.info(f"Rebuilt {len(modified)} of {len(self._loaded_archives)} loaded archives")
+
+        if optimize_order is None:
+            optimize_order = conf.OPTIMIZE_FILE_ORDER
+        if optimize_order:
+            from formats.layout import optimize_file_order  # formats.layout imports this module
+            optimize_file_order(self)
+
+        if deduplicate is None:
+            deduplicate = conf.DEDUPLICATE_ROM_FILES
+        duplicates = self._get_duplicate_files() if deduplicate else {}
+        if not duplicates:
+            return super(NintendoDSRom, self).save(*args, **kwargs)
+
+        # The duplicates are saved empty, taking no space, then their entries of the FAT point to the data of the
+        # file they duplicate.
+        files = self.files
+        self.files = [b"" if file_id in duplicates else file for file_id, file in enumerate(files)]
+        try:
+            data = bytearray(super(NintendoDSRom, self).save(*args, **kwargs))
+        finally:
+            self.files = files
+        fat_offset, = struct.unpack_from("<I", data, 0x48)
+        for file_id, original_id in duplicates.items():
+            data[fat_offset + file_id * 8:fat_offset + file_id * 8 + 8] = \
+                data[fat_offset + original_id * 8:fat_offset + original_id * 8 + 8]
+        logging.info(f"{len(duplicates)} duplicated files stored once, "
+                     f"{sum(len(files[file_id]) for file_id in duplicates)} bytes saved")
+        return bytes(data)
+
+    def get_overlay_ids(self) -> Set[int]:
+        """
+        Gets the ids of the files of the overlays of the ARM9 and ARM7, from their overlay tables.
+        """
+        return {struct.unpack_from("<I", table, i + 0x18)[0]
+                for table in (self.arm9OverlayTable, self.arm7OverlayTable) for i in range(0, len(table), 32)}
+
+    def _get_duplicate_files(self) -> Dict[int, int]:
+        # Id of the first identical file of each file which has one, except for overlays, which are stored apart
+        overlay_ids = self.get_overlay_ids()
+        first_ids: Dict[Tuple[int, bytes], int] = {}
+        duplicates = {}
+        for file_id, file in enumerate(self.files):
+            if not len(file) or file_id in overlay_ids:
+                continue
+            original_id = first_ids.setdefault((len(file), hashlib.sha1(file).digest()), file_id)
+            if original_id != file_id and file == self.files[original_id]:
+                duplicates[file_id] = original_id
+        return duplicates
+
+    def _save_archives_parallel(self, archives: List[Tuple[str, "PlzArchive"]], workers: int):
+        # Same as saving each archive, but they are serialized and compressed in other processes.
+        # The results are written in the order of the archives, so the ROM is the same as when saving them here.
+        with concurrent.futures.ProcessPoolExecutor(min(workers, len(archives))) as executor:
+            futures = [executor.submit(_build_archive, archive.filenames, [bytes(file) for file in archive.files],
+                                       archive._last_compressed, archive._last_compression_type,
+                                       self.max_compression or archive._max_compression)
+                       for _, archive in archives]
+            for (path, archive), future in zip(archives, futures):
+                data, elapsed = future.result()
+                with self.open(path, "wb") as f:
+                    f.write(data)
+                logging.info(f"Archive {path} rebuilt ({len(archive.modified_files)} modified files) "
+                             f"in {elapsed:.3f}s in a separate process")
+                archive.clear_modified()
 
     # TODO: Unify archive opening and make sure archive are opened only once
     def open(self, file: Union[AnyStr, int], mode: str = "rb") -> Union[io.BytesIO, io.TextIOWrapper]:
@@ -225,8 +709,8 @@ class NintendoDSRom(ndspy.rom.NintendoDSRom, Archive):
 
         Returns
         -------
-        RomFile | io.TextIOWrapper
-            The opened rom file.
+        RomFile | RomFileReader | io.TextIOWrapper
+            The opened rom file, a RomFileReader reading the data in place when opened for reading.
         """
 
         match = re.findall(r"^([rwa])(b?)(\+?)$", mode)
@@ -240,85 +724,125 @@ class NintendoDSRom(ndspy.rom.NintendoDSRom, Archive):
             if match[0][2] == "+":
                 create = True
 
+        archive = self
         if isinstance(file, int):
             fileid = file
             file = self.filenames.filenameOf(file)
         else:
-            fileid = self.filenames.idOf(file)
-            if not fileid and create:
+            fileid = self.get_file_id(file)
+            if fileid is None and self._batch is not None:
+                # Added in the current batch, or added now
+                archive = self._batch
+                fileid = self._batch.get_file_id(file)
+                if fileid is None and create:
+                    fileid = self._batch.add_file(file)
+            elif fileid is None and create:
                 fileid = self.add_file(file)
-                if not fileid:
+                if fileid is None:
                     raise FileNotFoundError(f"file '{file}' could not be opened nor created")
-            if not fileid:
+            if fileid is None:
                 raise FileNotFoundError(f"file '{file}' could not be opened")
 
         if file.lower().endswith(".plz") and not self._get_archive_call:
             # Alert on the log of this action.
             logging.warning("PLZ archive not opened from get_archive!", stack_info=True)
 
-        rom_file = RomFile(self, fileid, match[0][0])
+        if match[0][0] == "r":
+            rom_file = RomFileReader(archive, fileid, name=file)
+        else:
+            rom_file = RomFile(archive, fileid, match[0][0], name=file)
         if text:
             return io.TextIOWrapper(rom_file, encoding="cp1252")
         return rom_file
 
-    def add_file(self, file: str) -> Optional[int]:
-        folder_name, filename = os.path.split(file)
-        folder_add = self.filenames[folder_name]
-        new_file_id = folder_add.firstID + len(folder_add.files)
-
-        # Insert our new file into this ID
-        self.files.insert(new_file_id, b"")
-
-        # Add our file to the folder
-        folder_add.files.append(filename)
-
-        # Change the firstID of all the folders after our base folder.
-        def increment_first_index_if_needed(new_id, root: Folder):
-            if root.firstID >= new_id and root != folder_add:
-                root.firstID += 1
-
-            for fd in root.folders:
-                increment_first_index_if_needed(new_id, fd[1])
+    @staticmethod
+    def normalize_path(path: str) -> str:
+        """
+        Returns the path without leading, trailing or repeated slashes, as used by the index of the files.
+        """
+        path = path.strip("/")
+        if "//" in path:
+            path = "/".join(NintendoDSRom.folder_split(path))
+        return path
+
+    def get_file_id(self, file: str) -> Optional[int]:
+        path = self.normalize_path(file)
+        if self._batch is not None and path in self._batch.removed:
+            return None
+        position = self._get_file_positions().get(path)
+        if position is None:
+            return None
+        folder, index = position
+        return folder.firstID + index
+
+    def _get_file_positions(self) -> Dict[str, Tuple[Folder, int]]:
+        # Rebuilt if the folder tree was replaced
+        if self._file_positions is None or self._indexed_filenames is not self.filenames:
+            file_positions = {}
+
+            def index_folder(prefix: str, folder: Folder):
+                for i, filename in enumerate(folder.files):
+                    file_positions.setdefault(prefix + filename, (folder, i))
+                for folder_name, subfolder in folder.folders:
+                    index_folder(prefix + folder_name + "/", subfolder)
+
+            index_folder("", self.filenames)
+            self._file_positions = file_positions
+            self._indexed_filenames = self.filenames
+        return self._file_positions
+
+    def _update_file_positions(self, folder_path: str, folder: Folder, *filenames: str):
+        # Indexes the files of a folder with these names again, after they were renamed
+        if self._file_positions is None:
+            return
+        for filename in filenames:
+            path = "/".join(self.folder_split(folder_path) + [filename])
+            if filename in folder.files:
+                self._file_positions[path] = (folder, folder.files.index(filename))
+            else:
+                self._file_positions.pop(path, None)
 
-        increment_first_index_if_needed(new_file_id, self.filenames)
+    def add_file(self, file: str) -> Optional[int]:
+        """
+        Adds an empty file at the specified path.
 
-        # increment the id of loaded files after our base id
-        for fp in self._opened_files:
-            if fp.id > new_file_id:
-                fp.id += 1
+        In a batch (see batch), the file only gets its id once the batch is applied, so None is returned. To write
+        the file in the batch, open it with a "+" mode instead, which creates it.
 
-            if fp.id == new_file_id:
-                fp.close()
+        Parameters
+        ----------
+        file : str
+            The path where the file should be created.
 
-        return new_file_id
+        Returns
+        -------
+        Optional[int]
+            The id of the created file, None in a batch.
+        """
+        if self._batch is not None:
+            self._batch.add_file(file)
+            return None
+        with self.batch():
+            self._batch.add_file(file)
+        return self.get_file_id(file)
 
     def remove_file(self, file: str):
-        folder_name, filename = os.path.split(file)
-        folder: Folder = self.filenames[folder_name]
-        fileid = self.filenames.idOf(file)
-        folder.files.remove(filename)
-        del self.files[fileid]
-
-        def decrement_first_index_if_needed(removed_id, root: Folder):
-            if root.firstID > removed_id:
-                root.firstID -= 1
-
-            for fd in root.folders:
-                decrement_first_index_if_needed(removed_id, fd[1])
-
-        decrement_first_index_if_needed(fileid, self.filenames)
-        for fp in self._opened_files:
-            if fp.id > fileid:
-                fp.id -= 1
-
-            if fp.id == fileid:
-                fp.close()
+        if self._batch is not None:
+            self._batch.remove_file(file)
+            return
+        with self.batch():
+            self._batch.remove_file(file)
 
     def rename_file(self, path: str, new_filename: str):
+        if self._batch is not None and self._batch.get_file_id(path) is not None:
+            self._batch.rename_file(path, new_filename)
+            return
         folder_name, filename = os.path.split(path)
         folder: Folder = self.filenames[folder_name]
         index = folder.files.index(filename)
         folder.files[index] = new_filename
+        self._update_file_positions(folder_name, folder, filename, new_filename)
+        self.set_modified()
 
     def move_file(self, old_path, new_path):
         """
@@ -334,11 +858,150 @@ class NintendoDSRom(ndspy.rom.NintendoDSRom, Archive):
 
         # TODO: What happens with archives?
 
-        with self.open(old_path, "rb") as f:
-            data = f.read()
-        self.remove_file(old_path)
-        with self.open(new_path, "wb+") as f:
-            f.write(data)
+        with self.batch():
+            batch = self._batch
+            index = batch.get_file_id(old_path)
+            data = batch.files[index] if index is not None else self.files[self.get_file_id(old_path)]
+            batch.remove_file(old_path)
+            batch.add_file(new_path, data)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Queues the additions, removals and moves of files until the end of the with block, to apply them at once.
+
+        Adding or removing a file renumbers the files after it, applying them together renumbers the files once.
+        In the block, added files can be opened (their id is only known once the batch is applied) and removed
+        files can't. If an exception is raised in the block, the queued changes are discarded.
+
+        Batches can be nested, the changes are applied at the end of the outermost one. Folder operations apply
+        the changes queued so far.
+
+        Examples
+        --------
+        >>> with rom.batch():
+        ...     for path, data in imported_files.items():
+        ...         with rom.open(path, "wb+") as f:
+        ...             f.write(data)
+        """
+        if self._batch is not None:
+            yield
+            return
+        self._batch = RomBatch(self)
+        try:
+            yield
+        except BaseException:
+            batch, self._batch = self._batch, None
+            for fp in batch.opened_files.copy():
+                fp.opp = "r"  # discarded, not written
+                fp.close()
+            raise
+        batch, self._batch = self._batch, None
+        self._apply_batch(batch)
+
+    def _apply_pending_batch(self):
+        # Applies the changes queued so far, before changing the folders
+        if self._batch is not None:
+            batch, self._batch = self._batch, RomBatch(self)
+            self._apply_batch(batch)
+
+    def _apply_batch(self, batch: RomBatch):
+        if not batch.added and not batch.removed:
+            return
+
+        # The files added to a folder go after its last file, in the order they were added. When the files of
+        # several folders go at the same place, the folders are in the order of their first id.
+        added_folders: Dict[int, Tuple[Folder, List[Tuple[str, int]]]] = {}
+        for folder, filename, index in batch.added.values():
+            added_folders.setdefault(id(folder), (folder, []))[1].append((filename, index))
+        insertions: Dict[int, List[Tuple[Folder, List[Tuple[str, int]]]]] = {}
+        for folder, added in sorted(added_folders.values(), key=lambda item: item[0].firstID):
+            insertions.setdefault(folder.firstID + len(folder.files), []).append((folder, added))
+        removed_ids = sorted(file_id for _, _, file_id in batch.removed.values())
+        removed_set = set(removed_ids)
+
+        # Build the new list of files in one pass
+        files = []
+        added_ids: Dict[int, int] = {}
+        first_added_ids: Dict[int, int] = {}
+        start = 0
+        for position in sorted(removed_set | insertions.keys()):
+            files.extend(self.files[start:position])
+            for folder, added in insertions.get(position, ()):
+                first_added_ids[id(folder)] = len(files)
+                for _, index in added:
+                    added_ids[index] = len(files)
+                    files.append(batch.files[index])
+            start = position + 1 if position in removed_set else position
+        files.extend(self.files[start:])
+
+        insertion_positions = sorted(insertions)
+        first_changed_id = min(removed_set | insertions.keys())
+        insertion_counts = [0]
+        for position in insertion_positions:
+            insertion_counts.append(insertion_counts[-1] + sum(len(added) for _, added in insertions[position]))
+
+        def new_id(old_id: int) -> int:
+            # New id of the file at old_id, or of what follows it if it was removed, after the files inserted there
+            if old_id < first_changed_id:
+                return old_id
+            return old_id - bisect.bisect_left(removed_ids, old_id) + \
+                insertion_counts[bisect.bisect_right(insertion_positions, old_id)]
+
+        # Renumber the folders, then update their files
+        def renumber(folder: Folder):
+            folder.firstID = first_added_ids[id(folder)] if not folder.files and id(folder) in first_added_ids \
+                else new_id(folder.firstID)
+            for _, subfolder in folder.folders:
+                renumber(subfolder)
+
+        removed_indexes = sorted(((folder, file_id - folder.firstID) for folder, _, file_id in batch.removed.values()),
+                                 key=lambda item: -item[1])
+        # Folder path and index of the first removed file of the folders with removed files
+        first_removed: Dict[int, Tuple[str, Folder, int]] = {}
+        for path, (folder, _, file_id) in batch.removed.items():
+            index = file_id - folder.firstID
+            if id(folder) not in first_removed or index < first_removed[id(folder)][2]:
+                first_removed[id(folder)] = (os.path.dirname(path), folder, index)
+        renumber(self.filenames)
+        for folder, index in removed_indexes:
+            del folder.files[index]
+        for folder, added in added_folders.values():
+            folder.files.extend(filename for filename, _ in added)
+        self.files = files
+        self.sortedFileIds = [new_id(file_id) for file_id in self.sortedFileIds if file_id not in removed_set]
+
+        # The files after a removed file of a folder move back in it, the renumbered folders give the new ids of the
+        # others
+        if self._file_positions is not None:
+            for path in batch.removed:
+                self._file_positions.pop(path, None)
+            for folder_path, folder, first_index in first_removed.values():
+                prefix = folder_path + "/" if folder_path else ""
+                for index in range(first_index, len(folder.files)):
+                    self._file_positions[prefix + folder.files[index]] = (folder, index)
+            for path, (folder, _, index) in batch.added.items():
+                self._file_positions[path] = (folder, added_ids[index] - folder.firstID)
+
+        self.modified_files = frozenset(new_id(file_id) for file_id in self.modified_files
+                                        if file_id not in removed_set) | frozenset(added_ids.values())
+        self.set_modified()
+
+        # Update the opened files once
+        for fp in self.opened_files.copy():
+            if fp.id in removed_set:
+                fp.opp = "r"  # removed, not written
+                fp.close()
+            else:
+                fp.id = new_id(fp.id)
+        for fp in batch.opened_files:
+            if fp.id in added_ids:
+                fp.archive = self
+                fp.id = added_ids[fp.id]
+                self.opened_files.append(fp)
+            else:
+                fp.opp = "r"
+        batch.opened_files = []
 
     # TODO: Docstrings for folder methods.
 
@@ -355,11 +1018,14 @@ class NintendoDSRom(ndspy.rom.NintendoDSRom, Archive):
             return self.filenames
 
     def add_folder(self, path):
+        self._apply_pending_batch()
         parent = self.folder_get_parent(path)
         new_folder = Folder(firstID=len(self.files))
         parent.folders.append((self.folder_split(path)[-1], new_folder))
+        self.set_modified()
 
     def remove_folder(self, path):
+        self._apply_pending_batch()
         folder = self.filenames[path]
         if not folder:
             raise Exception(f"Directory {path} does not exist.")
@@ -369,8 +1035,10 @@ class NintendoDSRom(ndspy.rom.NintendoDSRom, Archive):
         parent = self.folder_get_parent(path)
 
         parent.folders.remove((self.folder_split(path)[-1], folder))
+        self.set_modified()
 
     def rename_folder(self, old_path, new_path):
+        self._apply_pending_batch()
         folder = self.filenames[old_path]
 
         # get parents
@@ -388,6 +1056,13 @@ class NintendoDSRom(ndspy.rom.NintendoDSRom, Archive):
             index = old_parent.folders.index(old_folder_item)
             new_parent.folders[index] = new_folder_item
 
+        if self._file_positions is not None:
+            old_prefix = "/".join(self.folder_split(old_path)) + "/"
+            new_prefix = "/".join(self.folder_split(new_path)) + "/"
+            self._file_positions = {new_prefix + path[len(old_prefix):] if path.startswith(old_prefix) else path:
+                                    position for path, position in self._file_positions.items()}
+        self.set_modified()
+
 
 class FileFormat:
     """
@@ -405,8 +1080,13 @@ class FileFormat:
     - 2 - Double typed compressed file
     """
 
+    _max_compression = False
+    """Whether to use the slower compression giving the smallest files when saving."""
+
     _last_compressed = _compressed_default
     """The compression last used when opening the file."""
+    _last_compression_type = LZ10
+    """The compression type of the file when it was opened."""
     _last_filename: Optional[str] = None
     """The last filename used when opening the file."""
     _last_rom: Archive = None
@@ -422,6 +1102,7 @@ class FileFormat:
             compressed = self._compressed_default
         if compressed:
             file = CompressedIOWrapper(file, double_typed=(compressed == 2))
+            self._last_compression_type = file.compression_type
         self._last_compressed = compressed
 
         if file is not None:
@@ -433,7 +1114,8 @@ class FileFormat:
         if filename is not None:
             file.close()  # we opened the file here, we close the file here
 
-    def save(self, filename=None, file=None, compressed=None, rom: Archive = None):
+    def save(self, filename=None, file=None, compressed=None, rom: Archive = None,
+             max_compression: Optional[bool] = None):
         should_close = False
         if not file:
             should_close = True
@@ -449,8 +1131,11 @@ class FileFormat:
 
         if compressed is None:
             compressed = self._last_compressed
+        if max_compression is None:
+            max_compression = self._max_compression
         if compressed:
-            file = CompressedIOWrapper(file, double_typed=(compressed == 2))
+            file = CompressedIOWrapper(file, double_typed=(compressed == 2), max_compression=max_compression,
+                                       compression_type=self._last_compression_type)
 
         self.write_stream(file)
 
@@ -476,16 +1161,33 @@ class PlzArchive(Archive, FileFormat):
     filenames: List[str] = []
     """List of the names of the files present in the plz archive."""
     files: List[bytes] = []
-    """List of the data of the files present in the plz archive."""
+    """List of the data of the files present in the plz archive, views of its data until written if it's lazy."""
+    _indexed_filenames: Optional[List[str]] = None
+    """The list of file names the file ids were indexed from."""
+
+    def __init__(self, *args, lazy: bool = False, **kwargs):
+        """
+        Parameters
+        ----------
+        lazy : bool
+            Whether only the directory of the archive is parsed, the data of the files being views of the
+            decompressed archive instead of copies. A file is copied once it's written.
+        """
+        self.lazy = lazy
+        super().__init__(*args, **kwargs)
 
     def read_stream(self, stream):
         if isinstance(stream, BinaryReader):
             rdr = stream
+            view = None
         else:
-            rdr = BinaryReader(stream)
+            data = stream.read()
+            rdr = BinaryReader(data)
+            view = memoryview(data) if self.lazy else None
 
         self.filenames = []
         self.files = []
+        self.clear_modified()
 
         header_size = rdr.read_uint32()
         archive_file_size = rdr.read_uint32()
@@ -502,46 +1204,47 @@ class PlzArchive(Archive, FileFormat):
 
             filename = rdr.read_string(encoding="shift-jis")
 
-            rdr.seek(start_pos + file_header_size)
-            file = rdr.read(file_size)
+            if view is not None:
+                file = view[start_pos + file_header_size:start_pos + file_header_size + file_size]
+            else:
+                rdr.seek(start_pos + file_header_size)
+                file = rdr.read(file_size)
             rdr.seek(start_pos + file_total_size)
 
             self.filenames.append(filename)
             self.files.append(file)
 
     def write_stream(self, stream):
-        if isinstance(stream, BinaryWriter):
-            wtr = stream
-        else:
-            wtr = BinaryWriter(stream)
+        # Built in memory and written at once, so the file size can be patched in place
+        wtr = stream if isinstance(stream, BinaryWriter) else BinaryWriter()
 
+        start = wtr.tell()
         wtr.write_uint32(16)
-        wtr.write_uint32(0)  # placeholder file_size
+        file_size = wtr.reserve_uint32()
         wtr.write(b"PCK2")
         wtr.write_uint32(0)
 
         for i in range(len(self.files)):
-            header_size = 16 + len(self.filenames[i]) + 1
+            filename = self.filenames[i].encode("shift-jis")
+            header_size = 16 + len(filename) + 1
             header_size += 4 - header_size % 4
 
             total_size = header_size + len(self.files[i])
             total_size += 4 - total_size % 4
-            c = wtr.c
-            wtr.write_uint32(header_size)
-            wtr.write_uint32(total_size)
-            wtr.write_uint32(0)
-            wtr.write_uint32(len(self.files[i]))
-
-            wtr.write_string(self.filenames[i])
-            wtr.seek(c + header_size)
+            wtr.write_struct("4I", header_size, total_size, 0, len(self.files[i]))
+            wtr.write(filename)
+            wtr.write_zeros(header_size - 16 - len(filename))
             wtr.write(self.files[i])
-            # Seek while adding bytes
-            while wtr.c != c + total_size:
-                wtr.write_uint8(0)
+            wtr.write_zeros(total_size - header_size - len(self.files[i]))
+
+        file_size.set(wtr.tell() - start)
+        if wtr is not stream:
+            with wtr.getbuffer() as view:
+                stream.write(view)
 
-        file_size = len(wtr)
-        wtr.seek(4)
-        wtr.write_uint32(file_size)
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.clear_modified()
 
     def open(self, file: Union[AnyStr, int], mode: str = "rb") -> Union[io.BytesIO, io.TextIOWrapper]:
         match = re.findall(r"^([rwa])(b?)(\+?)$", mode)
@@ -558,38 +1261,83 @@ class PlzArchive(Archive, FileFormat):
         if isinstance(file, int):
             fileid = file
         else:
-            try:
-                fileid = self.filenames.index(file)
-            except ValueError:
-                fileid = None
+            fileid = self.get_file_id(file)
             if fileid is None and create:
                 fileid = self.add_file(file)
-                if not fileid:
+                if fileid is None:
                     raise FileNotFoundError(f"file '{file}' could not be opened nor created")
             if fileid is None:
                 raise FileNotFoundError(f"file '{file}' could not be opened")
 
-        rom_file = RomFile(self, fileid, match[0][0])
+        if match[0][0] == "r":
+            rom_file = RomFileReader(self, fileid, name=self.filenames[fileid])
+        else:
+            rom_file = RomFile(self, fileid, match[0][0], name=self.filenames[fileid])
         if text:
             return io.TextIOWrapper(rom_file)
         return rom_file
 
+    def get_file_id(self, file: str) -> Optional[int]:
+        return self._get_file_ids().get(file)
+
+    def _get_file_ids(self) -> Dict[str, int]:
+        # Rebuilt if the list of file names was replaced, when reading the archive again for example
+        if self._file_ids is None or self._indexed_filenames is not self.filenames:
+            self._file_ids = {}
+            for i, filename in enumerate(self.filenames):
+                self._file_ids.setdefault(filename, i)
+            self._indexed_filenames = self.filenames
+        return self._file_ids
+
+    def _update_file_ids(self, *filenames: str):
+        # Indexes the files with these names again, after they were removed or renamed
+        for filename in filenames:
+            if filename in self.filenames:
+                self._file_ids[filename] = self.filenames.index(filename)
+            else:
+                self._file_ids.pop(filename, None)
+
     def add_file(self, filename: str):
+        file_ids = self._get_file_ids()
         new_file_id = len(self.files)
         self.files.append(b"")
         self.filenames.append(filename)
+        file_ids.setdefault(filename, new_file_id)
+        self.set_modified()
 
         return new_file_id
 
     def remove_file(self, filename: str):
-        if filename not in self.filenames:
+        index = self.get_file_id(filename)
+        if index is None:
             return
-        index = self.filenames.index(filename)
         self.files.pop(index)
         self.filenames.pop(index)
+        self.modified_files = self.modified_files - {index}
+        self._shift_file_ids(index + 1, -1, self.filenames[index:])
+        self._update_file_ids(filename)
+        self.set_modified()
 
     def rename_file(self, old_filename, new_filename):
-        if old_filename not in self.filenames:
+        index = self.get_file_id(old_filename)
+        if index is None:
             return
-        index = self.filenames.index(old_filename)
         self.filenames[index] = new_filename
+        self._update_file_ids(old_filename, new_filename)
+        self.set_modified()
+
+
+def _build_archive(filenames: List[str], files: List[bytes], compressed: int, compression_type: int,
+                   max_compression: bool) -> Tuple[bytes, float]:
+    # Run in the processes rebuilding archives on save, returns the data of the archive in the ROM like
+    # PlzArchive.save, and the time taken
+    start = time.perf_counter()
+    archive = PlzArchive(compressed=False)
+    archive.filenames = filenames
+    archive.files = files
+    wtr = BinaryWriter()
+    archive.write_stream(wtr)
+    data = wtr.getvalue()
+    if compressed:
+        data = compress(data, compression_type, double_typed=compressed == 2, max_compression=max_compression)
+    return data, time.perf_counter() - start
@@ -31,10 +31,7 @@ class GDS(FileFormat):
     _compressed_default = 0
 
     def read_stream(self, stream: BinaryIO):
-        if isinstance(stream, BinaryReader):
-            rdr = stream
-        else:
-            rdr = BinaryReader(stream)
+        rdr = BinaryReader.from_stream(stream)
 
         self.commands = []
         self.params = []
@@ -4,7 +4,6 @@ from math import floor, ceil, log
 from typing import *
 from typing import BinaryIO
 
-import ndspy.color
 import numpy as np
 from PIL.ImageQt import ImageQt
 from PySide6 import QtGui
@@ -12,6 +11,7 @@ from PIL import Image
 
 from formats.binary import BinaryReader, BinaryWriter, SEEK_CUR
 from formats.filesystem import FileFormat
+from formats.graphics.color import unpack255_array, pack255_array
 
 from fezzypixels.shift import rgb888_to_norm
 from fezzypixels.palette import median_cut_srgb_palette, flatten_with_flat_roi_enhancement, refine_palette
@@ -204,10 +204,7 @@ class AniSprite(FileFormat):
         return var_dict
 
     def read_stream(self, stream: BinaryIO):
-        if isinstance(stream, BinaryReader):
-            rdr = stream
-        else:
-            rdr = BinaryReader(stream)
+        rdr = BinaryReader.from_stream(stream)
 
         n_images = rdr.read_uint16()
         self.color_depth = 4 if rdr.read_uint16() == 3 else 8
@@ -229,10 +226,10 @@ class AniSprite(FileFormat):
                 part_h = 2 ** (3 + rdr.read_uint16())
 
                 if self.color_depth == 8:
-                    part = np.frombuffer(rdr.read(part_h * part_w), np.uint8)
+                    part = rdr.read_array(np.uint8, part_h * part_w)
                     part = part.reshape((part_h, part_w))
                 else:
-                    bufpart = np.frombuffer(rdr.read(part_h * part_w // 2), np.uint8)
+                    bufpart = rdr.read_array(np.uint8, part_h * part_w // 2)
                     part = np.zeros((part_w * part_h), np.uint8)
                     part[0::2] = bufpart & 0xf
                     part[1::2] = bufpart >> 4
@@ -247,11 +244,8 @@ class AniSprite(FileFormat):
             self.images.append(img)
 
         palette_length = rdr.read_uint32()
-        self.palette = np.zeros((palette_length, 4), np.uint8)
-        for color_i in range(palette_length):
-            self.palette[color_i] = ndspy.color.unpack255(rdr.read_uint16())
-            if color_i:
-                self.palette[color_i, 3] = 255
+        self.palette = unpack255_array(rdr.read_array(np.uint16, palette_length))
+        self.palette[1:, 3] = 255
 
         rdr.seek(0x1E, SEEK_CUR)
         n_animations = rdr.read_uint32()
@@ -273,10 +267,7 @@ class AniSprite(FileFormat):
             return  # We hit end of stream
 
         self.variable_labels = rdr.read_string_array(16, 16)
-        self.variable_data = [[] for _ in range(16)]
-        for _ in range(8):
-            for var_i in range(16):
-                self.variable_data[var_i].append(rdr.read_int16())
+        self.variable_data = rdr.read_array(np.int16, 8 * 16).reshape((8, 16)).T.tolist()
 
         for anim in self.animations:
             anim.child_image_x = rdr.read_uint16()
@@ -346,11 +337,9 @@ class AniSprite(FileFormat):
                 part_y += part_h
 
         wtr.write_uint32(len(self.palette))
-        for color_i in range(len(self.palette)):
-            self.palette[color_i, 3] = 0
-            wtr.write_uint16(ndspy.color.pack255(*self.palette[color_i].astype(np.uint16)))
-            if color_i:
-                self.palette[color_i, 3] = 255
+        self.palette[:, 3] = 0
+        wtr.write_array(pack255_array(self.palette))
+        self.palette[1:, 3] = 255
 
         wtr.write_zeros(0x1e)
         wtr.write_uint32(len(self.animations))
@@ -524,7 +513,7 @@ class AniSubSprite(AniSprite):
     """
 
     def read_stream(self, stream: BinaryIO):
-        rdr = stream if isinstance(stream, BinaryReader) else BinaryReader(stream)
+        rdr = BinaryReader.from_stream(stream)
 
         n_images = rdr.read_uint16()
         self.color_depth = 4 if rdr.read_uint16() == 3 else 8
@@ -548,9 +537,9 @@ class AniSubSprite(AniSprite):
                 part_w = 2 ** (3 + rdr.read_uint16())
                 part_h = 2 ** (3 + rdr.read_uint16())
                 if self.color_depth == 8:
-                    part = np.frombuffer(rdr.read(part_h * part_w), np.uint8)
+                    part = rdr.read_array(np.uint8, part_h * part_w)
                 else:
-                    bufpart = np.frombuffer(rdr.read(part_h * part_w // 2), np.uint8)
+                    bufpart = rdr.read_array(np.uint8, part_h * part_w // 2)
                     part = np.zeros((part_w * part_h), np.uint8)
                     part[0::2] = bufpart & 0xf
                     part[1::2] = bufpart >> 4
@@ -572,11 +561,8 @@ class AniSubSprite(AniSprite):
 
             self.images.append(img)
 
-        self.palette = np.zeros((palette_length, 4), np.uint8)
-        for color_i in range(palette_length):
-            self.palette[color_i] = ndspy.color.unpack255(rdr.read_uint16())
-            if color_i:
-                self.palette[color_i, 3] = 255
+        self.palette = unpack255_array(rdr.read_array(np.uint16, palette_length))
+        self.palette[1:, 3] = 255
 
         rdr.seek(0x1E, SEEK_CUR)
         n_animations = rdr.read_uint32()
@@ -598,10 +584,7 @@ class AniSubSprite(AniSprite):
             return  # We hit end of stream
 
         self.variable_labels = rdr.read_string_array(16, 16)
-        self.variable_data = [[] for _ in range(16)]
-        for _ in range(8):
-            for var_i in range(16):
-                self.variable_data[var_i].append(rdr.read_int16())
+        self.variable_data = rdr.read_array(np.int16, 8 * 16).reshape((8, 16)).T.tolist()
 
         for anim in self.animations:
             anim.child_image_x = rdr.read_int16()
@@ -724,11 +707,9 @@ class AniSubSprite(AniSprite):
             wtr.write_uint16(count)
             wtr.seek(last_pos)
 
-        for color_i in range(len(self.palette)):
-            self.palette[color_i, 3] = 0
-            wtr.write_uint16(ndspy.color.pack255(*self.palette[color_i].astype(np.uint16)))
-            if color_i:
-                self.palette[color_i, 3] = 255
+        self.palette[:, 3] = 0
+        wtr.write_array(pack255_array(self.palette))
+        self.palette[1:, 3] = 255
 
         wtr.write_zeros(0x1e)
         wtr.write_uint32(len(self.animations))
@@ -3,12 +3,12 @@ from typing import BinaryIO
 
 from formats.filesystem import FileFormat
 from formats.binary import BinaryReader, BinaryWriter
+from formats.graphics.color import unpack255_array, pack255_array
 
 from PIL import Image
 from PIL.ImageQt import ImageQt
 from PySide6 import QtGui
 import numpy as np
-import ndspy.color
 
 from fezzypixels.shift import rgb888_to_norm
 from fezzypixels.palette import median_cut_srgb_palette, flatten_with_flat_roi_enhancement, refine_palette
@@ -44,22 +44,18 @@ class BGImage(FileFormat):
         super().__init__(filename=filename, **kwargs)
 
     def read_stream(self, stream: BinaryIO):
-        if isinstance(stream, BinaryReader):
-            rdr = stream
-        else:
-            rdr = BinaryReader(stream)
+        if not isinstance(stream, BinaryReader):
+            stream.seek(0)
+        rdr = BinaryReader.from_stream(stream)
         rdr.seek(0)
 
         palette_length = rdr.read_uint32()
-        self.palette = np.zeros((palette_length, 4), np.uint8)
-        for color_i in range(palette_length):
-            self.palette[color_i] = ndspy.color.unpack255(rdr.read_uint16())
-            if color_i:
-                self.palette[color_i, 3] = 255
+        self.palette = unpack255_array(rdr.read_array(np.uint16, palette_length))
+        self.palette[1:, 3] = 255
 
         n_tiles = rdr.read_uint32()
         # Read tiles and assemble image
-        tiles = np.frombuffer(rdr.read(n_tiles * 0x40), np.uint8).reshape((n_tiles, 8, 8))
+        tiles = rdr.read_array(np.uint8, n_tiles * 0x40).reshape((n_tiles, 8, 8))
 
         map_w = rdr.read_uint16()
         map_h = rdr.read_uint16()
@@ -67,14 +63,9 @@ class BGImage(FileFormat):
         img_w = map_w * 8
         img_h = map_h * 8
 
-        self.image = np.zeros((img_h, img_w), np.uint8)
-
-        for map_y in range(map_h):
-            for map_x in range(map_w):
-                img_y = map_y * 8
-                img_x = map_x * 8
-
-                self.image[img_y:img_y + 8, img_x:img_x + 8] = tiles[rdr.read_uint16()]
+        # Place the tile of every map entry, row by row
+        tile_map = rdr.read_array(np.uint16, map_w * map_h)
+        self.image = tiles[tile_map].reshape((map_h, map_w, 8, 8)).swapaxes(1, 2).reshape((img_h, img_w))
 
     def write_stream(self, stream):
         if isinstance(stream, BinaryWriter):
@@ -83,32 +74,28 @@ class BGImage(FileFormat):
             wtr = BinaryWriter(stream)
 
         wtr.write_uint32(len(self.palette))
-        for color_i in range(len(self.palette)):
-            self.palette[color_i, 3] = 0
-            wtr.write_uint16(ndspy.color.pack255(*self.palette[color_i].astype(np.uint16)))
-            self.palette[color_i, 3] = 255
+        self.palette[:, 3] = 0
+        wtr.write_array(pack255_array(self.palette))
+        self.palette[:, 3] = 255
 
         img_h, img_w = self.image.shape
         map_h, map_w = img_h // 8, img_w // 8
 
-        # Get all 8x8 unique tiles
+        # Get all 8x8 unique tiles, in order of first use
         tiles = np.asarray([self.image[y * 8:y * 8 + 8, x * 8:x * 8 + 8] for y in range(map_h) for x in range(map_w)])
-        _, idx = np.unique(tiles, return_index=True, axis=0)
-        tiles = tiles[np.sort(idx)]
+        _, idx, inverse = np.unique(tiles, return_index=True, return_inverse=True, axis=0)
+        order = np.argsort(idx)
+        tiles = tiles[idx[order]]
         wtr.write_uint32(len(tiles))
         wtr.write(tiles.tobytes())
 
         wtr.write_uint16(map_w)
         wtr.write_uint16(map_h)
 
-        for y in range(map_h):
-            for x in range(map_w):
-                # Get tile and write the index of the tile
-                tile = self.image[y * 8:y * 8 + 8, x * 8:x * 8 + 8]
-
-                # Get tile id (numpy magic lol)
-                tile_id = np.where(np.all(tile.reshape((64,)) == tiles.reshape(tiles.shape[0], 64), axis=1) == True)
-                wtr.write_uint16(tile_id[0][0])
+        # Index of the tile of every map entry in the written tiles
+        tile_ids = np.empty(len(order), np.uint16)
+        tile_ids[order] = np.arange(len(order))
+        wtr.write_array(tile_ids[inverse.reshape(-1)])
 
     def extract_image_qt(self) -> QtGui.QPixmap:
         """
@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def unpack255_array(colors: np.ndarray) -> np.ndarray:
+    """
+    Unpacks an array of colors, like ndspy.color.unpack255 does for a single color.
+
+    Parameters
+    ----------
+    colors : np.ndarray
+        The colors as (a1, b5, g5, r5) 16 bit values.
+
+    Returns
+    -------
+    np.ndarray
+        An array of shape (len(colors), 4) with the r8, g8, b8, a8 values of the colors.
+    """
+    colors = np.asarray(colors, dtype=np.uint16)
+    unpacked = np.empty((len(colors), 4), np.uint8)
+    for channel in range(3):
+        value = (colors >> (5 * channel)) & 0x1F
+        unpacked[:, channel] = value << 3 | value >> 2
+    unpacked[:, 3] = np.where(colors & 0x8000, 255, 0)
+    return unpacked
+
+
+def pack255_array(palette: np.ndarray) -> np.ndarray:
+    """
+    Packs an array of colors, like ndspy.color.pack255 does for a single color.
+
+    Parameters
+    ----------
+    palette : np.ndarray
+        An array of shape (n, 4) with the r8, g8, b8, a8 values of the colors.
+
+    Returns
+    -------
+    np.ndarray
+        The colors as (a1, b5, g5, r5) 16 bit values.
+    """
+    palette = np.asarray(palette, dtype=np.uint16)
+    packed = (palette[:, 3] >= 128).astype(np.uint16) << 15
+    for channel in range(3):
+        packed |= (((palette[:, channel] + 4) << 2) // 33 & 0x1F) << (5 * channel)
+    return packed
@@ -0,0 +1,187 @@
+"""
+Order of the files in the data of the ROM, placing the files the game loads together next to each other.
+"""
+import logging
+import os
+import re
+from typing import *
+
+from formats.event import Event
+from formats.filesystem import NintendoDSRom
+from formats.place import Place
+
+ALIGNMENT = 0x200
+"""Alignment of the files in the ROM, as packed by ndspy."""
+
+
+def event_file_groups(rom: NintendoDSRom) -> Iterator[List[str]]:
+    """
+    Yields the paths of the files used by each event: its archives, backgrounds and characters.
+
+    Parameters
+    ----------
+    rom : NintendoDSRom
+        The ROM of the events.
+
+    Returns
+    -------
+    Iterator[List[str]]
+        The paths of the files of each event, in the order they are loaded.
+    """
+    event_folder = rom.filenames.subfolder("data_lt2/event")
+    if event_folder is None:
+        return
+    for filename in event_folder.files:
+        if not (match := re.match(r"ev_d([0-9]+[abc]?)\.plz$", filename)):
+            continue
+        archive = rom.get_archive(f"/data_lt2/event/{filename}")
+        for filename_ in archive.filenames:
+            if not re.match(r"d[0-9]+_[0-9]+\.dat$", filename_):
+                continue
+            event = Event(rom)
+            with archive.open(filename_, "rb") as f:
+                event.read_stream(f)
+            paths = [f"/data_lt2/event/{filename}", f"/data_lt2/event/{rom.lang}/ev_t{match.group(1)}.plz",
+                     f"/data_lt2/bg/event/sub{event.map_top_id}.arc",
+                     f"/data_lt2/bg/map/main{event.map_bottom_id}.arc"]
+            for character in event.characters:
+                if character != 0:
+                    paths.append(f"/data_lt2/ani/eventchr/chr{character}.arc")
+                    paths.append(f"/data_lt2/ani/eventchr/{rom.lang}/chr{character}_n.arc")
+            yield paths
+
+
+def place_file_groups(rom: NintendoDSRom) -> Iterator[List[str]]:
+    """
+    Yields the paths of the files used by each place: its archive, backgrounds, sprites, objects and exits.
+
+    Parameters
+    ----------
+    rom : NintendoDSRom
+        The ROM of the places.
+
+    Returns
+    -------
+    Iterator[List[str]]
+        The paths of the files of each place, in the order they are loaded.
+    """
+    place_folder = rom.filenames.subfolder("data_lt2/place")
+    if place_folder is None:
+        return
+    for filename in place_folder.files:
+        if not re.match(r"plc_data[1-2]\.plz$", filename):
+            continue
+        archive = rom.get_archive(f"/data_lt2/place/{filename}")
+        for filename_ in archive.filenames:
+            if not re.match(r"n_place[0-9]+_[0-9]+\.dat$", filename_):
+                continue
+            place = Place(filename=filename_, rom=archive)
+            paths = [f"/data_lt2/place/{filename}", f"/data_lt2/bg/map/map{place.map_image_index}.arc",
+                     f"/data_lt2/bg/map/main{place.background_image_index}.arc"]
+            for sprite in place.sprites:
+                if sprite.filename != "":
+                    paths.append(f"/data_lt2/ani/bgani/{os.path.splitext(sprite.filename)[0]}.arc")
+            for place_object in place.objects:
+                if place_object.character_index != 0:
+                    paths.append(f"/data_lt2/ani/eventobj/obj_{place_object.character_index}.arc")
+            for place_exit in place.exits:
+                if place_exit.event_or_place_index != 0:
+                    paths.append(f"/data_lt2/ani/map/exit_{place_exit.image_index}.arc")
+            yield paths
+
+
+def get_file_groups(rom: NintendoDSRom) -> List[List[int]]:
+    """
+    Gets the ids of the files loaded together by the events and places of the ROM.
+
+    Missing files are ignored, and each file is kept once in its group.
+    """
+    groups = []
+    for paths in [*event_file_groups(rom), *place_file_groups(rom)]:
+        group = []
+        for path in paths:
+            file_id = rom.get_file_id(path)
+            if file_id is not None and file_id not in group:
+                group.append(file_id)
+        if len(group) > 1:
+            groups.append(group)
+    return groups
+
+
+def get_file_order(rom: NintendoDSRom) -> List[int]:
+    """
+    Gets the order in which ndspy packs the files of the ROM, without the overlays which are packed apart.
+    """
+    overlay_ids = rom.get_overlay_ids()
+    order = [file_id for file_id in dict.fromkeys(rom.sortedFileIds)
+             if file_id < len(rom.files) and file_id not in overlay_ids]
+    placed = set(order)
+    order.extend(file_id for file_id in range(len(rom.files)) if file_id not in placed and file_id not in overlay_ids)
+    return order
+
+
+def average_seek_distance(rom: NintendoDSRom, groups: List[List[int]], order: List[int]) -> float:
+    """
+    Gets the average distance in bytes between the end of a file and the start of the next one in its group, with
+    the files packed in the specified order.
+    """
+    offsets = {}
+    offset = 0
+    for file_id in order:
+        offset += -offset % ALIGNMENT
+        offsets[file_id] = offset
+        offset += len(rom.files[file_id])
+
+    distance = 0
+    seeks = 0
+    for group in groups:
+        for previous_id, file_id in zip(group, group[1:]):
+            distance += abs(offsets[file_id] - (offsets[previous_id] + len(rom.files[previous_id])))
+            seeks += 1
+    return distance / seeks if seeks else 0.0
+
+
+def optimize_file_order(rom: NintendoDSRom, groups: Optional[List[List[int]]] = None) -> Tuple[float, float]:
+    """
+    Orders the files of the ROM when it's saved so the files of each group are next to each other.
+
+    The files of each group not placed yet are placed together, in the order of the group, where the first of them was
+    packed. The other files keep their order.
+
+    Parameters
+    ----------
+    rom : NintendoDSRom
+        The ROM whose files are ordered.
+    groups : List[List[int]]
+        The ids of the files loaded together, defaults to the files of the events and places (get_file_groups).
+
+    Returns
+    -------
+    Tuple[float, float]
+        The average seek distance in bytes before and after ordering the files.
+    """
+    if groups is None:
+        groups = get_file_groups(rom)
+    overlay_ids = rom.get_overlay_ids()
+    groups = [[file_id for file_id in group if file_id not in overlay_ids] for group in groups]
+
+    old_order = get_file_order(rom)
+    groups_by_file: Dict[int, List[List[int]]] = {}
+    for group in groups:
+        for file_id in group:
+            groups_by_file.setdefault(file_id, []).append(group)
+    order = []
+    placed = set()
+    for file_id in old_order:
+        for group in [*groups_by_file.get(file_id, []), [file_id]]:
+            for file_id_ in group:
+                if file_id_ not in placed:
+                    placed.add(file_id_)
+                    order.append(file_id_)
+
+    before = average_seek_distance(rom, groups, old_order)
+    after = average_seek_distance(rom, groups, order)
+    rom.sortedFileIds = order
+    logging.info(f"Average seek distance of {len(groups)} file groups: {before:.0f} bytes before, "
+                 f"{after:.0f} bytes after ordering the files")
+    return before, after
@@ -27,7 +27,7 @@ class Movie:
         movie_plz_file = self.rom.get_archive(f"/data_lt2/script/movie/{self.rom.lang}/movie.plz")
         gds_filename = f"m{self.movie_id}.gds"
 
-        if gds_filename not in movie_plz_file.filenames:
+        if gds_filename not in movie_plz_file:
             logging.error(f"GDS for movie {self.movie_id} not found")
             self.gds = formats.gds.GDS()
             return
@@ -33,11 +33,10 @@ class NFTRHeader:
         wtr.write(b"NFTR"[::-1])
         wtr.write_uint16(0xFEFF)
         wtr.write_uint16(0x100)  # TODO: Version 0x102
-        file_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # placeholder file size
+        file_size = wtr.reserve_uint32()
         wtr.write_uint16(0x10)
         wtr.write_uint16(chunk_count)
-        return file_size_pos
+        return file_size
 
 
 class FINFChunk:
@@ -81,13 +80,10 @@ class FINFChunk:
         wtr.write_uint8(self.width)
         wtr.write_uint8(self.width)
         wtr.write_uint8(self.encoding)
-        offset_to_cglp_pos = wtr.tell()
-        wtr.write_uint32(0)
-        offset_to_cwdh_pos = wtr.tell()
-        wtr.write_uint32(0)
-        offset_to_cmap_pos = wtr.tell()
-        wtr.write_uint32(0)
-        return offset_to_cglp_pos, offset_to_cwdh_pos, offset_to_cmap_pos
+        offset_to_cglp = wtr.reserve_uint32()
+        offset_to_cwdh = wtr.reserve_uint32()
+        offset_to_cmap = wtr.reserve_uint32()
+        return offset_to_cglp, offset_to_cwdh, offset_to_cmap
 
 
 def get_max_bit_steps(depth: int) -> int:
@@ -209,8 +205,7 @@ class CGLPChunk:
     def write(self, wtr: BinaryWriter):
         chunk_start = wtr.tell()
         wtr.write(b"CGLP"[::-1])
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)
+        chunk_size = wtr.reserve_uint32()
         wtr.write_uint8(self.tile_width)
         wtr.write_uint8(self.tile_height)
         tile_bytes = (self.tile_width * self.tile_height * self.tile_depth + 7) // 8
@@ -244,11 +239,8 @@ class CGLPChunk:
 
             wtr.write(bytes(buffer))
 
-        wtr.align(4)
-        chunk_end = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(chunk_end - chunk_start)
-        wtr.seek(chunk_end)
+        wtr.write_padding(4)
+        chunk_size.set(wtr.tell() - chunk_start)
 
 
 class CWDHChunk:  # Character width
@@ -287,8 +279,7 @@ class CWDHChunk:  # Character width
     def write(self, wtr: BinaryWriter, tile_count: int):
         chunk_start = wtr.tell()
         wtr.write(b"CWDH"[::-1])
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)
+        chunk_size = wtr.reserve_uint32()
         wtr.write_uint16(0)
         wtr.write_uint16(tile_count - 1)
         wtr.write_uint32(0)
@@ -296,12 +287,8 @@ class CWDHChunk:  # Character width
             wtr.write_uint8(self.left_spacing[i])
             wtr.write_uint8(self.width[i])
             wtr.write_uint8(self.total_width[i])
-        wtr.align(4)
-
-        chunk_end = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(chunk_end - chunk_start)
-        wtr.seek(chunk_end)
+        wtr.write_padding(4)
+        chunk_size.set(wtr.tell() - chunk_start)
 
 
 class CMAPChunk:
@@ -355,8 +342,7 @@ class CMAPChunk:
     def write(self, wtr: BinaryWriter):
         chunk_start = wtr.tell()
         wtr.write(b"CMAP"[::-1])
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)
+        chunk_size = wtr.reserve_uint32()
 
         characters: List[Tuple] = list(self.char_map.items())
         if len(characters) == 0:
@@ -392,8 +378,7 @@ class CMAPChunk:
             wtr.write_uint16(0xFFFF)
 
         wtr.write_uint32(map_type)
-        offset_to_next_cmap_pos = wtr.tell()
-        wtr.write_uint32(0)
+        offset_to_next_cmap = wtr.reserve_uint32()
 
         if map_type == 0:
             wtr.write_uint16(characters[0][1])
@@ -406,14 +391,10 @@ class CMAPChunk:
                 wtr.write_uint16(ch)
                 wtr.write_uint16(tile)
 
-        wtr.align(4)
-
-        chunk_end = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(chunk_end - chunk_start)
-        wtr.seek(chunk_end)
+        wtr.write_padding(4)
+        chunk_size.set(wtr.tell() - chunk_start)
 
-        return offset_to_next_cmap_pos
+        return offset_to_next_cmap
 
 
 class NFTR(FileFormat):
@@ -462,32 +443,21 @@ class NFTR(FileFormat):
         else:
             wtr = BinaryWriter(stream)
 
-        file_size_pos = self.header.write(wtr, 3 + len(self.char_maps))
-        offset_to_cglp_pos, offset_to_cwdh_pos, offset_to_cmap_pos = self.font_info.write(wtr)
+        file_size = self.header.write(wtr, 3 + len(self.char_maps))
+        offset_to_cglp, offset_to_cwdh, offset_to_cmap = self.font_info.write(wtr)
 
-        def write_pos_seek_back(wtr_pos, add=0):
-            pos = wtr.tell()
-            wtr.seek(wtr_pos)
-            wtr.write_uint32(pos + add)
-            wtr.seek(pos)
-
-        write_pos_seek_back(offset_to_cglp_pos, add=8)
+        offset_to_cglp.set(wtr.tell() + 8)
         self.char_glyph.write(wtr)
 
-        write_pos_seek_back(offset_to_cwdh_pos, add=8)
+        offset_to_cwdh.set(wtr.tell() + 8)
         self.char_width.write(wtr, len(self.char_glyph.tile_bitmaps))
 
-        cmap_wtr_pos = offset_to_cmap_pos
+        offset_to_next_cmap = offset_to_cmap
         for cmap_chunk in self.char_maps:
-            write_pos_seek_back(cmap_wtr_pos, add=8)
-            cmap_wtr_pos = cmap_chunk.write(wtr)
-
-        write_pos_seek_back(file_size_pos)
+            offset_to_next_cmap.set(wtr.tell() + 8)
+            offset_to_next_cmap = cmap_chunk.write(wtr)
 
-        # Match file size after alignment
-        if len(wtr.getvalue()) != wtr.tell():
-            wtr.seek(wtr.tell() - 1)
-            wtr.write(b"\0")
+        file_size.set(wtr.tell())
 
     def get_encoding_str(self):
         encoding_dict = {
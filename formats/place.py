@@ -3,59 +3,61 @@ from typing import *
 
 from formats.binary import *
 from formats.filesystem import FileFormat
+from formats.record import *
 
 
 @dataclass
-class PlaceHintCoin:
-    x: int = 0
-    y: int = 0
-    width: int = 0
-    height: int = 0
+class PlaceHintCoin(Record):
+    x: int = uint8()
+    y: int = uint8()
+    width: int = uint8()
+    height: int = uint8()
 
 
 @dataclass
-class PlaceExit:
-    x: int = 0
-    y: int = 0
-    width: int = 0
-    height: int = 0
-    image_index: int = 0
-    unk0: int = 0
-    unk1: int = 0
-    unk2: int = 0
-    next_map_x: int = 0
-    next_map_y: int = 0
-    event_or_place_index: int = 0
+class PlaceExit(Record):
+    x: int = uint8()
+    y: int = uint8()
+    width: int = uint8()
+    height: int = uint8()
+    image_index: int = uint8()
+    unk0: int = uint8()
+    unk1: int = uint8()
+    unk2: int = uint8()
+    next_map_x: int = uint8()
+    next_map_y: int = uint8()
+    event_or_place_index: int = uint16()
 
 
 @dataclass
-class PlaceComment:
-    x: int = 0
-    y: int = 0
-    width: int = 0
-    height: int = 0
-    character_index: int = 0
-    text_index: int = 0
+class PlaceComment(Record):
+    x: int = uint8()
+    y: int = uint8()
+    width: int = uint8()
+    height: int = uint8()
+    character_index: int = uint16()
+    text_index: int = uint16()
+    _unk: None = padding(2)  # 0
 
 
 @dataclass
-class PlaceSprite:
-    x: int = 0
-    y: int = 0
-    filename: str = ""
+class PlaceSprite(Record):
+    x: int = uint8()
+    y: int = uint8()
+    filename: str = string(0x1e)
 
 
 @dataclass
-class PlaceObject:
-    x: int = 0
-    y: int = 0
-    width: int = 0
-    height: int = 0
-    character_index: int = 0
-    event_index: int = 0
-    unk: int = 0
+class PlaceObject(Record):
+    x: int = uint8()
+    y: int = uint8()
+    width: int = uint8()
+    height: int = uint8()
+    character_index: int = uint8()
+    unk: int = uint8()
     # Unk: 4 means it is a puzzle that is activated through the camera
     #      1 has something to do with the torn out photo pieces
+    event_index: int = uint16()
 
 
 class Place(FileFormat):
@@ -84,53 +86,15 @@ class Place(FileFormat):
         self.background_image_index = rdr.read_uint8()
         self.map_image_index = rdr.read_uint8()
 
-        self.hint_coins: List[PlaceHintCoin] = [PlaceHintCoin() for _ in range(4)]
-        self.sprites: List[PlaceSprite] = [PlaceSprite() for _ in range(12)]
-        self.objects: List[PlaceObject] = [PlaceObject() for _ in range(16)]
-        self.comments: List[PlaceComment] = [PlaceComment() for _ in range(16)]
-        self.exits: List[PlaceExit] = [PlaceExit() for _ in range(12)]  # maybe it's 16 exits
-
-        for hint_coin in self.hint_coins:
-            hint_coin.x = rdr.read_uint8()
-            hint_coin.y = rdr.read_uint8()
-            hint_coin.width = rdr.read_uint8()
-            hint_coin.height = rdr.read_uint8()
+        self.hint_coins: List[PlaceHintCoin] = PlaceHintCoin.read_array(rdr, 4)
         # pos: 0x2c
-        for comment in self.comments:
-            comment.x = rdr.read_uint8()
-            comment.y = rdr.read_uint8()
-            comment.width = rdr.read_uint8()
-            comment.height = rdr.read_uint8()
-            comment.character_index = rdr.read_uint16()
-            comment.text_index = rdr.read_uint16()
-            rdr.read_uint16()  # 0
+        self.comments: List[PlaceComment] = PlaceComment.read_array(rdr, 16)
         # pos: 0xcc
-        for sprite in self.sprites:
-            sprite.x = rdr.read_uint8()
-            sprite.y = rdr.read_uint8()
-            sprite.filename = rdr.read_string(0x1e)
+        self.sprites: List[PlaceSprite] = PlaceSprite.read_array(rdr, 12)
         # pos: 0x24c
-        for plc_object in self.objects:
-            plc_object.x = rdr.read_uint8()
-            plc_object.y = rdr.read_uint8()
-            plc_object.width = rdr.read_uint8()
-            plc_object.height = rdr.read_uint8()
-            plc_object.character_index = rdr.read_uint8()
-            plc_object.unk = rdr.read_uint8()
-            plc_object.event_index = rdr.read_uint16()
+        self.objects: List[PlaceObject] = PlaceObject.read_array(rdr, 16)
         # pos: 0x2cc
-        for plc_exit in self.exits:
-            plc_exit.x = rdr.read_uint8()
-            plc_exit.y = rdr.read_uint8()
-            plc_exit.width = rdr.read_uint8()
-            plc_exit.height = rdr.read_uint8()
-            plc_exit.image_index = rdr.read_uint8()
-            plc_exit.unk0 = rdr.read_uint8()
-            plc_exit.unk1 = rdr.read_uint8()
-            plc_exit.unk2 = rdr.read_uint8()
-            plc_exit.next_map_x = rdr.read_uint8()
-            plc_exit.next_map_y = rdr.read_uint8()
-            plc_exit.event_or_place_index = rdr.read_uint16()
+        self.exits: List[PlaceExit] = PlaceExit.read_array(rdr, 12)  # maybe it's 16 exits
         # pos: 0x35c (if we make 16 exits it lines up so...?)
         rdr.seek(0x38c)
         self.sound_profile = rdr.read_uint16()
@@ -143,42 +107,10 @@ class Place(FileFormat):
         wtr.write_uint8(self.map_y)
         wtr.write_uint8(self.background_image_index)
         wtr.write_uint8(self.map_image_index)
-        for hint_coin in self.hint_coins:
-            wtr.write_uint8(hint_coin.x)
-            wtr.write_uint8(hint_coin.y)
-            wtr.write_uint8(hint_coin.width)
-            wtr.write_uint8(hint_coin.height)
-        for comment in self.comments:
-            wtr.write_uint8(comment.x)
-            wtr.write_uint8(comment.y)
-            wtr.write_uint8(comment.width)
-            wtr.write_uint8(comment.height)
-            wtr.write_uint16(comment.character_index)
-            wtr.write_uint16(comment.text_index)
-            wtr.write_uint16(0)
-        for sprite in self.sprites:
-            wtr.write_uint8(sprite.x)
-            wtr.write_uint8(sprite.y)
-            wtr.write_string(sprite.filename, 0x1e)
-        for plc_object in self.objects:
-            wtr.write_uint8(plc_object.x)
-            wtr.write_uint8(plc_object.y)
-            wtr.write_uint8(plc_object.width)
-            wtr.write_uint8(plc_object.height)
-            wtr.write_uint8(plc_object.character_index)
-            wtr.write_uint8(plc_object.unk)
-            wtr.write_uint16(plc_object.event_index)
-        for plc_exit in self.exits:
-            wtr.write_uint8(plc_exit.x)
-            wtr.write_uint8(plc_exit.y)
-            wtr.write_uint8(plc_exit.width)
-            wtr.write_uint8(plc_exit.height)
-            wtr.write_uint8(plc_exit.image_index)
-            wtr.write_uint8(plc_exit.unk0)
-            wtr.write_uint8(plc_exit.unk1)
-            wtr.write_uint8(plc_exit.unk2)
-            wtr.write_uint8(plc_exit.next_map_x)
-            wtr.write_uint8(plc_exit.next_map_y)
-            wtr.write_uint16(plc_exit.event_or_place_index)
+        PlaceHintCoin.write_array(wtr, self.hint_coins)
+        PlaceComment.write_array(wtr, self.comments)
+        PlaceSprite.write_array(wtr, self.sprites)
+        PlaceObject.write_array(wtr, self.objects)
+        PlaceExit.write_array(wtr, self.exits)
         wtr.seek(0x38c)
         wtr.write_uint16(self.sound_profile)
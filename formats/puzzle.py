@@ -184,7 +184,7 @@ class Puzzle:
             bank = 3
 
         plz: formats.filesystem.PlzArchive = rom.get_archive(f"/data_lt2/nazo/{self.rom.lang}/nazo{bank}.plz")
-        if f"n{self.internal_id}.dat" not in plz.filenames:
+        if f"n{self.internal_id}.dat" not in plz:
             logging.error(f"Nazo dat not found (internal id {self.internal_id})")
             return None
 
@@ -229,7 +229,7 @@ class Puzzle:
 
         gds_filename = f"q{self.internal_id}_param.gds"
 
-        if gds_filename not in gds_plz_file.filenames:
+        if gds_filename not in gds_plz_file:
             logging.error(f"GDS for puzzle {self.internal_id} not found")
             return
 
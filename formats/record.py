@@ -0,0 +1,296 @@
+import dataclasses
+import struct
+from typing import *
+
+import numpy as np
+
+from formats.binary import BinaryReader, BinaryWriter
+
+__all__ = ["Record", "int8", "uint8", "int16", "uint16", "int32", "uint32", "boolean", "string", "padding"]
+
+
+def _value(fmt: str, dtype: str, default, count: Optional[int], const) -> Any:
+    metadata = {"format": fmt, "dtype": dtype, "count": count, "const": const}
+    if const is not None:
+        return dataclasses.field(default=const, init=False, repr=False, compare=False, metadata=metadata)
+    if count is not None:
+        return dataclasses.field(default_factory=lambda: [default] * count, metadata=metadata)
+    return dataclasses.field(default=default, metadata=metadata)
+
+
+def int8(default: int = 0, count: Optional[int] = None, const: Optional[int] = None) -> Any:
+    """
+    Declares a signed 8 bit field of a Record.
+
+    Parameters
+    ----------
+    default : int
+        The value of the field on new records.
+    count : Optional[int]
+        If set, the field is a list of count values.
+    const : Optional[int]
+        If set, the field always has this value: it is checked when reading and can't be set on creation.
+    """
+    return _value("b", "i1", default, count, const)
+
+
+def uint8(default: int = 0, count: Optional[int] = None, const: Optional[int] = None) -> Any:
+    """Declares an unsigned 8 bit field of a Record, see int8."""
+    return _value("B", "u1", default, count, const)
+
+
+def int16(default: int = 0, count: Optional[int] = None, const: Optional[int] = None) -> Any:
+    """Declares a signed 16 bit field of a Record, see int8."""
+    return _value("h", "<i2", default, count, const)
+
+
+def uint16(default: int = 0, count: Optional[int] = None, const: Optional[int] = None) -> Any:
+    """Declares an unsigned 16 bit field of a Record, see int8."""
+    return _value("H", "<u2", default, count, const)
+
+
+def int32(default: int = 0, count: Optional[int] = None, const: Optional[int] = None) -> Any:
+    """Declares a signed 32 bit field of a Record, see int8."""
+    return _value("i", "<i4", default, count, const)
+
+
+def uint32(default: int = 0, count: Optional[int] = None, const: Optional[int] = None) -> Any:
+    """Declares an unsigned 32 bit field of a Record, see int8."""
+    return _value("I", "<u4", default, count, const)
+
+
+def boolean(default: bool = False, count: Optional[int] = None) -> Any:
+    """Declares a boolean field (one byte) of a Record, see int8."""
+    return _value("?", "?", default, count, None)
+
+
+def string(size: int, encoding: Optional[str] = "shift_jis", pad: bytes = b"\0", default: AnyStr = "") -> Any:
+    """
+    Declares a fixed size string field of a Record, read and written like BinaryReader.read_string(size).
+
+    Parameters
+    ----------
+    size : int
+        Size of the field in bytes.
+    encoding : Optional[str]
+        Encoding of the string, None to keep it as bytes.
+    pad : bytes
+        Byte filling the field after the string.
+    default : AnyStr
+        The value of the field on new records.
+    """
+    return dataclasses.field(default=default, metadata={"format": f"{size}s", "dtype": f"S{size}", "count": None,
+                                                        "const": None, "size": size, "encoding": encoding,
+                                                        "pad": pad})
+
+
+def padding(size: int) -> Any:
+    """
+    Declares bytes of a Record which are skipped when reading and written as zeros.
+
+    Parameters
+    ----------
+    size : int
+        Number of bytes.
+    """
+    return dataclasses.field(default=None, init=False, repr=False, compare=False,
+                             metadata={"format": f"{size}x", "dtype": None})
+
+
+class _Layout:
+    """
+    The binary layout of a Record class, compiled from its fields.
+    """
+    def __init__(self, cls: type):
+        self.name = cls.__name__
+        self.format = ""
+        self.names: List[str] = []
+        self.counts: List[Optional[int]] = []
+        self.consts: List[Tuple[int, str, Any]] = []
+        self.strings: List[Tuple[int, int, Optional[str], bytes]] = []
+        self.positions: List[int] = []  # index of the first value of each field in the struct
+        dtype_names, dtype_formats, dtype_offsets = [], [], []
+        for field in dataclasses.fields(cls):
+            if "format" not in field.metadata:
+                raise TypeError(f"Field {field.name} of {cls.__name__} doesn't declare its binary type")
+            metadata = field.metadata
+            count = metadata["count"] if metadata["dtype"] is not None else None
+            field_format = metadata["format"] if count is None else f"{count}{metadata['format']}"
+            if metadata["dtype"] is not None:
+                dtype_names.append(field.name)
+                dtype_formats.append(metadata["dtype"] if count is None else (metadata["dtype"], (count,)))
+                dtype_offsets.append(struct.calcsize("<" + self.format))
+                if metadata["const"] is not None:
+                    self.consts.append((len(self.names), field.name, metadata["const"]))
+                if "encoding" in metadata:
+                    self.strings.append((len(self.names), metadata["size"], metadata["encoding"], metadata["pad"]))
+                self.positions.append(sum(1 if count is None else count for count in self.counts))
+                self.names.append(field.name)
+                self.counts.append(count)
+            self.format += field_format
+        self.struct = struct.Struct("<" + self.format)
+        self.dtype = np.dtype({"names": dtype_names, "formats": dtype_formats, "offsets": dtype_offsets,
+                               "itemsize": self.struct.size})
+        self.grouped = any(count is not None for count in self.counts)
+
+    def group(self, values: Tuple[Any, ...]) -> List[Any]:
+        # Puts the values of fields with a count into lists, like numpy's tolist does
+        row = []
+        i = 0
+        for count in self.counts:
+            if count is None:
+                row.append(values[i])
+                i += 1
+            else:
+                row.append(list(values[i:i + count]))
+                i += count
+        return row
+
+    def decode(self, row: List[Any]):
+        for i, _, encoding, pad in self.strings:
+            value = row[i].split(pad)[0].split(b"\0")[0]
+            row[i] = value.decode(encoding) if encoding else value
+
+    def check(self, row: List[Any]):
+        for i, name, const in self.consts:
+            value = row[i]
+            if value != const:
+                raise ValueError(f"{self.name}.{name} is {value!r} instead of {const!r}")
+
+    def pack(self, record) -> bytes:
+        values = []
+        for i, name in enumerate(self.names):
+            value = getattr(record, name)
+            if self.counts[i] is None:
+                values.append(value)
+            elif len(value) != self.counts[i]:
+                raise ValueError(f"{self.name}.{name} should have {self.counts[i]} values, not {len(value)}")
+            else:
+                values.extend(value)
+        if self.strings:
+            for i, size, encoding, pad in self.strings:
+                value = values[self.positions[i]]
+                if encoding and isinstance(value, str):
+                    value = value.encode(encoding)
+                values[self.positions[i]] = value[:size] + pad * (size - len(value))
+        return self.struct.pack(*values)
+
+
+class Record:
+    """
+    Base class for dataclasses representing fixed size binary records.
+
+    The fields are declared with the functions of this module (uint8, int16, string, ...), in the order they are
+    stored. The layout is compiled once to a struct.Struct, used to read or write a record in one call, and to a
+    numpy structured dtype, used to read arrays of records and check their constant fields in one pass.
+
+    Examples
+    --------
+    >>> @dataclass
+    ... class Entry(Record):
+    ...     id_: int = uint16()
+    ...     _magic: int = uint16(const=0xAA01)
+    ...     volume: int = int8()
+    ...     _pad: None = padding(3)
+    """
+    _layout: ClassVar[_Layout]
+
+    @classmethod
+    def _get_layout(cls) -> _Layout:
+        # Compiled on first use, dataclass fields don't exist yet when the class is created
+        layout = cls.__dict__.get("_layout")
+        if layout is None:
+            layout = _Layout(cls)
+            cls._layout = layout
+        return layout
+
+    @classmethod
+    def size(cls) -> int:
+        """
+        Returns the size of a record in bytes.
+        """
+        return cls._get_layout().struct.size
+
+    def _set_row(self, row: List[Any]):
+        self.__dict__.update(zip(self._get_layout().names, row))
+
+    def read(self, rdr: BinaryReader):
+        """
+        Reads the fields of the record.
+
+        Parameters
+        ----------
+        rdr : BinaryReader
+            The reader, positioned at the start of the record.
+        """
+        layout = self._get_layout()
+        values = rdr.read_struct(layout.format)
+        if values is None:
+            raise ValueError(f"Not enough data to read {layout.name}")
+        row = layout.group(values) if layout.grouped else list(values)
+        if layout.strings:
+            layout.decode(row)
+        layout.check(row)
+        self._set_row(row)
+
+    def write(self, wtr: BinaryWriter):
+        """
+        Writes the fields of the record.
+
+        Parameters
+        ----------
+        wtr : BinaryWriter
+            The writer, positioned where the record should be written.
+        """
+        wtr.write(self._get_layout().pack(self))
+
+    @classmethod
+    def read_array(cls, rdr: BinaryReader, n: int) -> list:
+        """
+        Reads n consecutive records.
+
+        Parameters
+        ----------
+        rdr : BinaryReader
+            The reader, positioned at the start of the first record.
+        n : int
+            Number of records to read.
+
+        Returns
+        -------
+        list
+            The records read.
+        """
+        layout = cls._get_layout()
+        array = rdr.read_array(layout.dtype, n)
+        if array is None:
+            raise ValueError(f"Not enough data to read {n} {layout.name}")
+        for _, name, const in layout.consts:
+            wrong = np.flatnonzero(array[name] != const)
+            if len(wrong):
+                raise ValueError(f"{layout.name}.{name} is {array[name][wrong[0]].item()!r} instead of {const!r} "
+                                 f"(record {wrong[0]})")
+        records = []
+        for row in zip(*(array[name].tolist() for name in layout.names)):
+            row = list(row)
+            if layout.strings:
+                layout.decode(row)
+            record = cls.__new__(cls)
+            record._set_row(row)
+            records.append(record)
+        return records
+
+    @classmethod
+    def write_array(cls, wtr: BinaryWriter, records: Iterable["Record"]):
+        """
+        Writes consecutive records.
+
+        Parameters
+        ----------
+        wtr : BinaryWriter
+            The writer, positioned where the first record should be written.
+        records : Iterable[Record]
+            The records to write.
+        """
+        layout = cls._get_layout()
+        wtr.write(b"".join(layout.pack(record) for record in records))
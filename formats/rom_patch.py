@@ -0,0 +1,297 @@
+"""
+Patches with the differences between two ROMs, to distribute a modified ROM without its unchanged files.
+
+A patch is a zip file with a patch.json manifest listing the operations, and the data of the changed files. For PLZ
+archives present in both ROMs, only the changed files of the archive are in the patch. The operations changing data
+of the original ROM keep its SHA-1, so a patch isn't applied to another ROM (another region or revision of the game).
+
+Usage: ``python -m formats.rom_patch create original.nds modified.nds patch.zip``
+or ``python -m formats.rom_patch apply original.nds patch.zip patched.nds``
+"""
+import argparse
+import hashlib
+import json
+import logging
+import time
+import zipfile
+from typing import *
+
+from ndspy.fnt import Folder
+
+from formats.filesystem import NintendoDSRom
+
+PATCH_VERSION = 2
+"""Version of the format of the patches."""
+
+ROM_FIELDS = ["arm9", "arm9PostData", "arm7", "arm9OverlayTable", "arm7OverlayTable", "iconBanner"]
+"""Data of the ROM outside its files compared by the patches."""
+
+
+def _list_files(folder: Folder, prefix: str = "/") -> Iterator[Tuple[str, int]]:
+    for i, filename in enumerate(folder.files):
+        yield prefix + filename, folder.firstID + i
+    for folder_name, subfolder in folder.folders:
+        yield from _list_files(subfolder, prefix + folder_name + "/")
+
+
+def _list_folders(folder: Folder, prefix: str = "/") -> Iterator[str]:
+    for folder_name, subfolder in folder.folders:
+        yield prefix + folder_name
+        yield from _list_folders(subfolder, prefix + folder_name + "/")
+
+
+def _digest(data) -> Tuple[int, bytes]:
+    return len(data), hashlib.sha1(data).digest()
+
+
+def _sha1(data) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def diff_roms(original: NintendoDSRom, modified: NintendoDSRom) -> Iterator[Tuple[Dict[str, Any], Optional[bytes]]]:
+    """
+    Compares two ROMs file by file, and the files of the PLZ archives present in both.
+
+    Parameters
+    ----------
+    original : NintendoDSRom
+        The ROM the patch applies to.
+    modified : NintendoDSRom
+        The ROM obtained applying the patch.
+
+    Returns
+    -------
+    Iterator[Tuple[Dict[str, Any], Optional[bytes]]]
+        The operations turning the original ROM into the modified one, with the data they write.
+        For archive operations, the data is None and the data of each file operation is in its "data" key.
+        The operations changing data of the original ROM have the SHA-1 of the original data in their "sha1" key.
+    """
+    original_files = dict(_list_files(original.filenames))
+    modified_files = dict(_list_files(modified.filenames))
+    original_folders = list(_list_folders(original.filenames))
+    modified_folders = list(_list_folders(modified.filenames))
+
+    folders = set(original_folders)
+    for path in modified_folders:
+        if path not in folders:
+            yield {"op": "add_folder", "path": path}, None
+
+    # Removed files with the same data as an added file are moved
+    removed = [path for path in original_files if path not in modified_files]
+    added = [path for path in modified_files if path not in original_files]
+    removed_by_digest: Dict[Tuple[int, bytes], List[str]] = {}
+    for path in removed:
+        removed_by_digest.setdefault(_digest(original.files[original_files[path]]), []).append(path)
+    moved = {}
+    for path in added:
+        sources = removed_by_digest.get(_digest(modified.files[modified_files[path]]))
+        if sources:
+            moved[sources.pop()] = path
+    for path in removed:
+        sha1 = _sha1(original.files[original_files[path]])
+        if path in moved:
+            yield {"op": "move", "path": path, "new_path": moved[path], "sha1": sha1}, None
+        else:
+            yield {"op": "remove", "path": path, "sha1": sha1}, None
+    moved_paths = set(moved.values())
+    for path in added:
+        if path not in moved_paths:
+            yield {"op": "add", "path": path}, bytes(modified.files[modified_files[path]])
+
+    for path, file_id in original_files.items():
+        if path not in modified_files:
+            continue
+        original_data, modified_data = original.files[file_id], modified.files[modified_files[path]]
+        if original_data == modified_data:
+            continue
+        if path.lower().endswith(".plz"):
+            # Archives only compressed differently have no changed files
+            files = list(_diff_archives(original, modified, path))
+            if files:
+                yield {"op": "archive", "path": path, "files": files, "sha1": _sha1(original_data)}, None
+        else:
+            yield {"op": "replace", "path": path, "sha1": _sha1(original_data)}, bytes(modified_data)
+
+    # Files without names are identified by their id, which is only kept by the overlays, the ids of the other files
+    # change when files are added or removed before them
+    named_ids = set(modified_files.values())
+    original_overlay_ids = original.get_overlay_ids()
+    modified_overlay_ids = modified.get_overlay_ids()
+    for file_id in range(len(modified.files)):
+        if file_id in named_ids or (file_id < len(original.files)
+                                    and original.files[file_id] == modified.files[file_id]):
+            continue
+        if file_id not in original_overlay_ids or file_id not in modified_overlay_ids:
+            raise ValueError(f"file {file_id} has no name and isn't an overlay of both ROMs, it can't be patched")
+        yield {"op": "replace_id", "id": file_id, "sha1": _sha1(original.files[file_id])}, \
+            bytes(modified.files[file_id])
+
+    folders = set(modified_folders)
+    for path in reversed(original_folders):
+        if path not in folders:
+            yield {"op": "remove_folder", "path": path}, None
+
+    for field in ROM_FIELDS:
+        if getattr(original, field) != getattr(modified, field):
+            yield {"op": "field", "name": field, "sha1": _sha1(getattr(original, field))}, \
+                bytes(getattr(modified, field))
+
+
+def _diff_archives(original: NintendoDSRom, modified: NintendoDSRom, path: str) -> Iterator[Dict[str, Any]]:
+    original_archive, modified_archive = original.get_archive(path), modified.get_archive(path)
+    original_ids = {filename: i for i, filename in enumerate(original_archive.filenames)}
+    modified_ids = {filename: i for i, filename in enumerate(modified_archive.filenames)}
+    for filename in original_ids:
+        if filename not in modified_ids:
+            yield {"op": "remove", "name": filename}
+    for filename, file_id in modified_ids.items():
+        data = modified_archive.files[file_id]
+        if filename not in original_ids or original_archive.files[original_ids[filename]] != data:
+            yield {"op": "write", "name": filename, "data": bytes(data)}
+
+
+def create_patch(original: NintendoDSRom, modified: NintendoDSRom, file: Union[str, BinaryIO]) -> int:
+    """
+    Writes the patch turning the original ROM into the modified one.
+
+    Parameters
+    ----------
+    original : NintendoDSRom
+        The ROM the patch applies to.
+    modified : NintendoDSRom
+        The ROM obtained applying the patch.
+    file : str | BinaryIO
+        The path or the stream of the patch.
+
+    Returns
+    -------
+    int
+        The number of operations of the patch.
+    """
+    start = time.perf_counter()
+    operations = []
+    with zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED) as zf:
+        def write_data(data: bytes) -> str:
+            name = f"data/{len(zf.infolist())}"
+            zf.writestr(name, data)
+            return name
+
+        for operation, data in diff_roms(original, modified):
+            if data is not None:
+                operation["data"] = write_data(data)
+            for file_operation in operation.get("files", []):
+                if "data" in file_operation:
+                    file_operation["data"] = write_data(file_operation["data"])
+            operations.append(operation)
+        zf.writestr("patch.json", json.dumps({"version": PATCH_VERSION, "operations": operations}, indent=1))
+    logging.info(f"Patch of {len(operations)} operations created in {time.perf_counter() - start:.3f}s")
+    return len(operations)
+
+
+def _check_original(rom: NintendoDSRom, operations: List[Dict[str, Any]]):
+    # Raises a ValueError if the data changed by an operation isn't the data of the original ROM of the patch
+    for operation in operations:
+        if operation["op"] == "move" and operation["new_path"] in rom:
+            raise ValueError(f"the patch doesn't apply to this ROM, {operation['new_path']} already exists")
+        if operation["op"] in ["remove", "move", "replace", "archive"]:
+            name = operation["path"]
+            file_id = rom.get_file_id(name)
+            data = None if file_id is None else rom.files[file_id]
+        elif operation["op"] == "replace_id":
+            name = f"file {operation['id']}"
+            data = None
+            if operation["id"] in rom.get_overlay_ids() and operation["id"] < len(rom.files):
+                data = rom.files[operation["id"]]
+        elif operation["op"] == "field":
+            name = operation["name"]
+            data = getattr(rom, name)
+        elif operation["op"] == "add":
+            if operation["path"] in rom:
+                raise ValueError(f"the patch doesn't apply to this ROM, {operation['path']} already exists")
+            continue
+        else:
+            continue
+        if data is None or _sha1(data) != operation["sha1"]:
+            raise ValueError(f"the patch doesn't apply to this ROM, {name} differs from the original ROM")
+
+
+def apply_patch(rom: NintendoDSRom, file: Union[str, BinaryIO]):
+    """
+    Applies a patch to the ROM.
+
+    Only the changed files are read from the patch, when they are written, and only the changed archives are opened.
+    The data the patch changes is checked before changing the ROM, a ValueError is raised if the patch wasn't created
+    from this ROM.
+
+    Parameters
+    ----------
+    rom : NintendoDSRom
+        The original ROM, which is modified.
+    file : str | BinaryIO
+        The path or the stream of the patch.
+    """
+    with zipfile.ZipFile(file) as zf:
+        manifest = json.loads(zf.read("patch.json"))
+        if manifest["version"] != PATCH_VERSION:
+            raise ValueError(f"unsupported patch version {manifest['version']}")
+        operations: List[Dict[str, Any]] = manifest["operations"]
+        _check_original(rom, operations)
+        by_type: Dict[str, List[Dict[str, Any]]] = {}
+        for operation in operations:
+            by_type.setdefault(operation["op"], []).append(operation)
+
+        for operation in by_type.get("add_folder", []):
+            rom.add_folder(operation["path"])
+        with rom.batch():
+            for operation in by_type.get("remove", []):
+                rom.remove_file(operation["path"])
+            for operation in by_type.get("move", []):
+                rom.move_file(operation["path"], operation["new_path"])
+            for operation in by_type.get("add", []):
+                with rom.open(operation["path"], "wb+") as f:
+                    f.write(zf.read(operation["data"]))
+        for operation in by_type.get("replace", []):
+            with rom.open(operation["path"], "wb") as f:
+                f.write(zf.read(operation["data"]))
+        for operation in by_type.get("archive", []):
+            archive = rom.get_archive(operation["path"])
+            for file_operation in operation["files"]:
+                if file_operation["op"] == "remove":
+                    archive.remove_file(file_operation["name"])
+                else:
+                    with archive.open(file_operation["name"], "wb+") as f:
+                        f.write(zf.read(file_operation["data"]))
+        for operation in by_type.get("replace_id", []):
+            rom.files[operation["id"]] = zf.read(operation["data"])
+            rom.set_modified(operation["id"])
+        for operation in by_type.get("remove_folder", []):
+            rom.remove_folder(operation["path"])
+        for operation in by_type.get("field", []):
+            setattr(rom, operation["name"], zf.read(operation["data"]))
+    logging.info(f"Patch of {len(operations)} operations applied")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    create = subparsers.add_parser("create", help="Create the patch turning the original ROM into the modified one")
+    create.add_argument("original", help="Path of the original .nds file")
+    create.add_argument("modified", help="Path of the modified .nds file")
+    create.add_argument("patch", help="Path of the patch to write")
+    apply = subparsers.add_parser("apply", help="Apply a patch to the original ROM")
+    apply.add_argument("original", help="Path of the original .nds file")
+    apply.add_argument("patch", help="Path of the patch")
+    apply.add_argument("output", help="Path of the patched .nds file to write")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    original = NintendoDSRom.fromFile(args.original, lazy=True)
+    if args.command == "create":
+        create_patch(original, NintendoDSRom.fromFile(args.modified, lazy=True), args.patch)
+    else:
+        apply_patch(original, args.patch)
+        original.saveToFile(args.output)
+
+
+if __name__ == '__main__':
+    main()
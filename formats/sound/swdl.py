@@ -1,5 +1,6 @@
 # Thanks to https://projectpokemon.org/docs/mystery-dungeon-nds/dse-swdl-format-r14/
 import logging
+from dataclasses import dataclass
 from typing import List, Dict, Optional
 
 import numpy as np
@@ -7,6 +8,7 @@ import numpy as np
 from formats import conf
 from formats.binary import BinaryReader
 from formats.filesystem import FileFormat, NintendoDSRom
+from formats.record import Record, int8, uint8, uint16, uint32, boolean, padding
 from formats.sound.sound_types import Sample, KeyGroup, Split, LFO, Program
 
 
@@ -104,28 +106,16 @@ class PcmdChunk:
         self.sample_data = np.frombuffer(rdr.read(self.chunk_len), dtype=np.uint8)
 
 
-class SWDKeyGroup:
-    id_: int
-    polyphony: int
-    priority: int
-    voice_channel_low: int
-    voice_channel_hi: int
-    unk50: int
-    unk51: int
-
-    def read(self, rdr: BinaryReader):
-        # key groups used for padding are all 0xAA
-        self.id_ = rdr.read_uint16()
-        self.polyphony = rdr.read_uint8()
-        self.priority = rdr.read_uint8()
-        self.voice_channel_low = rdr.read_uint8()
-        self.voice_channel_hi = rdr.read_uint8()
-        self.unk50 = rdr.read_uint8()  # 0xAA if key_group_id == 0xAAAA else 0
-        self.unk51 = rdr.read_uint8()  # 0xAA if key_group_id == 0xAAAA else 0
-        if conf.DEBUG_AUDIO:
-            logging.debug(f"    KeyGroup: {self.id_}")
-            logging.debug(f"        UNK50: {self.unk50}")
-            logging.debug(f"        UNK51: {self.unk51}")
+@dataclass
+class SWDKeyGroup(Record):
+    # key groups used for padding are all 0xAA
+    id_: int = uint16()
+    polyphony: int = uint8()
+    priority: int = uint8()
+    voice_channel_low: int = uint8()
+    voice_channel_hi: int = uint8()
+    unk50: int = uint8()  # 0xAA if key_group_id == 0xAAAA else 0
+    unk51: int = uint8()  # 0xAA if key_group_id == 0xAAAA else 0
 
     def to_key_group(self) -> KeyGroup:
         key_group = KeyGroup()
@@ -156,23 +146,25 @@ class KgrpChunk:
             raise ValueError("SWDKgprChunk does not have correct version")
         self.chunk_beg = rdr.read_uint32()
         self.chunk_len = rdr.read_uint32()
-        pos = rdr.c
-        self.key_groups = []
-        while rdr.c < pos + self.chunk_len:
-            key_group = SWDKeyGroup()
-            key_group.read(rdr)
-            self.key_groups.append(key_group)
+        self.key_groups = SWDKeyGroup.read_array(rdr, self.chunk_len // SWDKeyGroup.size())
+        if conf.DEBUG_AUDIO:
+            for key_group in self.key_groups:
+                logging.debug(f"    KeyGroup: {key_group.id_}")
+                logging.debug(f"        UNK50: {key_group.unk50}")
+                logging.debug(f"        UNK51: {key_group.unk51}")
 
 
-class SWDLFOEntry:
-    unk1: int
+@dataclass
+class SWDLFOEntry(Record):
+    _unk0: int = uint8(const=0)
+    unk1: int = uint8()  # bool? GE_003.SWD/SI_012.SWD is 1 (mostly 0)
     # Destination of the lfo output
     # 0 - none/disabled
     # 1 - pitch
     # 2 - volume
     # 3 - pan
     # 4 - low pass / cut off filter
-    destination: int
+    destination: int = uint8()
     # Shape of the waveform
     # 1 - square
     # 2 - triangle?
@@ -181,26 +173,13 @@ class SWDLFOEntry:
     # 5 - Saw?
     # 6 - Noise?
     # 7 - Random
-    wshape: int
-    rate: int  # maybe hz
-    unk29: int  # feedback or resonance? (or maybe just don't touch it)
-    depth: int
-    delay: int  # milliseconds
-
-    def read(self, rdr: BinaryReader):
-        assert rdr.read_uint8() == 0
-        self.unk1 = rdr.read_uint8()  # bool? GE_003.SWD/SI_012.SWD is 1 (mostly 0)
-        self.destination = rdr.read_uint8()
-        self.wshape = rdr.read_uint8()
-        self.rate = rdr.read_uint16()
-        self.unk29 = rdr.read_uint16()
-        if conf.DEBUG_AUDIO:
-            logging.debug("        LFOEntry")
-            logging.debug(f"            UNK29: {self.unk29}")
-        self.depth = rdr.read_uint16()
-        self.delay = rdr.read_uint16()
-        assert rdr.read_uint16() == 0
-        assert rdr.read_uint16() == 0
+    wshape: int = uint8()
+    rate: int = uint16()  # maybe hz
+    unk29: int = uint16()  # feedback or resonance? (or maybe just don't touch it)
+    depth: int = uint16()
+    delay: int = uint16()  # milliseconds
+    _unk1: int = uint16(const=0)
+    _unk2: int = uint16(const=0)
 
     def to_lfo(self) -> LFO:
         lfo = LFO()
@@ -212,82 +191,45 @@ class SWDLFOEntry:
         return lfo
 
 
-class SWDSplitEntry:
-    splits_table_id: int
-    unk25: int  # possibly bool
-    low_key: int = 0
-    hi_key: int = 0x7F
-    low_vel: int
-    hi_vel: int
-    unk16: int = 0  # pad_byte?
-    unk17: int = 0  # pad_byte?
-    sample_id: int  # sample_info in the wavi chunk
-    fine_tune: int  # in cents
-    coarse_tune: int = -7
-    root_key: int
-    sample_volume: int
-    sample_pan: int
-    key_group_id: int
-    unk22: int = 0x02
-    unk24: int = 0  # pad_byte?
-    envelope_on: int  # if is 0, envelope isn't processed
-    envelope_multiplier: int
-    attack_volume: int
-    attack: int
-    decay: int
-    sustain: int
-    hold: int
-    decay2: int
-    release: int
-
-    def read(self, rdr: BinaryReader):
-        assert rdr.read_uint8() == 0
-        self.splits_table_id = rdr.read_uint8()
-        assert rdr.read_uint8() == 2
-        self.unk25 = rdr.read_uint8()  # 1 or 0 (bool)
-        self.low_key = rdr.read_int8()
-        self.hi_key = rdr.read_int8()
-        _low_key2 = rdr.read_int8()  # copy
-        _hi_key2 = rdr.read_int8()  # copy
-        self.low_vel = rdr.read_int8()
-        self.hi_vel = rdr.read_int8()
-        _low_vel2 = rdr.read_int8()  # copy
-        _hi_vel2 = rdr.read_int8()  # copy
-        self.unk16 = rdr.read_uint32()  # 0xAAAAAAAA or 0
-        self.unk17 = rdr.read_uint16()  # 0xAAAA or 0
-        self.sample_id = rdr.read_uint16()
-        self.fine_tune = rdr.read_int8()
-        self.coarse_tune = rdr.read_int8()
-        self.root_key = rdr.read_int8()
-        _key_transpose = rdr.read_int8()  # difference between root key and 60
-        self.sample_volume = rdr.read_int8()
-        self.sample_pan = rdr.read_int8()
-        self.key_group_id = rdr.read_uint8()
-        self.unk22 = rdr.read_uint8()  # 0 or 2
-        assert rdr.read_uint16() == 0
-        self.unk24 = rdr.read_uint16()  # pad byte? 0xAAAA or 0xFFFF
-        self.envelope_on = rdr.read_uint8()
-        self.envelope_multiplier = rdr.read_uint8()
-        assert rdr.read_uint8() == 1
-        assert rdr.read_uint8() == 3
-        assert rdr.read_uint16() == 0xFF03
-        assert rdr.read_uint16() == 0xFFFF
-        self.attack_volume = rdr.read_int8()
-        self.attack = rdr.read_int8()
-        self.decay = rdr.read_int8()
-        self.sustain = rdr.read_int8()
-        self.hold = rdr.read_int8()
-        self.decay2 = rdr.read_int8()
-        self.release = rdr.read_int8()
-        assert rdr.read_uint8() == 0xFF
-        if conf.DEBUG_AUDIO:
-            logging.debug(f"        Split Entry {self.splits_table_id}")
-            logging.debug(f"            UNK25: {self.unk25}")
-            logging.debug(f"            UNK16: {self.unk16}")
-            logging.debug(f"            UNK17: {self.unk17}")
-            logging.debug(f"            KEY_GROUP_ID: {self.key_group_id}")
-            logging.debug(f"            UNK22: {self.unk22}")
-            logging.debug(f"            UNK22: {self.unk24}")
+@dataclass
+class SWDSplitEntry(Record):
+    _unk0: int = uint8(const=0)
+    splits_table_id: int = uint8()
+    _unk1: int = uint8(const=2)
+    unk25: int = uint8()  # possibly bool, 1 or 0
+    low_key: int = int8(0)
+    hi_key: int = int8(0x7F)
+    _key_copy: None = padding(2)  # copy of low_key and hi_key
+    low_vel: int = int8()
+    hi_vel: int = int8()
+    _vel_copy: None = padding(2)  # copy of low_vel and hi_vel
+    unk16: int = uint32(0)  # pad_byte? 0xAAAAAAAA or 0
+    unk17: int = uint16(0)  # pad_byte? 0xAAAA or 0
+    sample_id: int = uint16()  # sample_info in the wavi chunk
+    fine_tune: int = int8()  # in cents
+    coarse_tune: int = int8(-7)
+    root_key: int = int8()
+    _key_transpose: None = padding(1)  # difference between root key and 60
+    sample_volume: int = int8()
+    sample_pan: int = int8()
+    key_group_id: int = uint8()
+    unk22: int = uint8(0x02)  # 0 or 2
+    _unk2: int = uint16(const=0)
+    unk24: int = uint16(0)  # pad byte? 0xAAAA or 0xFFFF
+    envelope_on: int = uint8()  # if is 0, envelope isn't processed
+    envelope_multiplier: int = uint8()
+    _unk3: int = uint8(const=1)
+    _unk4: int = uint8(const=3)
+    _unk5: int = uint16(const=0xFF03)
+    _unk6: int = uint16(const=0xFFFF)
+    attack_volume: int = int8()
+    attack: int = int8()
+    decay: int = int8()
+    sustain: int = int8()
+    hold: int = int8()
+    decay2: int = int8()
+    release: int = int8()
+    _unk7: int = uint8(const=0xFF)
 
     def to_split(self, samples: Dict[int, Sample],
                  key_groups: Dict[int, KeyGroup]) -> Split:
@@ -384,20 +326,23 @@ class ProgramInfoEntry:
         assert rdr.read_uint8() == 0
         assert rdr.read_uint8() == 0
         assert rdr.read_uint8() == 0
-        self.lfo_table = []
-        for _ in range(self.lfo_count):
-            lfo_entry = SWDLFOEntry()
-            lfo_entry.read(rdr)
-            self.lfo_table.append(lfo_entry)
+        self.lfo_table = SWDLFOEntry.read_array(rdr, self.lfo_count)
         rdr.read(16)  # Uses pad byte padding value
-        self.splits_table = []
-        for _ in range(self.splits_count):
-            split_entry = SWDSplitEntry()
-            split_entry.read(rdr)
-            self.splits_table.append(split_entry)
+        self.splits_table = SWDSplitEntry.read_array(rdr, self.splits_count)
         if conf.DEBUG_AUDIO:
             logging.debug(f"    Program {self.id_}")
             logging.debug(f"        Pad Byte {self.pad_byte}")
+            for lfo_entry in self.lfo_table:
+                logging.debug("        LFOEntry")
+                logging.debug(f"            UNK29: {lfo_entry.unk29}")
+            for split_entry in self.splits_table:
+                logging.debug(f"        Split Entry {split_entry.splits_table_id}")
+                logging.debug(f"            UNK25: {split_entry.unk25}")
+                logging.debug(f"            UNK16: {split_entry.unk16}")
+                logging.debug(f"            UNK17: {split_entry.unk17}")
+                logging.debug(f"            KEY_GROUP_ID: {split_entry.key_group_id}")
+                logging.debug(f"            UNK22: {split_entry.unk22}")
+                logging.debug(f"            UNK22: {split_entry.unk24}")
 
     def to_program(self, samples: Dict[int, Sample],
                    key_groups: Dict[int, KeyGroup]) -> Program:
@@ -442,76 +387,50 @@ class PrgiChunk:
             self.program_info_table.append(sample_info_entry)
 
 
-class SampleInfoEntry:
-    id_: int
-    fine_tune: int
-    coarse_tune: int
-    root_key: int
-    key_transpose: int
-    volume: int
-    pan: int
-    version: int = 0x415
-    sample_format: int
+@dataclass
+class SampleInfoEntry(Record):
+    _unk0: int = uint16(const=0xAA01)
+    id_: int = uint16()
+    fine_tune: int = int8()
+    coarse_tune: int = int8()
+    root_key: int = int8()
+    key_transpose: int = int8()  # difference between root key and 60
+    volume: int = int8()
+    pan: int = int8()
+    _unk1: int = uint8(const=0)
+    _unk2: int = uint8(const=0x02)
+    _unk3: int = uint16(const=0)
+    _unk4: int = uint16(const=0xAAAA)
+    version: int = uint16(const=0x415)
+    sample_format: int = uint16()
     # 0 - 8 bits pcm?
     # 0x100 - 16 bits pcm
     # 0x200 - 4 bits adpcm
     # 0x300 - psg?
-    loop_enabled: bool
-    sample_rate: int
-    sample_pos: int
-    loop_beginning: int
-    loop_length: int
-    envelope: int
-    envelope_multiplier: int
-    attack_volume: int
-    attack: int
-    decay: int
-    sustain: int
-    hold: int
-    decay2: int
-    release: int
-
-    def read(self, rdr: BinaryReader):
-        assert rdr.read_uint16() == 0xAA01
-        self.id_ = rdr.read_uint16()
-        self.fine_tune = rdr.read_int8()
-        self.coarse_tune = rdr.read_int8()
-        self.root_key = rdr.read_int8()
-        self.key_transpose = rdr.read_int8()  # difference between root key and 60
-        self.volume = rdr.read_int8()
-        self.pan = rdr.read_int8()
-        assert rdr.read_uint8() == 0
-        assert rdr.read_uint8() == 0x02
-        assert rdr.read_uint16() == 0
-        assert rdr.read_uint16() == 0xAAAA
-        self.version = rdr.read_uint16()
-        if self.version != 0x415:
-            raise ValueError("SampleInfoEntry does not have correct version")
-        self.sample_format = rdr.read_uint16()
-        assert rdr.read_uint8() == 0x09
-        self.loop_enabled = rdr.read_bool()
-        assert rdr.read_uint16() == 0x801
-        assert rdr.read_uint16() == 0x400
-        assert rdr.read_uint16() == 0x101
-        assert rdr.read_uint32() == 1
-        self.sample_rate = rdr.read_uint32()
-        self.sample_pos = rdr.read_uint32()
-        self.loop_beginning = rdr.read_uint32()
-        self.loop_length = rdr.read_uint32()
-        self.envelope = rdr.read_uint8()
-        self.envelope_multiplier = rdr.read_uint8()
-        assert rdr.read_uint8() == 0x1
-        assert rdr.read_uint8() == 0x3
-        assert rdr.read_uint16() == 0xFF03
-        assert rdr.read_uint16() == 0xFFFF
-        self.attack_volume = rdr.read_int8()
-        self.attack = rdr.read_int8()
-        self.decay = rdr.read_int8()
-        self.sustain = rdr.read_int8()
-        self.hold = rdr.read_int8()
-        self.decay2 = rdr.read_int8()
-        self.release = rdr.read_int8()
-        assert rdr.read_uint8() == 0xFF
+    _unk5: int = uint8(const=0x09)
+    loop_enabled: bool = boolean()
+    _unk6: int = uint16(const=0x801)
+    _unk7: int = uint16(const=0x400)
+    _unk8: int = uint16(const=0x101)
+    _unk9: int = uint32(const=1)
+    sample_rate: int = uint32()
+    sample_pos: int = uint32()
+    loop_beginning: int = uint32()
+    loop_length: int = uint32()
+    envelope: int = uint8()
+    envelope_multiplier: int = uint8()
+    _unk10: int = uint8(const=0x1)
+    _unk11: int = uint8(const=0x3)
+    _unk12: int = uint16(const=0xFF03)
+    _unk13: int = uint16(const=0xFFFF)
+    attack_volume: int = int8()
+    attack: int = int8()
+    decay: int = int8()
+    sustain: int = int8()
+    hold: int = int8()
+    decay2: int = int8()
+    release: int = int8()
+    _unk14: int = uint8(const=0xFF)
 
     def to_sample(self, pcmd_chunk: PcmdChunk) -> Sample:
         sample = Sample()
@@ -588,11 +507,8 @@ class WaviChunk:
         for _ in range(wavi_slot_count):
             self.wav_table.append(rdr.read_uint16())
         rdr.align(16)
-        self.sample_info_table = []
-        while rdr.c != pos + self.chunk_len:
-            sample_info_entry = SampleInfoEntry()
-            sample_info_entry.read(rdr)
-            self.sample_info_table.append(sample_info_entry)
+        self.sample_info_table = SampleInfoEntry.read_array(
+            rdr, (pos + self.chunk_len - rdr.c) // SampleInfoEntry.size())
 
 
 class SWDHeader:
@@ -686,10 +602,7 @@ class SWDL(FileFormat):
         self.pcmd_chunk: Optional[PcmdChunk] = None
         self.kgrp_chunk: Optional[KgrpChunk] = None
         self.eod_chunk = EodChunk()
-        if isinstance(stream, BinaryReader):
-            rdr = stream
-        else:
-            rdr = BinaryReader(stream)
+        rdr = BinaryReader.from_stream(stream)
         while True:
             rdr.align(0x10)
             pos = rdr.c
@@ -51,16 +51,11 @@ class IsngChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"isng")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place-holder chunk size
+        chunk_size = wtr.reserve_uint32()
         wtr.write_string(self.sound_engine[:255], encoding="ascii")
-        wtr.align(2)
+        wtr.write_padding(2)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class INAMChunk:
@@ -77,16 +72,11 @@ class INAMChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"INAM")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place-holder chunk size
+        chunk_size = wtr.reserve_uint32()
         wtr.write_string(self.name[:255], encoding="ascii")
-        wtr.align(2)
+        wtr.write_padding(2)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class IromChunk:
@@ -103,16 +93,11 @@ class IromChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"irom")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place-holder chunk size
+        chunk_size = wtr.reserve_uint32()
         wtr.write_string(self.rom[:255], encoding="ascii")
-        wtr.align(2)
+        wtr.write_padding(2)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class IverChunk:
@@ -148,16 +133,11 @@ class ICRDChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"ICRD")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place-holder chunk size
+        chunk_size = wtr.reserve_uint32()
         wtr.write_string(self.date[:255], encoding="ascii")
-        wtr.align(2)
+        wtr.write_padding(2)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class IENGChunk:
@@ -174,16 +154,11 @@ class IENGChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"IENG")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place-holder chunk size
+        chunk_size = wtr.reserve_uint32()
         wtr.write_string(self.authors[:255], encoding="ascii")
-        wtr.align(2)
+        wtr.write_padding(2)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class IPRDChunk:
@@ -200,16 +175,11 @@ class IPRDChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"IPRD")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place-holder chunk size
+        chunk_size = wtr.reserve_uint32()
         wtr.write_string(self.product[:255], encoding="ascii")
-        wtr.align(2)
+        wtr.write_padding(2)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class ICOPChunk:
@@ -226,16 +196,11 @@ class ICOPChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"ICOP")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place-holder chunk size
+        chunk_size = wtr.reserve_uint32()
         wtr.write_string(self.copyright[:255], encoding="ascii")
-        wtr.align(2)
+        wtr.write_padding(2)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class ICMTChunk:
@@ -252,16 +217,11 @@ class ICMTChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"ICMT")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place-holder chunk size
+        chunk_size = wtr.reserve_uint32()
         wtr.write_string(self.comment[:255], encoding="ascii")
-        wtr.align(2)
+        wtr.write_padding(2)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class ISFTChunk:
@@ -278,16 +238,11 @@ class ISFTChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"ISFT")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place-holder chunk size
+        chunk_size = wtr.reserve_uint32()
         wtr.write_string(self.sound_font_tool[:255], encoding="ascii")
-        wtr.align(2)
+        wtr.write_padding(2)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class InfoChunk:
@@ -369,8 +324,7 @@ class InfoChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"LIST")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place holder chunk size
+        chunk_size = wtr.reserve_uint32()
         wtr.write(b"INFO")
         if self.ifil_chunk is not None:
             self.ifil_chunk.write(wtr)
@@ -395,11 +349,7 @@ class InfoChunk:
         if self.isft_chunk is not None:
             self.isft_chunk.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class SmplChunk:
@@ -469,8 +419,7 @@ class SdtaChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"LIST")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place holder chunk size
+        chunk_size = wtr.reserve_uint32()
         wtr.write(b"sdta")
 
         if self.smpl_chunk is not None:
@@ -478,11 +427,7 @@ class SdtaChunk:
         if self.sm24_chunk is not None:
             self.sm24_chunk.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class SFGeneratorEnumerator(IntEnum):
@@ -760,16 +705,11 @@ class PhdrChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"phdr")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place holder chunk size
+        chunk_size = wtr.reserve_uint32()
         for preset_header in self.preset_headers:
             preset_header.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class SFBag:
@@ -805,16 +745,11 @@ class PbagChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"pbag")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place holder chunk size
+        chunk_size = wtr.reserve_uint32()
         for preset_bag in self.preset_bags:
             preset_bag.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class SFModEntry:
@@ -859,16 +794,11 @@ class PmodChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"pmod")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place holder chunk size
+        chunk_size = wtr.reserve_uint32()
         for mod in self.mod_list:
             mod.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class SFGenEntry:
@@ -926,16 +856,11 @@ class PgenChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"pgen")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place holder chunk size
+        chunk_size = wtr.reserve_uint32()
         for gen in self.gen_list:
             gen.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class SFInst:
@@ -971,16 +896,11 @@ class InstChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"inst")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place holder chunk size
+        chunk_size = wtr.reserve_uint32()
         for instrument in self.instruments:
             instrument.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class IbagChunk:
@@ -1002,16 +922,11 @@ class IbagChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"ibag")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place holder chunk size
+        chunk_size = wtr.reserve_uint32()
         for inst_bag in self.instrument_bags:
             inst_bag.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class ImodChunk:
@@ -1033,16 +948,11 @@ class ImodChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"imod")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place holder chunk size
+        chunk_size = wtr.reserve_uint32()
         for mod in self.mod_list:
             mod.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class IgenChunk:
@@ -1064,16 +974,11 @@ class IgenChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"igen")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place holder chunk size
+        chunk_size = wtr.reserve_uint32()
         for gen in self.gen_list:
             gen.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
 
 class SFSample:
@@ -1167,16 +1072,11 @@ class ShdrChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"shdr")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place holder chunk size
+        chunk_size = wtr.reserve_uint32()
         for sample in self.samples:
             sample.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
     def from_samples(self, samples: List[Sample], sdta_chunk: SdtaChunk):
         self.samples = [SFSample()]
@@ -1217,8 +1117,7 @@ class PdtaChunk:
 
     def write(self, wtr: BinaryWriter):
         wtr.write(b"LIST")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)  # place holder chunk size
+        chunk_size = wtr.reserve_uint32()
         wtr.write(b"pdta")
         self.phdr_chunk.write(wtr)
         self.pbag_chunk.write(wtr)
@@ -1230,11 +1129,7 @@ class PdtaChunk:
         self.igen_chunk.write(wtr)
         self.shdr_chunk.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
     def from_samples_and_programs(self, samples: List[Sample], programs: List[Program],
                                   sdta_chunk: SdtaChunk):
@@ -1312,18 +1207,13 @@ class SoundFont:
         sdta_chunk, pdta_chunk = self.construct()
 
         wtr.write(b"RIFF")
-        chunk_size_pos = wtr.tell()
-        wtr.write_uint32(0)
+        chunk_size = wtr.reserve_uint32()
         wtr.write(b"sfbk")
         self.info_chunk.write(wtr)
         sdta_chunk.write(wtr)
         pdta_chunk.write(wtr)
 
-        # write chunk_size
-        end_pos = wtr.tell()
-        wtr.seek(chunk_size_pos)
-        wtr.write_uint32(end_pos - (chunk_size_pos + 4))
-        wtr.seek(end_pos)
+        chunk_size.set(wtr.tell() - (chunk_size.position + 4))
 
     def set_sample_data(self, sample_data: Dict[int, Sample]):
         for sample_id, sample in sample_data.items():
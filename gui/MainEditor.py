@@ -12,6 +12,8 @@ from pg_utils.sound.SMDLStreamPlayer import SMDLStreamPlayer
 from pg_utils.rom.RomSingleton import RomSingleton
 from .PygamePreviewer import PygamePreviewer
 
+from formats import conf
+from formats.compression.selection import SmallestCompressionPolicy
 from formats.filesystem import NintendoDSRom
 
 import logging
@@ -29,6 +31,8 @@ class MainEditor(MainEditorUI):
         super(MainEditor, self).__init__(*args, **kwargs)
 
         self.advanced_mode_action.setChecked(SettingsManager().advanced_mode)
+        self.max_compression_action.setChecked(SettingsManager().max_compression)
+        self.smallest_compression_action.setChecked(SettingsManager().smallest_compression)
 
         self.rom: Union[NintendoDSRom, None] = None
         self.last_path = None
@@ -117,14 +121,21 @@ class MainEditor(MainEditorUI):
         if not self.overwrite_data_dialogue():
             return
         if self.last_path:
-            self.rom.saveToFile(self.last_path)
+            self.save_rom(self.last_path)
 
     def file_menu_save_as(self):
         file_path = SettingsManager().save_rom(self)
         if file_path == "":
             return
         self.last_path = file_path
+        self.save_rom(file_path)
+
+    def save_rom(self, file_path: str):
+        self.rom.max_compression = SettingsManager().max_compression
         self.rom.saveToFile(file_path)
+        if conf.COMPRESSION_POLICY is not None:
+            logging.info(conf.COMPRESSION_POLICY.summary())
+            conf.COMPRESSION_POLICY.report.clear()
 
     def file_tree_context_menu(self, point: QtCore.QPoint):
         index = self.file_tree.indexAt(point)
@@ -251,3 +262,12 @@ class MainEditor(MainEditorUI):
 
     def advanced_mode_toggled(self, checked: bool):
         SettingsManager().toggle_advanced_mode(checked)
+
+    def max_compression_toggled(self, checked: bool):
+        SettingsManager().toggle_max_compression(checked)
+
+    def smallest_compression_toggled(self, checked: bool):
+        SettingsManager().toggle_smallest_compression(checked)
+        if conf.COMPRESSION_POLICY is not None:
+            conf.COMPRESSION_POLICY.shutdown()
+        conf.COMPRESSION_POLICY = SmallestCompressionPolicy(time_budget=5) if checked else None
@@ -21,6 +21,9 @@ class SettingsManager(object):
             self.import_path = str(self.qt_setting.value("importPath", ""))
             self.theme = str(self.qt_setting.value("theme", "dark"))
             self.advanced_mode = True if str(self.qt_setting.value("advancedMode", "False")) == "True" else False
+            self.max_compression = True if str(self.qt_setting.value("maxCompression", "False")) == "True" else False
+            self.smallest_compression = \
+                True if str(self.qt_setting.value("smallestCompression", "False")) == "True" else False
             self.cid_to_name_json = str(self.qt_setting.value("cidToName", ""))
             if self.cid_to_name_json == "":
                 self.character_id_to_name = self.original_character_names()
@@ -87,3 +90,11 @@ class SettingsManager(object):
         # Instead, require restart
         # self.advanced_mode = not self.advanced_mode
         self.qt_setting.setValue("advancedMode", str(advanced_mode))
+
+    def toggle_max_compression(self, max_compression):
+        self.max_compression = max_compression
+        self.qt_setting.setValue("maxCompression", str(max_compression))
+
+    def toggle_smallest_compression(self, smallest_compression):
+        self.smallest_compression = smallest_compression
+        self.qt_setting.setValue("smallestCompression", str(smallest_compression))
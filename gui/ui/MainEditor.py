@@ -50,6 +50,14 @@ class MainEditorUI(QtWidgets.QMainWindow):
         self.advanced_mode_action.setCheckable(True)
         self.advanced_mode_action.toggled.connect(self.advanced_mode_toggled)
 
+        self.max_compression_action = self.settings_menu.addAction("Maximum Compression (Slower Saving)")
+        self.max_compression_action.setCheckable(True)
+        self.max_compression_action.toggled.connect(self.max_compression_toggled)
+
+        self.smallest_compression_action = self.settings_menu.addAction("Try All Compressions (Slower Saving)")
+        self.smallest_compression_action.setCheckable(True)
+        self.smallest_compression_action.toggled.connect(self.smallest_compression_toggled)
+
         self.window = QtWidgets.QWidget()
 
         self.horizontal_layout = QtWidgets.QHBoxLayout()
@@ -96,5 +104,11 @@ class MainEditorUI(QtWidgets.QMainWindow):
     def advanced_mode_toggled(self, checked: bool):
         pass
 
+    def max_compression_toggled(self, checked: bool):
+        pass
+
+    def smallest_compression_toggled(self, checked: bool):
+        pass
+
     def tree_changed_selection(self, current: QtCore.QModelIndex, previous: QtCore.QModelIndex):
         pass
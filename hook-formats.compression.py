@@ -0,0 +1,3 @@
+hiddenimports = [
+    "formats.compression.lz10"
+]
@@ -30,7 +30,7 @@ class SpriteLoaderROM(k4pg.SpriteLoaderOS):
             path = set_extension(path, ".arj")
         else:
             path = set_extension(path, ".arc")
-        if path not in self.rom.filenames:
+        if path not in self.rom:
             logging.warning(f"Path {path} not found for loading sprite")
             super().load(path + ".png", sprite, sprite_sheet=sprite_sheet, convert_alpha=convert_alpha,
                          do_copy=do_copy)
@@ -95,7 +95,7 @@ class FontLoaderROM(k4pg.FontLoaderOS):
             rom_path = os.path.join(self.base_path_rom, path).replace("\\", "/")
         rom_path = rom_path.replace("?", self.rom.lang)
         rom_path = set_extension(rom_path, ".NFTR")
-        if rom_path not in self.rom.filenames:
+        if rom_path not in self.rom:
             super().load(path, size, text)
             return
 
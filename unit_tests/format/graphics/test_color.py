@@ -0,0 +1,18 @@
+import unittest
+
+import ndspy.color
+import numpy as np
+
+from formats.graphics.color import unpack255_array, pack255_array
+
+
+class TestColor(unittest.TestCase):
+    def test_unpack255_array(self):
+        colors = np.arange(0x10000, dtype=np.uint16)
+        expected = np.array([ndspy.color.unpack255(int(color)) for color in colors], np.uint8)
+        assert (unpack255_array(colors) == expected).all()
+
+    def test_pack255_array(self):
+        palette = np.random.default_rng(0).integers(0, 256, (1000, 4)).astype(np.uint8)
+        expected = [ndspy.color.pack255(*color.astype(np.uint16)) for color in palette]
+        assert pack255_array(palette).tolist() == expected
@@ -0,0 +1,116 @@
+import io
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+import formats.binary as binary
+
+
+class TestBinaryReader(unittest.TestCase):
+    DATA = struct.pack("<HIbfq", 0x1234, 0xdeadbeef, -5, 1.5, -(1 << 40)) + b"layton\0tail"
+
+    def check_reads(self, rdr: binary.BinaryReader):
+        assert rdr.read_uint16() == 0x1234
+        assert rdr.read_uint32() == 0xdeadbeef
+        assert rdr.read_int8() == -5
+        assert rdr.read_float() == 1.5
+        assert rdr.read_struct("q") == (-(1 << 40),)
+        assert rdr.read_string() == "layton"
+        assert rdr.read(2) == b"ta"
+        assert rdr.read_uint32() is None  # only 2 bytes left
+        assert rdr.c == len(self.DATA)
+        rdr.seek(-4, binary.SEEK_END)
+        assert rdr.read() == b"tail"
+        rdr.seek(2)
+        assert rdr.read_uint32_array(1) == [0xdeadbeef]
+        assert len(rdr) == len(self.DATA) and rdr.getvalue() == self.DATA
+
+    def test_bytes_and_stream(self):
+        # Bytes are read through a memoryview, they must behave the same as a stream
+        self.check_reads(binary.BinaryReader(self.DATA))
+        self.check_reads(binary.BinaryReader(bytearray(self.DATA)))
+        self.check_reads(binary.BinaryReader(io.BytesIO(self.DATA)))
+
+    def test_memory_stream(self):
+        # Streams over memory are read in place, sharing their position with the reader
+        stream = binary._MemoryStream(self.DATA)
+        self.check_reads(binary.BinaryReader(stream))
+        stream.seek(0)
+        rdr = binary.BinaryReader(stream)
+        assert rdr.read(3) == self.DATA[:3] and stream.tell() == 3
+        stream.seek(6)
+        assert rdr.read_int8() == -5
+
+    def test_from_stream(self):
+        rdr = binary.BinaryReader(self.DATA)
+        assert binary.BinaryReader.from_stream(rdr) is rdr
+        stream = binary._MemoryStream(self.DATA)
+        assert binary.BinaryReader.from_stream(stream).stream is stream  # read in place
+        stream = io.BytesIO(self.DATA)
+        stream.seek(2)
+        assert binary.BinaryReader.from_stream(stream).read_uint32() == 0xdeadbeef
+
+    def test_editor_from_bytes(self):
+        editor = binary.BinaryEditor(self.DATA)
+        editor.write_uint16(0x4321)
+        editor.seek(0)
+        assert editor.read_uint16() == 0x4321
+
+    def test_read_array(self):
+        values = np.arange(-8, 8, dtype="<i4")
+        for rdr in [binary.BinaryReader(values.tobytes()), binary.BinaryReader(io.BytesIO(values.tobytes()))]:
+            rdr.seek(4)
+            array = rdr.read_array(np.int32, 3)
+            assert array.dtype == np.dtype("<i4") and array.tolist() == [-7, -6, -5]
+            assert rdr.c == 16
+            assert rdr.read_array(">u2", 2).tolist() == [0xfcff, 0xffff]
+            assert rdr.read_array(np.int32, 100) is None
+
+    def test_write_array(self):
+        wtr = binary.BinaryWriter()
+        wtr.write_array(np.array([1, 2], np.uint16))
+        wtr.write_array(np.array([[1, 2]], ">u2"))
+        assert wtr.getvalue() == b"\x01\x00\x02\x00\x00\x01\x00\x02"
+
+    def test_read_cstrings(self):
+        table = "レイトン\0\0luke\0".encode("shift_jis") + b"rest"
+        for rdr in [binary.BinaryReader(table), binary.BinaryReader(io.BytesIO(table))]:
+            assert rdr.read_cstrings(3) == ["レイトン", "", "luke"]
+            assert rdr.read_string() == "rest"  # No terminator at the end of the data
+            assert rdr.read_string() == ""
+            rdr.seek(0)
+            assert rdr.read_string_array(2, encoding=None) == [b"\x83\x8c\x83C\x83g\x83\x93", b""]
+            assert rdr.read_string_array(2, 4, encoding=None) == [b"luke", b""]
+
+
+class TestBinaryWriter(unittest.TestCase):
+    def check_writes(self, wtr: binary.BinaryWriter):
+        wtr.write(b"RIFF")
+        size = wtr.reserve_uint32()
+        wtr.write_uint16(0x1234)
+        wtr.write_string("odd")
+        wtr.write_padding(4)
+        assert len(wtr) == wtr.c == 16
+        size.set(len(wtr) - 8)
+        assert wtr.c == 16
+        wtr.seek(2)
+        wtr.write(b"ff")  # overwrite
+        wtr.seek(20)
+        wtr.write_uint8(1)  # after the end, the gap is filled with zeros
+        assert wtr.getvalue() == b"RIff\x08\0\0\0\x34\x12odd" + bytes(7) + b"\x01"
+        assert len(wtr) == 21
+
+    def test_bytesio_and_file(self):
+        # The size of a BytesIO is read from its buffer, the size of other streams by seeking
+        self.check_writes(binary.BinaryWriter())
+        with tempfile.TemporaryFile() as file:
+            self.check_writes(binary.BinaryWriter(file))
+
+    def test_placeholder_after_end(self):
+        wtr = binary.BinaryWriter()
+        wtr.write_uint32_array([1, 2])
+        wtr.reserve("2H").set(3, 4)
+        assert wtr.getvalue() == struct.pack("<IIHH", 1, 2, 3, 4)
+        assert bytes(wtr.getbuffer()) == wtr.getvalue()
@@ -0,0 +1,228 @@
+import concurrent.futures
+import io
+import random
+import time
+import unittest
+
+import ndspy.lz10
+
+import formats.compression as compression
+from formats.compression import huffman, rle
+from formats.compression.cache import DecompressionCache
+from formats.compression.selection import SmallestCompressionPolicy
+from formats.filesystem import CompressedIOWrapper
+
+
+class TestHuffman(unittest.TestCase):
+    # "professor layton" as compressed by the original node-walking implementation
+    HUFF4_DATA = b'$\x10\x00\x00\x0b\x00@A\x81\x07\x01\x06\x0f\x01A\xc2\xc2\xc3\xc3\x00\x03\x02\x01\x04\x05\t\x0c' \
+                 b'\x0e\xba\xf9\xd1\x96p\xb3\x1di8*\x9d\xc9\x00\x00\x00\xe0'
+    HUFF8_DATA = b'(\x10\x00\x00\x0b\x00\x80\x01o\x01A\x82\xc2\xc3\xc3rs\x83eflnpty\xc0 a_l*\x8a\x00G\xfa7'
+
+    def test_decompress_known(self):
+        assert huffman.decompress(self.HUFF4_DATA) == b"professor layton"
+        assert huffman.decompress(self.HUFF8_DATA) == b"professor layton"
+
+    def test_decompress_trailing_data(self):
+        # Files inside archives are padded, the padding should be ignored
+        assert huffman.decompress(self.HUFF8_DATA + b"\0" * 8) == b"professor layton"
+
+    def test_round_trip(self):
+        rng = random.Random(0)
+        for alphabet in [1, 2, 7, 16, 40, 256]:
+            data = bytes(rng.randrange(alphabet) for _ in range(5000))
+            for datablock_size in [4, 8]:
+                compressed = huffman.compress(data, datablock_size)
+                assert huffman.decompress(compressed) == data
+
+    def test_empty(self):
+        # The size 0 of the short header means a long header, so empty data has a long header
+        for datablock_size in [4, 8]:
+            compressed = huffman.compress(b"", datablock_size)
+            assert compressed[:8] == bytes([0x20 | datablock_size, 0, 0, 0, 0, 0, 0, 0])
+            assert huffman.decompress(compressed) == b""
+            assert b"".join(huffman.decompress_iter(compressed)) == b""
+
+    def test_full_alphabet(self):
+        # Balanced trees of 256 leaves need the tree layout to keep child offsets within 6 bits
+        data = bytes(range(256)) * 16
+        assert huffman.decompress(huffman.compress(data, 8)) == data
+
+    def test_smallest_block_size(self):
+        rng = random.Random(0)
+        for data in [bytes(rng.randrange(256) for _ in range(2000)), bytes(rng.randrange(4) for _ in range(2000))]:
+            smallest = min(huffman.compress(data, 4), huffman.compress(data, 8), key=len)
+            assert huffman.compress(data) == smallest
+
+
+class TestRLE(unittest.TestCase):
+    def test_compress_known(self):
+        # 2 literals, a run of 5 and a literal
+        assert rle.compress(b"abcccccd") == b"\x30\x08\x00\x00\x01ab\x82c\x00d"
+
+    def test_long_runs(self):
+        # Runs are split in blocks of 130 bytes, leftovers shorter than 3 bytes become literals
+        for length in [129, 130, 131, 132, 133, 1000]:
+            data = b"x" + b"a" * length + b"b"
+            assert rle.decompress(rle.compress(data)) == data
+
+    def test_round_trip(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            data = b"".join(bytes([rng.randrange(4)]) * rng.choice([1, 2, 3, 50, 200]) for _ in range(100))
+            assert rle.decompress(rle.compress(data)) == data
+
+
+class TestLZ10(unittest.TestCase):
+    @staticmethod
+    def get_samples():
+        rng = random.Random(0)
+        samples = [b"a", b"abc", b"\0" * 5000, bytes(range(256)) * 20]
+        for _ in range(20):
+            data = b""
+            while len(data) < 3000:
+                if data and rng.random() < 0.3:
+                    start = rng.randrange(len(data))
+                    data += data[start:start + rng.randint(1, 40)]
+                else:
+                    data += bytes(rng.randrange(16) for _ in range(rng.randint(1, 20)))
+            samples.append(data)
+        return samples
+
+    @unittest.skipIf(compression.lz10 is ndspy.lz10, "compiled LZ10 codec not built")
+    def test_native_matches_ndspy(self):
+        for data in self.get_samples():
+            compressed = ndspy.lz10.compress(data)
+            assert compression.lz10.compress(data) == compressed
+            assert compression.lz10.decompress(compressed) == data
+
+    def test_padding_matches_ndspy(self):
+        # Data ending early in the last group of blocks, which is padded with zeros
+        rng = random.Random(0)
+        for _ in range(300):
+            length = rng.randrange(1, 64) * 4 + rng.randint(1, 3)
+            data = bytes(rng.randrange(3) for _ in range(length))
+            assert compression.lz10.compress(data) == ndspy.lz10.compress(data)
+            assert compression.lz10.decompress(compression.lz10.compress_optimal(data)) == data
+
+    def test_max_compression(self):
+        for data in self.get_samples():
+            compressed = compression.compress(data, compression.LZ10, False, max_compression=True)
+            assert compression.decompress(compressed, False)[0] == data
+            assert len(compressed) <= len(compression.compress(data, compression.LZ10, False))
+
+    def test_registered_codecs(self):
+        data = self.get_samples()[-1]
+        for compression_type in [compression.LZ10, compression.RLE, compression.HUFF4BIT, compression.HUFF8BIT]:
+            for double_typed in [False, True]:
+                compressed = compression.compress(data, compression_type, double_typed)
+                assert compression.decompress(compressed, double_typed) == (data, double_typed)
+
+
+class TestCompressionSelection(unittest.TestCase):
+    def test_smallest_compression(self):
+        policy = SmallestCompressionPolicy(max_workers=2)
+        try:
+            data = b"\0" * 4000 + bytes(range(256))
+            compressed = policy.compress(data, compression.HUFF8BIT, True, name="test")
+            assert compression.decompress(compressed, True) == (data, True)
+            candidates = [compression.compress(data, compression_type, True)
+                          for compression_type in policy.compression_types]
+            assert len(compressed) == min(map(len, candidates))
+            assert policy.report[0].chosen_type != compression.HUFF8BIT
+
+            # Files without a second type must keep their compression
+            compressed = policy.compress(data, compression.HUFF8BIT, False)
+            assert compressed[0] == compression.HUFF8BIT
+        finally:
+            policy.shutdown()
+
+    def test_time_budget(self):
+        policy = SmallestCompressionPolicy(time_budget=0.2, max_workers=1)
+        try:
+            # The trial compressions wait behind a busy process, only the original type is done in time
+            policy._executor = concurrent.futures.ProcessPoolExecutor(1)
+            policy._executor.submit(time.sleep, 2)
+            data = b"\0" * 4000
+            start = time.perf_counter()
+            compressed = policy.compress(data, compression.HUFF8BIT, True)
+            assert time.perf_counter() - start < 1
+            assert compressed == compression.compress(data, compression.HUFF8BIT, True)
+            assert policy.report[0].chosen_type == compression.HUFF8BIT
+        finally:
+            policy.shutdown()
+
+
+class TestCompressedIOWrapper(unittest.TestCase):
+    def test_skip_unmodified(self):
+        data = TestLZ10.get_samples()[-1]
+        # Compressed differently than the wrapper would, to see if it's compressed again
+        compressed = compression.compress(data, compression.LZ10, False, max_compression=True)
+        stream = io.BytesIO(compressed)
+        skipped = CompressedIOWrapper.skipped_recompression_count
+        with CompressedIOWrapper(stream, double_typed=False) as wrapper:
+            assert wrapper.read() == data
+            wrapper.flush()
+            assert stream.getvalue() == compressed
+        assert CompressedIOWrapper.skipped_recompression_count == skipped + 2
+
+    def test_partial_reads(self):
+        data = TestLZ10.get_samples()[-1] * 10
+        for compression_type in [compression.LZ10, compression.RLE, compression.HUFF4BIT, compression.HUFF8BIT]:
+            chunks, _ = compression.decompress_iter(compression.compress(data, compression_type, False), False)
+            assert len(next(chunks)) < len(data)
+
+            wrapper = CompressedIOWrapper(io.BytesIO(compression.compress(data, compression_type, True)))
+            assert wrapper.read(4) == data[:4]
+            wrapper.seek(1000)
+            buffer = bytearray(10)
+            wrapper.readinto(buffer)
+            assert buffer == data[1000:1010]
+            assert wrapper.read() == data[1010:]
+            wrapper.seek(-5, io.SEEK_END)
+            assert wrapper.read(10) == data[-5:]
+            assert wrapper.getvalue() == data
+
+    def test_read_past_end(self):
+        # The padding bits at the end of the last word of the stream decode to nibbles past the end of the data
+        data = b"\0\2\0\1\1\0\1\2\2\0"
+        compressed = huffman.compress(data, 4)
+        assert compressed == bytes.fromhex("240a00000340c00001020000c05b4ede")
+        assert b"".join(huffman.decompress_iter(compressed)) == data
+        wrapper = CompressedIOWrapper(io.BytesIO(compressed), double_typed=False)
+        assert wrapper.read(100) == data
+        assert wrapper.getvalue() == data
+
+    def test_recompress_modified(self):
+        stream = io.BytesIO(compression.compress(b"professor layton", compression.RLE, False))
+        recompressed = CompressedIOWrapper.recompression_count
+        wrapper = CompressedIOWrapper(stream, double_typed=False)
+        wrapper.seek(0, io.SEEK_END)
+        wrapper.write(b" and the diabolical box")
+        wrapper.flush()
+        wrapper.flush()
+        assert CompressedIOWrapper.recompression_count == recompressed + 1
+        assert stream.getvalue()[0] == compression.RLE
+        assert compression.decompress(stream.getvalue(), False)[0] == b"professor layton and the diabolical box"
+
+
+class TestDecompressionCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = DecompressionCache(10)
+        cache.put(b"a", b"1234")
+        cache.put(b"b", b"1234")
+        assert cache.get(b"a") == b"1234"  # b is now the least recently used
+        cache.put(b"c", b"1234")
+        assert cache.get(b"b") is None
+        assert cache.get(b"a") == b"1234" and cache.get(b"c") == b"1234"
+        cache.put(b"d", b"12345678901")  # bigger than the whole cache
+        assert cache.get(b"d") is None
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (3, 2, 1, 8)
+
+    def test_decompress_cached(self):
+        compressed = compression.compress(b"professor layton" * 10, compression.LZ10, True)
+        hits = compression.decompression_cache.hits
+        first = compression.decompress(compressed, True)
+        assert compression.decompress(compressed, True) == first == (b"professor layton" * 10, True)
+        assert compression.decompression_cache.hits >= hits + 1
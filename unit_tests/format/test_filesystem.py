@@ -0,0 +1,272 @@
+import io
+import os
+import struct
+import tempfile
+import unittest
+
+import ndspy.rom
+from ndspy.fnt import Folder
+
+import formats.compression as compression
+from formats.binary import BinaryReader
+from formats.filesystem import NintendoDSRom, PlzArchive, RomFileReader
+
+
+class TestFileIndex(unittest.TestCase):
+    @staticmethod
+    def get_rom() -> NintendoDSRom:
+        rom = NintendoDSRom()
+        rom.files = [b"overlay"]
+        rom.filenames = Folder(firstID=1)
+        rom.add_folder("/data")
+        rom.add_folder("/data/bg")
+        rom.add_folder("/sound")
+        for path in ["/data/a.bin", "/data/bg/b.arc", "/data/bg/c.arc", "/sound/d.sad", "/data/e.bin"]:
+            with rom.open(path, "wb+") as f:
+                f.write(path.encode())
+        return rom
+
+    def check_rom(self, rom: NintendoDSRom):
+        paths = []
+
+        def list_files(prefix: str, folder: Folder):
+            paths.extend(prefix + filename for filename in folder.files)
+            for folder_name, subfolder in folder.folders:
+                list_files(prefix + folder_name + "/", subfolder)
+
+        list_files("/", rom.filenames)
+        for path in paths:
+            assert rom.get_file_id(path) == rom.filenames.idOf(path)
+            assert rom.files[rom.get_file_id(path)] == path.encode()
+        assert {path: folder.firstID + index for path, (folder, index) in rom._get_file_positions().items()} == \
+               {path[1:]: rom.filenames.idOf(path) for path in paths}
+
+    def test_rom(self):
+        rom = self.get_rom()
+        self.check_rom(rom)
+        assert "data/bg/b.arc" in rom and "/data//bg/b.arc" in rom
+        assert "/data/bg" not in rom and "/data/x.bin" not in rom
+
+        rom.move_file("/data/bg/b.arc", "/sound/b.arc")
+        rom.files[rom.get_file_id("/sound/b.arc")] = b"/sound/b.arc"
+        rom.remove_file("/data/a.bin")
+        rom.rename_file("/data/e.bin", "a.bin")
+        rom.files[rom.get_file_id("/data/a.bin")] = b"/data/a.bin"
+        assert "/data/e.bin" not in rom
+        rom.rename_folder("/data/bg", "/bg")
+        rom.files[rom.get_file_id("/bg/c.arc")] = b"/bg/c.arc"
+        self.check_rom(rom)
+
+    def test_batch(self):
+        def mutate(rom: NintendoDSRom):
+            rom.remove_file("/data/a.bin")
+            with rom.open("/sound/f.sad", "wb+") as f:
+                f.write(b"/sound/f.sad")
+            rom.move_file("/data/bg/b.arc", "/data/b.arc")
+            with rom.open("/data/bg/g.arc", "wb+") as f:
+                f.write(b"/data/bg/g.arc")
+
+        sequential, batched = self.get_rom(), self.get_rom()
+        mutate(sequential)
+        sequential.files[sequential.get_file_id("/data/b.arc")] = b"/data/b.arc"
+
+        opened = batched.open("/sound/d.sad", "wb")
+        with batched.batch():
+            mutate(batched)
+            assert "/data/a.bin" not in batched and batched.get_file_id("/sound/f.sad") is None
+        batched.files[batched.get_file_id("/data/b.arc")] = b"/data/b.arc"
+        assert batched.files == sequential.files and repr(batched.filenames) == repr(sequential.filenames)
+        self.check_rom(batched)
+        assert opened.id == batched.get_file_id("/sound/d.sad")
+        opened.close()
+
+        # An exception discards the queued changes
+        files = batched.files
+        with self.assertRaises(ValueError):
+            with batched.batch():
+                batched.remove_file("/data/e.bin")
+                raise ValueError()
+        assert batched.files is files and "/data/e.bin" in batched
+
+    def test_add_in_batch(self):
+        rom = self.get_rom()
+        with rom.batch():
+            # Added files only get an id once the batch is applied, they're created and written with open
+            assert rom.add_file("/data/f.bin") is None
+            with rom.open("/data/g.bin", "wb+") as f:
+                f.write(b"/data/g.bin")
+            assert rom.get_file_id("/data/g.bin") is None
+        assert rom.add_file("/data/h.bin") == rom.get_file_id("/data/h.bin")
+        rom.files[rom.get_file_id("/data/f.bin")] = b"/data/f.bin"
+        rom.files[rom.get_file_id("/data/h.bin")] = b"/data/h.bin"
+        self.check_rom(rom)
+
+    def test_incremental_index(self):
+        rom = self.get_rom()
+        positions = rom._get_file_positions()
+        # The index is updated by the changes of the files, not built again
+        rom.remove_file("/data/bg/b.arc")
+        with rom.open("/data/a2.bin", "wb+") as f:
+            f.write(b"/data/a2.bin")
+        rom.move_file("/sound/d.sad", "/data/bg/d.sad")
+        rom.files[rom.get_file_id("/data/bg/d.sad")] = b"/data/bg/d.sad"
+        with rom.batch():
+            rom.remove_file("/data/a.bin")
+            with rom.open("/sound/f.sad", "wb+") as f:
+                f.write(b"/sound/f.sad")
+        assert rom._file_positions is positions
+        self.check_rom(rom)
+
+    def test_plz(self):
+        plz = PlzArchive(compressed=False)
+        plz.filenames = []
+        plz.files = []
+        for filename in ["a.gds", "b.gds", "c.gds"]:
+            with plz.open(filename, "wb+") as f:
+                f.write(filename.encode())
+        plz.remove_file("a.gds")
+        plz.rename_file("c.gds", "a.gds")
+        assert "c.gds" not in plz
+        assert [plz.get_file_id(filename) for filename in ["a.gds", "b.gds"]] == [1, 0]
+        with plz.open("a.gds", "rb") as f:
+            assert f.read() == b"c.gds"
+
+        with plz.open("b.gds", "rb") as f:
+            assert isinstance(f, RomFileReader) and not f.writable()
+            f.seek(1)
+            rdr = BinaryReader(f)
+            assert rdr.read(3) == b".gd" and rdr.read_array("u1", 1).base is not None
+        with plz.open("b.gds", "r") as f:
+            assert f.read() == "b.gds"
+
+        stream = io.BytesIO()
+        plz.write_stream(stream)
+        lazy = PlzArchive(file=io.BytesIO(stream.getvalue()), compressed=False, lazy=True)
+        assert lazy.filenames == plz.filenames and lazy.files == plz.files
+        assert all(isinstance(file, memoryview) for file in lazy.files)
+        with lazy.open("b.gds", "wb") as f:
+            f.write(b"written")
+        assert type(lazy.files[0]) is bytes and isinstance(lazy.files[1], memoryview)
+
+        # Reading the archive again replaces the list of file names
+        plz.filenames = ["x.gds"]
+        assert plz.get_file_id("x.gds") == 0 and "a.gds" not in plz
+
+    def test_plz_shift(self):
+        class CountingDict(dict):
+            updates = 0
+
+            def __setitem__(self, key, value):
+                CountingDict.updates += 1
+                super().__setitem__(key, value)
+
+        plz = PlzArchive(compressed=False)
+        plz.filenames = [f"{i}.gds" for i in range(10000)]
+        plz.files = [b""] * 10000
+        plz._file_ids = CountingDict(plz._get_file_ids())
+        # Only the ids of the files after a removed file are updated
+        plz.remove_file("9990.gds")
+        plz.remove_file("0.gds")
+        assert CountingDict.updates == 9 + 9998
+        assert plz.get_file_id("9999.gds") == 9997 and plz.get_file_id("1.gds") == 0
+
+
+class TestLazyRom(unittest.TestCase):
+    def test_lazy_loading(self):
+        rom = ndspy.rom.NintendoDSRom()
+        rom.arm9 = bytes(range(256)) * 8
+        rom.arm7 = bytes(range(128)) * 4
+        rom.files = [bytes([i]) * (i * 100) for i in range(1, 20)]
+        rom.filenames = Folder(files=[f"f{i}.bin" for i in range(1, 20)])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rom.nds")
+            rom.saveToFile(path)
+            eager = NintendoDSRom.fromFile(path, lazy=False)
+            lazy = NintendoDSRom.fromFile(path, lazy=True)
+            assert isinstance(lazy.files[0], memoryview)
+            assert lazy.arm9 == eager.arm9 and lazy.rsaSignature == eager.rsaSignature
+            assert lazy.save() == eager.save()
+
+            # Saving over the mapped file, the data read in place stays valid
+            with lazy.open("f3.bin", "rb") as f:
+                array = BinaryReader(f).read_array("u1", 300)
+            with lazy.open("f2.bin", "wb") as f:
+                f.write(b"modified")
+            expected = lazy.save()
+            lazy.saveToFile(path)
+            assert lazy.files[1] == b"modified"
+            assert array.tobytes() == b"\3" * 300
+            assert NintendoDSRom.fromFile(path, lazy=False).save() == expected
+            del lazy, array
+
+
+class TestIncrementalSave(unittest.TestCase):
+    @staticmethod
+    def get_rom(archive_count: int) -> NintendoDSRom:
+        rom = NintendoDSRom()
+        rom.files = []
+        rom.filenames = Folder(folders=[("data", Folder(files=[f"{chr(97 + i)}.plz" for i in range(archive_count)]
+                                                        + ["c.bin"]))])
+        for i in range(archive_count):
+            plz = PlzArchive(compressed=False)
+            plz.filenames = ["x.gds", "y.gds"]
+            plz.files = [b"x" * 100, b"y" * 100]
+            stream = io.BytesIO()
+            plz.write_stream(stream)
+            rom.files.append(compression.compress(stream.getvalue(), compression.LZ10, False))
+        rom.files.append(b"c")
+        return rom
+
+    def test_only_modified_archives(self):
+        rom = self.get_rom(2)
+        a, b = rom.get_archive("/data/a.plz"), rom.get_archive("/data/b.plz")
+        assert not a.modified and not rom.modified
+
+        # Writing the same data doesn't modify the file
+        with a.open("x.gds", "wb") as f:
+            f.write(b"x" * 100)
+        assert not a.modified
+        with a.open("y.gds", "wb") as f:
+            f.write(b"modified")
+        assert a.modified and a.modified_files == {1}
+
+        b_data = rom.files[1]
+        with self.assertLogs(level="INFO") as logs:
+            rom.save()
+        assert any("/data/a.plz rebuilt (1 modified files)" in line for line in logs.output)
+        assert not any("/data/b.plz" in line for line in logs.output)
+        assert rom.files[1] is b_data
+        assert rom.modified_files == {0} and not a.modified
+        assert PlzArchive(file=io.BytesIO(rom.files[0])).files == [b"x" * 100, b"modified"]
+
+        rom.remove_file("/data/a.plz")
+        assert rom.modified and rom.modified_files == frozenset()
+
+    def test_parallel(self):
+        roms = [self.get_rom(4), self.get_rom(4)]
+        roms[1].save_workers = 2
+        for rom in roms:
+            for i, name in enumerate(["a", "b", "d"]):
+                with rom.get_archive(f"/data/{name}.plz").open("x.gds", "wb") as f:
+                    f.write(bytes(range(i * 50)) * 20)
+            rom.save()
+        assert roms[1].files == roms[0].files
+        assert roms[1].modified_files == roms[0].modified_files == {0, 1, 3}
+        assert not any(archive.modified for archive in roms[1]._loaded_archives.values())
+
+
+class TestDeduplication(unittest.TestCase):
+    def test_deduplicate(self):
+        rom = NintendoDSRom()
+        rom.files = [b"a" * 1000, b"b" * 1000, b"a" * 1000, b"", b"", b"b" * 1000, b"c"]
+        rom.filenames = Folder(files=[f"f{i}.bin" for i in range(len(rom.files))])
+        with self.assertLogs(level="INFO") as logs:
+            data = rom.save(deduplicate=True)
+        assert any("2 duplicated files stored once, 2000 bytes saved" in line for line in logs.output)
+        assert len(data) < len(rom.save(deduplicate=False))
+
+        loaded = ndspy.rom.NintendoDSRom(data)
+        assert loaded.files == rom.files
+        fat_offset, = struct.unpack_from("<I", data, 0x48)
+        fat = list(struct.iter_unpack("<II", data[fat_offset:fat_offset + len(rom.files) * 8]))
+        assert fat[2] == fat[0] and fat[5] == fat[1]
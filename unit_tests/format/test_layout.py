@@ -0,0 +1,70 @@
+import io
+import unittest
+
+import ndspy.rom
+from ndspy.fnt import Folder
+
+import formats.compression as compression
+from formats.event import Event
+from formats.filesystem import NintendoDSRom, PlzArchive
+from formats.layout import average_seek_distance, get_file_groups, get_file_order, optimize_file_order
+
+
+class TestLayout(unittest.TestCase):
+    @staticmethod
+    def get_rom() -> NintendoDSRom:
+        event = Event()
+        event.map_top_id = 2
+        event.map_bottom_id = 3
+        event.characters = [5, 0, 0, 0, 0, 0, 0, 0]
+        event_data = io.BytesIO()
+        event.write_stream(event_data)
+        plz = PlzArchive(compressed=False)
+        plz.filenames = ["d10_030.dat"]
+        plz.files = [event_data.getvalue()]
+        plz_data = io.BytesIO()
+        plz.write_stream(plz_data)
+
+        rom = NintendoDSRom()
+        rom.files = [bytes(1000), bytes(10), bytes(3000), bytes(3000), bytes(5000),
+                     compression.compress(plz_data.getvalue(), compression.LZ10, False), bytes(800)]
+        rom.filenames = Folder(folders=[("data_lt2", Folder(folders=[
+            ("ani", Folder(folders=[("eventchr", Folder(folders=[("en", Folder(files=["chr5_n.arc"], firstID=1))],
+                                                         files=["chr5.arc"], firstID=0))], firstID=0)),
+            ("bg", Folder(folders=[("event", Folder(files=["sub2.arc", "sub3.arc"], firstID=2)),
+                                   ("map", Folder(files=["main3.arc"], firstID=4))], firstID=2)),
+            ("event", Folder(folders=[("en", Folder(files=["ev_t10.plz"], firstID=6))], files=["ev_d10.plz"],
+                             firstID=5)),
+        ], firstID=0))])
+        return rom
+
+    def test_event_groups(self):
+        rom = self.get_rom()
+        paths = ["/data_lt2/event/ev_d10.plz", "/data_lt2/event/en/ev_t10.plz", "/data_lt2/bg/event/sub2.arc",
+                 "/data_lt2/bg/map/main3.arc", "/data_lt2/ani/eventchr/chr5.arc",
+                 "/data_lt2/ani/eventchr/en/chr5_n.arc"]
+        groups = get_file_groups(rom)
+        assert groups == [[rom.get_file_id(path) for path in paths]]
+
+        rom.sortedFileIds = list(range(len(rom.files)))
+        with self.assertLogs(level="INFO"):
+            before, after = optimize_file_order(rom)
+        assert after < before
+        assert after == average_seek_distance(rom, groups, get_file_order(rom))
+        # The files of the group are packed next to each other, the other files keep their order
+        data = rom.save()
+        assert ndspy.rom.NintendoDSRom(data).files == rom.files
+        order = get_file_order(rom)
+        assert order[:len(groups[0])] == groups[0] and order[-1] == rom.get_file_id("/data_lt2/bg/event/sub3.arc")
+
+    def test_save(self):
+        rom = self.get_rom()
+        groups = get_file_groups(rom)
+        rom.sortedFileIds = list(range(len(rom.files)))
+        with self.assertLogs(level="INFO"):
+            data = rom.save(optimize_order=True)
+        assert ndspy.rom.NintendoDSRom(data).sortedFileIds[:len(groups[0])] == groups[0]
+
+        # Removing a file keeps the order of the others
+        rom.remove_file("/data_lt2/ani/eventchr/chr5.arc")
+        assert get_file_order(rom)[:len(groups[0]) - 1] == [file_id - 1 for file_id in groups[0][:-2]] + [0]
@@ -0,0 +1,58 @@
+import unittest
+from dataclasses import dataclass
+from typing import List
+
+from formats.binary import BinaryReader, BinaryWriter
+from formats.record import *
+
+
+@dataclass
+class Entry(Record):
+    _magic: int = uint16(const=0xAA01)
+    id_: int = uint16()
+    volume: int = int8()
+    shown: List[bool] = boolean(count=3)
+    _pad: None = padding(2)
+    name: str = string(8)
+    rate: int = uint32()
+
+
+class TestRecord(unittest.TestCase):
+    DATA = b"\x01\xaa\x05\x00\xff\x01\x00\x01\xaa\xaafile\0\0\0\0\x44\xac\x00\x00"
+
+    def test_read(self):
+        entry = Entry()
+        entry.read(BinaryReader(self.DATA))
+        assert entry == Entry(id_=5, volume=-1, shown=[True, False, True], name="file", rate=44100)
+        assert Entry.size() == len(self.DATA)
+
+    def test_write(self):
+        entry = Entry(id_=5, volume=-1, shown=[True, False, True], name="file", rate=44100)
+        wtr = BinaryWriter()
+        entry.write(wtr)
+        # The padding is written as zeros
+        assert wtr.getvalue() == self.DATA.replace(b"\xaa\xaa", b"\0\0")
+
+    def test_arrays(self):
+        entries = [Entry(id_=i, volume=-i, shown=[i % 2 == 0] * 3, name=f"e{i}", rate=i * 1000) for i in range(10)]
+        wtr = BinaryWriter()
+        Entry.write_array(wtr, entries)
+        assert len(wtr.getvalue()) == 10 * Entry.size()
+        assert Entry.read_array(BinaryReader(wtr.getvalue()), 10) == entries
+        assert Entry.read_array(BinaryReader(b""), 0) == []
+
+    def test_constants(self):
+        wtr = BinaryWriter()
+        Entry.write_array(wtr, [Entry() for _ in range(4)])
+        data = bytearray(wtr.getvalue())
+        data[2 * Entry.size()] = 0
+        with self.assertRaises(ValueError):
+            Entry.read_array(BinaryReader(bytes(data)), 4)
+        with self.assertRaises(ValueError):
+            Entry().read(BinaryReader(bytes(data[2 * Entry.size():])))
+
+    def test_not_enough_data(self):
+        with self.assertRaises(ValueError):
+            Entry().read(BinaryReader(self.DATA[:-1]))
+        with self.assertRaises(ValueError):
+            Entry.read_array(BinaryReader(self.DATA * 2), 3)
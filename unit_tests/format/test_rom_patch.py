@@ -0,0 +1,93 @@
+import io
+import struct
+import unittest
+
+from ndspy.fnt import Folder
+
+import formats.compression as compression
+from formats.filesystem import NintendoDSRom, PlzArchive
+from formats.rom_patch import apply_patch, create_patch
+
+
+class TestRomPatch(unittest.TestCase):
+    @staticmethod
+    def get_rom() -> NintendoDSRom:
+        plz = PlzArchive(compressed=False)
+        plz.filenames = ["x.gds", "y.gds"]
+        plz.files = [b"x" * 100, b"y" * 100]
+        stream = io.BytesIO()
+        plz.write_stream(stream)
+
+        rom = NintendoDSRom()
+        rom.arm9 = bytes(range(256))
+        rom.arm9OverlayTable = struct.pack("<24xI4x", 0)  # overlay 0 is the file 0
+        rom.files = [b"overlay", compression.compress(stream.getvalue(), compression.LZ10, False), b"b" * 50,
+                     b"c" * 50]
+        rom.filenames = Folder(folders=[("data", Folder(files=["a.plz", "b.bin", "c.bin"], firstID=1))], firstID=1)
+        return NintendoDSRom(rom.save())
+
+    def test_patch(self):
+        modified = self.get_rom()
+        with modified.get_archive("/data/a.plz").open("y.gds", "wb") as f:
+            f.write(b"modified")
+        with modified.get_archive("/data/a.plz").open("z.gds", "wb+") as f:
+            f.write(b"added")
+        modified.add_folder("/new")
+        with modified.batch():
+            modified.remove_file("/data/b.bin")
+            modified.move_file("/data/c.bin", "/new/c.bin")
+            with modified.open("/new/d.bin", "wb+") as f:
+                f.write(b"d" * 1000)
+        modified.files[0] = b"modified overlay"
+        modified.arm9 = bytes(range(128))
+        modified = NintendoDSRom(modified.save())
+
+        patch = io.BytesIO()
+        assert create_patch(self.get_rom(), modified, patch) == 7
+        assert create_patch(self.get_rom(), self.get_rom(), io.BytesIO()) == 0
+
+        patched = self.get_rom()
+        apply_patch(patched, io.BytesIO(patch.getvalue()))
+        assert list(patched._loaded_archives) == ["/data/a.plz"]
+        patched = NintendoDSRom(patched.save())
+        for path in ["/data/a.plz", "/new/c.bin", "/new/d.bin"]:
+            assert path in patched
+        assert "/data/b.bin" not in patched and "/data/c.bin" not in patched
+        assert patched.files[0] == b"modified overlay" and patched.arm9 == modified.arm9
+        assert patched.files[patched.get_file_id("/new/d.bin")] == b"d" * 1000
+        archive = patched.get_archive("/data/a.plz")
+        assert archive.filenames == ["x.gds", "y.gds", "z.gds"]
+        assert list(map(bytes, archive.files)) == [b"x" * 100, b"modified", b"added"]
+
+    def test_other_rom(self):
+        modified = self.get_rom()
+        with modified.open("/data/b.bin", "wb") as f:
+            f.write(b"modified")
+        modified.files[0] = b"modified overlay"
+        patch = io.BytesIO()
+        create_patch(self.get_rom(), NintendoDSRom(modified.save()), patch)
+
+        # The patch isn't applied to a ROM with other data than the original ROM
+        other = self.get_rom()
+        with other.open("/data/b.bin", "wb") as f:
+            f.write(b"other")
+        files = list(other.files)
+        with self.assertRaises(ValueError):
+            apply_patch(other, io.BytesIO(patch.getvalue()))
+        assert other.files == files
+        # Nor are files without a name added to it
+        modified = self.get_rom()
+        modified.files[0] = b"modified overlay"
+        patch = io.BytesIO()
+        create_patch(self.get_rom(), NintendoDSRom(modified.save()), patch)
+        other = NintendoDSRom()
+        with self.assertRaises(ValueError):
+            apply_patch(other, io.BytesIO(patch.getvalue()))
+        assert other.files == []
+
+    def test_unnamed_files(self):
+        # Files without a name other than overlays can't be identified in the original ROM
+        modified = self.get_rom()
+        modified.files.append(b"unnamed")
+        with self.assertRaises(ValueError):
+            create_patch(self.get_rom(), modified, io.BytesIO())